@@ -4,4 +4,5 @@ set -o errexit
 
 pip install -r requirements.txt
 
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+python manage.py build_openapi_schema
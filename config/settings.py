@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 import dj_database_url
-from decouple import config
+from decouple import Csv, config
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'habits.instrumentation.PerformanceMiddleware',
+    'habits.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,6 +86,62 @@ DATABASES = {
     )
 }
 
+# Read replicas, as comma-separated database URLs. Dashboard, stats and habit list/detail reads use
+# them (see habits.routers); everything else, and anyone who wrote in the last
+# HABIT_REPLICA_PIN_SECONDS, uses the primary. Tests run replica queries against the test primary.
+HABIT_DATABASE_REPLICAS = []
+for index, url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv())):
+    DATABASES[f'replica{index}'] = {**dj_database_url.parse(url), 'TEST': {'MIRROR': 'default'}}
+    HABIT_DATABASE_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['habits.routers.ReplicaRouter'] if HABIT_DATABASE_REPLICAS else []
+HABIT_REPLICA_PIN_SECONDS = config('HABIT_REPLICA_PIN_SECONDS', default=10, cast=int)
+
+
+# Mirror every HabitLog write into the per-year bitmap history (habits.bitmaps), and read calendars
+# and log-based streaks from it.
+# Run `manage.py rebuild_habit_bitmaps` once before turning this on for existing data.
+HABIT_BITMAP_HISTORY = config('HABIT_BITMAP_HISTORY', default=False, cast=bool)
+
+
+# Record per-request SQL counts and phase timings, send them as a Server-Timing header and serve
+# latency histograms at /metrics. When off, the middleware removes itself and /metrics returns 404.
+HABIT_PERF_INSTRUMENTATION = config('HABIT_PERF_INSTRUMENTATION', default=False, cast=bool)
+
+# Bearer token a scraper must send to read /metrics. When empty, /metrics refuses every request.
+HABIT_METRICS_TOKEN = config('HABIT_METRICS_TOKEN', default='')
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Users resolved from JWTs by habits.authentication.CachedJWTAuthentication
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth',
+        'TIMEOUT': config('HABIT_AUTH_CACHE_TIMEOUT', default=60, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': config('HABIT_AUTH_CACHE_MAX_ENTRIES', default=10000, cast=int)},
+    },
+}
+
+# Cache alias that CachedJWTAuthentication keeps authenticated users in
+HABIT_AUTH_CACHE = 'auth'
+
+# Seconds to keep rendered stats and dashboard payloads in the cache, keyed by data version. 0 disables it.
+HABIT_RESPONSE_CACHE_TIMEOUT = config('HABIT_RESPONSE_CACHE_TIMEOUT', default=0, cast=int)
+
+# Admin changelists count at most this many rows exactly; past it they show an estimate (habits.admin)
+HABIT_ADMIN_COUNT_LIMIT = config('HABIT_ADMIN_COUNT_LIMIT', default=10000, cast=int)
+
+# Prebuilt OpenAPI schema files (habits.schema), named after the code version. Set HABIT_CODE_VERSION
+# to e.g. the deployed git commit; otherwise the version is a hash of the project's sources.
+HABIT_SCHEMA_DIR = config('HABIT_SCHEMA_DIR', default=str(BASE_DIR / 'build' / 'openapi'))
+HABIT_CODE_VERSION = config('HABIT_CODE_VERSION', default='')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -128,7 +186,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'habits.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'habits.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     'DEFAULT_SCHEMA_CLASS':'drf_spectacular.openapi.AutoSchema',
 }
\ No newline at end of file
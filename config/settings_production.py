@@ -0,0 +1,55 @@
+"""
+Settings for production servers. gunicorn.conf.py selects them; elsewhere, set
+DJANGO_SETTINGS_MODULE=config.settings_production.
+
+Everything in config.settings applies, plus reusable database connections, so requests stop paying
+for a new PostgreSQL connection each time, and a cache shared by every worker.
+"""
+import copy
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES, HABIT_DATABASE_REPLICAS, config
+
+DEBUG = False
+
+# Seconds a connection is kept open for reuse, checked before each request that reuses it
+DATABASE_CONN_MAX_AGE = config('DATABASE_CONN_MAX_AGE', default=600, cast=int)
+
+# Pool PostgreSQL connections across the threads of a worker instead. Needs psycopg 3 with
+# psycopg[pool] in place of psycopg2; persistent connections are turned off while the pool is on.
+DATABASE_POOL = config('DATABASE_POOL', default=False, cast=bool)
+DATABASE_POOL_MIN_SIZE = config('DATABASE_POOL_MIN_SIZE', default=2, cast=int)
+DATABASE_POOL_MAX_SIZE = config('DATABASE_POOL_MAX_SIZE', default=10, cast=int)
+
+# A copy, so importing this module never changes config.settings
+DATABASES = copy.deepcopy(DATABASES)
+for database in DATABASES.values():
+    if DATABASE_POOL and database['ENGINE'] == 'django.db.backends.postgresql':
+        from psycopg_pool import ConnectionPool
+
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DATABASE_POOL_MIN_SIZE,
+            'max_size': DATABASE_POOL_MAX_SIZE,
+            'timeout': 10,
+            # Checked out connections are tested first, so a dropped one is never handed to a request
+            'check': ConnectionPool.check_connection,
+        }
+    else:
+        database['CONN_MAX_AGE'] = DATABASE_CONN_MAX_AGE
+        database['CONN_HEALTH_CHECKS'] = True
+
+# A cache all workers share, as a Redis URL such as redis://cache:6379/0 (needs the redis package).
+# The default cache stays per process without it.
+CACHE_URL = config('CACHE_URL', default='')
+
+CACHES = copy.deepcopy(CACHES)
+if CACHE_URL:
+    CACHES['default'] = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}
+
+# habits.routers pins users who just wrote to the primary through the default cache; a pin that only
+# the worker which took the write can see would let the user's next read hit a lagging replica
+if HABIT_DATABASE_REPLICAS and CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+    raise ImproperlyConfigured("DATABASE_REPLICA_URLS needs a shared cache; set CACHE_URL.")
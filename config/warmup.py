@@ -0,0 +1,51 @@
+"""
+Gets a server process ready before it takes traffic, so the first real requests are not the ones
+that import the views, build the URL resolver and open the database connections.
+
+Import this module only once Django is set up. `load_app` does the process-independent part and runs once in the gunicorn master when the app is
+preloaded, so forked workers inherit it. `warm_worker` does the per-process part in each worker.
+"""
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.urls import get_resolver
+
+from habits.schema import get_artifact
+
+# Requests sent through the whole stack: middleware, routing, authentication and rendering
+WARMUP_PATHS = ('/api/schema/', '/api/dashboard/', '/api/habits/')
+
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def load_app():
+    """Imports every view, serializer and renderer behind the URLconf and loads the prebuilt schema."""
+    started = time.perf_counter()
+    # Populating the resolver imports every module the URLconf refers to
+    get_resolver().reverse_dict
+    get_artifact('yaml')
+    # Nothing above needs the database; close it anyway, since forked workers must not share a connection
+    connections.close_all()
+    return elapsed_ms(started)
+
+
+def warm_worker():
+    """Opens this process's database connections and sends WARMUP_PATHS through the app. Returns timings in ms."""
+    timings = {'load': load_app()}
+    started = time.perf_counter()
+    for alias in connections:
+        connections[alias].ensure_connection()
+    timings['connect'] = elapsed_ms(started)
+
+    host = 'localhost' if 'localhost' in settings.ALLOWED_HOSTS else settings.ALLOWED_HOSTS[0].lstrip('.')
+    client = Client(SERVER_NAME=host)
+    started = time.perf_counter()
+    for path in WARMUP_PATHS:
+        # Unauthenticated requests stop at a 401, after everything worth warming has run
+        client.get(path)
+    timings['requests'] = elapsed_ms(started)
+    return timings
@@ -0,0 +1,37 @@
+"""
+gunicorn settings for production. gunicorn reads this file from the directory it is started in:
+
+    gunicorn config.wsgi:application
+
+The app is loaded once in the master and shared by the forked workers, and every worker warms up
+(config.warmup) before it accepts its first request.
+"""
+import os
+
+import decouple
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings_production')
+
+# Module-level names are read as gunicorn settings, and "config" is one of them, hence decouple.config
+
+bind = decouple.config('GUNICORN_BIND', default=f"0.0.0.0:{decouple.config('PORT', default='8000')}")
+workers = decouple.config('WEB_CONCURRENCY', default=2, cast=int)
+threads = decouple.config('GUNICORN_THREADS', default=1, cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+preload_app = decouple.config('GUNICORN_PRELOAD', default=True, cast=bool)
+# Off for measuring cold starts (see `manage.py measure_startup`)
+warmup = decouple.config('GUNICORN_WARMUP', default=True, cast=bool)
+
+
+def when_ready(server):
+    # Runs in the master before any worker is forked; with preload_app, Django is set up by now
+    if warmup and preload_app:
+        from config.warmup import load_app
+        server.log.info("Loaded the app in %.1fms", load_app())
+
+
+def post_worker_init(worker):
+    # After the worker has loaded the app and before it accepts connections
+    if warmup:
+        from config.warmup import warm_worker
+        worker.log.info("Worker %s warmed up: %s", worker.pid, warm_worker())
@@ -1,5 +1,88 @@
 from django.contrib import admin
-from .models import Habit, HabitLog
+from django.db import transaction
 
-admin.site.register(Habit)
-admin.site.register(HabitLog)
+from .models import Habit, HabitLog, HabitStreakSummary, PurgeJob
+from .pagination import EstimatedCountPaginator
+from .purge import delete_habit, delete_habits, delete_rows
+from .signals import logs_bulk_changed
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables with millions of rows: no full COUNT(*) and no unbounded dropdowns."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    # Rows listed on the delete confirmation page; the rest are only counted
+    deleted_objects_sample = 100
+
+    def deleted_objects_summary(self, objs):
+        """
+        get_deleted_objects' result for rows that nothing cascades from: a capped sample of them and
+        their count, so confirming a "select all" never loads the whole selection.
+        """
+        count = len(objs) if isinstance(objs, list) else objs.count()
+        sample = [str(obj) for obj in objs[:self.deleted_objects_sample]]
+        if count > len(sample):
+            sample.append(f"...and {count - len(sample)} more")
+        return sample, {self.model._meta.verbose_name_plural: count}, set(), []
+
+
+@admin.register(Habit)
+class HabitAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'user', 'habit_type', 'created_at')
+    list_select_related = ('user',)
+    list_filter = ('habit_type',)
+    # Exact matches only, so searches stay on the primary key and the unique username index
+    search_fields = ('=id', '=user__username')
+    raw_id_fields = ('user',)
+    date_hierarchy = 'created_at'
+    readonly_fields = ('version', 'deleted_at')
+    actions = ['rebuild_streak_summaries']
+
+    def get_deleted_objects(self, objs, request):
+        # Deleting only hides habits and queues them for the purge job, so nothing cascades here
+        return self.deleted_objects_summary(objs)
+
+    def delete_model(self, request, obj):
+        delete_habit(obj)
+
+    def delete_queryset(self, request, queryset):
+        delete_habits(queryset)
+
+    @admin.action(description='Rebuild streak summaries of selected habits')
+    def rebuild_streak_summaries(self, request, queryset):
+        with transaction.atomic():
+            summaries = HabitStreakSummary.objects.rebuild_many(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f"Rebuilt {len(summaries)} streak summaries.")
+
+
+@admin.register(HabitLog)
+class HabitLogAdmin(LargeTableAdmin):
+    list_display = ('id', 'habit', 'completion_date')
+    list_select_related = ('habit',)
+    search_fields = ('=habit__id',)
+    raw_id_fields = ('habit',)
+    date_hierarchy = 'completion_date'
+
+    def get_deleted_objects(self, objs, request):
+        # Logs have nothing that depends on them, so the collector's per-row lookups are not needed
+        if hasattr(objs, 'select_related'):
+            objs = objs.select_related('habit')
+        return self.deleted_objects_summary(objs)
+
+    def delete_queryset(self, request, queryset):
+        # One DELETE instead of a post_delete per log; summaries and journals follow the bulk signal
+        with transaction.atomic():
+            habit_ids = set(queryset.values_list('habit_id', flat=True))
+            delete_rows(queryset)
+            logs_bulk_changed.send(sender=HabitLog, habit_ids=habit_ids)
+
+
+@admin.register(PurgeJob)
+class PurgeJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'target_pk', 'rows_deleted', 'created_at', 'finished_at')
+    list_filter = ('kind',)
+    readonly_fields = ('kind', 'target_pk', 'rows_deleted', 'created_at', 'updated_at', 'finished_at')
+
+    def has_add_permission(self, request):
+        return False
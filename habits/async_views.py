@@ -0,0 +1,132 @@
+"""
+Native async versions of the read-heavy endpoints, for deployments under an ASGI server.
+
+DRF 3.14 views are synchronous, so these are plain Django async views. They authenticate with the
+same DEFAULT_AUTHENTICATION_CLASSES, query through Django's async ORM and return the same payloads,
+ETags and cached responses as DashboardView and HabitStatsView.
+"""
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+
+from .caching import conditional_headers, not_modified_response, payload_cache_key
+from .models import Habit, UserDataVersion
+from .renderers import FastJSONRenderer
+from .streaks import astreaks_for_habits
+from .views import DashboardView, HabitStatsView, include_logs, log_window
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    """Renders `data` exactly like the sync views' JSON renderer does."""
+    return HttpResponse(
+        FastJSONRenderer().render(data), content_type='application/json', status=status, headers=headers
+    )
+
+
+def authenticate(request):
+    """Runs the configured DRF authentication classes against a plain Django request."""
+    for auth_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = auth_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def async_api_view(view):
+    """GET-only async view that requires an authenticated user and renders DRF errors as JSON."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return json_response(
+                {"detail": f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED
+            )
+        try:
+            user = await sync_to_async(authenticate)(request)
+            if user is None:
+                raise exceptions.NotAuthenticated()
+            return await view(request, user, *args, **kwargs)
+        except exceptions.APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+            return json_response(detail, status=exc.status_code)
+    return wrapper
+
+
+async def alist(queryset):
+    return [row async for row in queryset]
+
+
+async def cached_payload(request, *, key, version, today, build):
+    """Async counterpart of the payload cache in caching.versioned_response."""
+    cache_key = payload_cache_key(request, key=key, version=version, today=today)
+    data = await cache.aget(cache_key) if cache_key else None
+    if data is None:
+        data = await build()
+        if cache_key:
+            await cache.aset(cache_key, data, settings.HABIT_RESPONSE_CACHE_TIMEOUT)
+    return data
+
+
+@async_api_view
+async def dashboard(request, user):
+    """Async DashboardView."""
+    data_version = await UserDataVersion.objects.filter(user=user).afirst() or UserDataVersion(user=user)
+    today = date.today()
+    key = f'dashboard{user.id}'
+    headers = conditional_headers(
+        key=key, version=data_version.version,
+        last_modified=data_version.updated_at or user.date_joined, today=today,
+    )
+    not_modified = not_modified_response(request, headers)
+    if not_modified is not None:
+        return not_modified
+
+    async def build():
+        habits = [habit async for habit in Habit.objects.filter(user=user).select_related('streak_summary')]
+        return DashboardView.dashboard_data(habits, await astreaks_for_habits(habits, today))
+
+    data = await cached_payload(request, key=key, version=data_version.version, today=today, build=build)
+    return json_response(data, headers=headers)
+
+
+@async_api_view
+async def habit_stats(request, user, pk):
+    """Async HabitStatsView. Supports ?include_logs= and ?from= / ?to=, but not log pagination."""
+    habit = await Habit.objects.select_related('streak_summary').filter(pk=pk).afirst()
+    if habit is None:
+        raise exceptions.NotFound()
+    if habit.user_id != user.id:
+        return json_response(
+            {"detail": "You do not have permission to view these stats."}, status=status.HTTP_403_FORBIDDEN
+        )
+    params = request.GET
+    if 'cursor' in params or 'page_size' in params:
+        raise exceptions.ValidationError({"detail": "Log pagination is only available on /api/habits/<pk>/stats/."})
+
+    today = date.today()
+    key = f'habit{habit.id}'
+    headers = conditional_headers(key=key, version=habit.version, last_modified=habit.updated_at, today=today)
+    not_modified = not_modified_response(request, headers)
+    if not_modified is not None:
+        return not_modified
+
+    async def build():
+        if not include_logs(params):
+            streaks = await astreaks_for_habits([habit], today)
+            return HabitStatsView.stats_data(habit, streaks[habit.id])
+
+        logs = log_window(habit.habitlog_set.all(), params).order_by('completion_date')
+        # One after the other: the async ORM runs every query of a request on the same thread anyway
+        streaks = await astreaks_for_habits([habit], today)
+        log_dates = await alist(logs.values_list('completion_date', flat=True))
+        data = HabitStatsView.stats_data(habit, streaks[habit.id])
+        data["logs"] = log_dates
+        return data
+
+    data = await cached_payload(request, key=key, version=habit.version, today=today, build=build)
+    return json_response(data, headers=headers)
@@ -0,0 +1,64 @@
+"""
+JWT authentication that resolves the token's user from a cache instead of the database.
+
+The stock JWTAuthentication loads the user row on every request. CachedJWTAuthentication keeps the
+loaded user in the HABIT_AUTH_CACHE cache (bounded, with a TTL) and applies the same active and
+revoked-password checks to the cached copy. Saving or deleting a user drops their entry, so a
+deactivation or password change takes effect on the next request. When the cache is per-process
+(locmem), other processes see the change once their own entry expires.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache():
+    return caches[settings.HABIT_AUTH_CACHE]
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def forget_user(user_id):
+    """Drops a cached user now and again once the surrounding transaction commits."""
+    key = user_cache_key(user_id)
+    user_cache().delete(key)
+    # A request that read the old row before the commit may have cached it in the meantime
+    transaction.on_commit(lambda: user_cache().delete(key))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = self.load_user(user_id)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+    def load_user(self, user_id):
+        cache = user_cache()
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            cache.set(key, user)
+        return user
@@ -0,0 +1,149 @@
+"""
+Completion history stored as one bitset per habit per year.
+
+Bit n of a year's bitset is set when the habit was logged on day n of that year (Jan 1 is bit 0).
+A habit's whole history is loaded into a single Python int, so streak, gap and longest-run queries
+become shifts and masks instead of sorting date sets.
+"""
+from datetime import date, timedelta
+
+YEAR_BYTES = 46  # 366 bits, rounded up
+
+
+def longest_run_of_ones(bits):
+    """Length of the longest run of set bits, by repeatedly ANDing the bitset with itself shifted by one."""
+    length = 0
+    while bits:
+        bits &= bits >> 1
+        length += 1
+    return length
+
+
+class HistoryBitmap:
+    """A habit's completion history as a single bitset, where bit n is `origin + n days`."""
+
+    def __init__(self, origin=None, bits=0):
+        self.origin = origin or date(date.today().year, 1, 1)
+        self.bits = bits
+
+    @classmethod
+    def from_dates(cls, dates):
+        dates = list(dates)
+        if not dates:
+            return cls()
+        bitmap = cls(date(min(dates).year, 1, 1))
+        for day in dates:
+            bitmap.bits |= 1 << bitmap.offset(day)
+        return bitmap
+
+    @classmethod
+    def from_years(cls, years):
+        """Builds the bitmap from (year, bytes) pairs as stored by HabitYearBitmap."""
+        years = sorted(years)
+        if not years:
+            return cls()
+        bitmap = cls(date(years[0][0], 1, 1))
+        for year, data in years:
+            bitmap.bits |= int.from_bytes(bytes(data), 'little') << bitmap.offset(date(year, 1, 1))
+        return bitmap
+
+    @staticmethod
+    def year_bit(day):
+        """Bit index of a date within its own year's bitset."""
+        return day.timetuple().tm_yday - 1
+
+    def offset(self, day):
+        return (day - self.origin).days
+
+    def day(self, offset):
+        return self.origin + timedelta(days=offset)
+
+    def __contains__(self, day):
+        offset = self.offset(day)
+        return offset >= 0 and bool(self.bits >> offset & 1)
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def dates(self):
+        """Yields the logged dates in ascending order."""
+        bits = self.bits
+        while bits:
+            low = bits & -bits
+            offset = low.bit_length() - 1
+            yield self.day(offset)
+            bits ^= low
+
+    def first_date(self):
+        return self.day((self.bits & -self.bits).bit_length() - 1) if self.bits else None
+
+    def last_date(self):
+        return self.day(self.bits.bit_length() - 1) if self.bits else None
+
+    def count_between(self, start, end):
+        """Number of logged days from `start` through `end`."""
+        low, high = max(self.offset(start), 0), self.offset(end)
+        if high < low:
+            return 0
+        return (self.bits >> low & ((1 << (high - low + 1)) - 1)).bit_count()
+
+    def until(self, day):
+        """A copy holding only the dates on or before `day`."""
+        offset = self.offset(day)
+        if offset < 0:
+            return HistoryBitmap(self.origin)
+        return HistoryBitmap(self.origin, self.bits & ((1 << (offset + 1)) - 1))
+
+    def run_ending_at(self, day):
+        """Number of consecutive logged days ending on `day`."""
+        offset = self.offset(day)
+        if offset < 0:
+            return 0
+        gaps = ~self.bits & ((1 << (offset + 1)) - 1)
+        if not gaps:
+            return offset + 1
+        return offset - (gaps.bit_length() - 1)
+
+    def longest_run(self):
+        return longest_run_of_ones(self.bits)
+
+    def longest_gap(self):
+        """Largest number of unlogged days between two logged days."""
+        if not self.bits:
+            return 0
+        low = (self.bits & -self.bits).bit_length() - 1
+        span = (1 << self.bits.bit_length()) - (1 << low)
+        return longest_run_of_ones(~self.bits & span)
+
+    def build_streaks(self, today):
+        """Current and longest streaks for a 'BUILD' habit, matching streaks.build_streaks."""
+        last = self.last_date()
+        if last is None:
+            return 0, 0
+        current_streak = 0
+        # A streak is only "current" if the last log was today or yesterday
+        if last == today or last == today - timedelta(days=1):
+            current_streak = self.run_ending_at(last)
+        return current_streak, self.longest_run()
+
+    def quit_streaks(self, start_date, today):
+        """Current and longest clean streaks for a 'QUIT' habit, matching streaks.quit_streaks."""
+        relapses = self.until(today)  # Ignore future dates
+        last = relapses.last_date()
+        if last is None:
+            current_streak = (today - start_date).days + 1
+            return current_streak, current_streak
+
+        current_streak = (today - last).days
+        longest_streak = max(
+            0,
+            (relapses.first_date() - start_date).days,
+            relapses.longest_gap(),
+            current_streak - 1,
+        )
+        return current_streak, longest_streak
+
+    def streaks(self, habit, today):
+        if habit.habit_type == 'BUILD':
+            return self.build_streaks(today)
+        return self.quit_streaks(habit.created_at.date(), today)
@@ -0,0 +1,65 @@
+from datetime import datetime, time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date
+from rest_framework import response, status
+
+
+def day_start(today):
+    """Streaks move at midnight even without writes, so nothing is older than the start of today."""
+    return timezone.make_aware(datetime.combine(today, time.min))
+
+
+def conditional_headers(*, key, version, last_modified, today):
+    """ETag, Last-Modified and Cache-Control for a payload that depends only on `version` and the date."""
+    return {
+        'ETag': f'"{key}-{version}-{today.isoformat()}"',
+        'Last-Modified': http_date(int(max(last_modified, day_start(today)).timestamp())),
+        # Clients may keep the payload but must revalidate before reusing it
+        'Cache-Control': 'private, no-cache',
+    }
+
+
+def not_modified_response(request, headers):
+    """A 304 when the request's If-None-Match/If-Modified-Since still match `headers`, else None."""
+    not_modified = get_conditional_response(
+        request, etag=headers['ETag'], last_modified=parse_http_date(headers['Last-Modified'])
+    )
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+    return not_modified
+
+
+def payload_cache_key(request, *, key, version, today):
+    """The cache key of a rendered payload, or None when HABIT_RESPONSE_CACHE_TIMEOUT is off."""
+    if not settings.HABIT_RESPONSE_CACHE_TIMEOUT:
+        return None
+    query = md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()
+    return f'habits:response:{key}:{version}:{today.isoformat()}:{query}'
+
+
+def versioned_response(request, *, key, version, last_modified, today, build):
+    """
+    Serves a read-only payload whose content depends only on `version` and the current date.
+
+    An If-None-Match/If-Modified-Since that still matches gets a 304 before `build` runs. Otherwise the
+    payload is built, or taken from the cache when HABIT_RESPONSE_CACHE_TIMEOUT is set, under a key
+    that includes the version, so writes never need to invalidate anything.
+    """
+    headers = conditional_headers(key=key, version=version, last_modified=last_modified, today=today)
+    not_modified = not_modified_response(request, headers)
+    if not_modified is not None:
+        return not_modified
+
+    cache_key = payload_cache_key(request, key=key, version=version, today=today)
+    data = cache.get(cache_key) if cache_key else None
+    if data is None:
+        data = build()
+        if cache_key:
+            cache.set(cache_key, data, settings.HABIT_RESPONSE_CACHE_TIMEOUT)
+    return response.Response(data, status=status.HTTP_200_OK, headers=headers)
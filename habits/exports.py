@@ -0,0 +1,58 @@
+from django.db.models import Q
+from rest_framework import serializers
+
+from .models import Habit, HabitLog
+
+HABIT_EXPORT_FIELDS = ('id', 'name', 'description', 'habit_type', 'created_at')
+EXPORT_COLUMNS = ('type', 'habit_id', 'name', 'description', 'habit_type', 'created_at', 'completion_date')
+
+
+def after(keys, values):
+    """Rows ordered after `values` on the `keys` columns: (k1, k2) > (v1, v2), as a filter."""
+    condition = Q()
+    for index, key in enumerate(keys):
+        condition |= Q(**dict(zip(keys[:index], values[:index])), **{f'{key}__gt': values[index]})
+    return condition
+
+
+def keyset_iterator(queryset, fields, chunk_size=2000, keys=('pk',)):
+    """
+    Yields value tuples of `fields`, which start with the unique `keys`, in key order, one chunk per
+    query. Each chunk seeks past the last key seen instead of using OFFSET, so every query costs the same.
+    """
+    queryset = queryset.order_by(*keys)
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(after(keys, last))
+        rows = list(chunk.values_list(*fields)[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][:len(keys)]
+
+
+def export_records(user, since=None, chunk_size=2000):
+    """
+    Every habit and log of `user` as flat export records: habits first, then logs.
+    With `since`, only habits created and logs completed on or after that date are included.
+    """
+    created_at = serializers.DateTimeField()
+    completion_date = serializers.DateField()
+
+    habits = Habit.objects.filter(user=user)
+    # Resolved up front, so the logs are read along the unique (habit, completion_date) index without a join
+    logs = HabitLog.objects.filter(habit_id__in=list(habits.values_list('pk', flat=True)))
+    if since is not None:
+        habits = habits.filter(created_at__date__gte=since)
+        logs = logs.filter(completion_date__gte=since)
+
+    for pk, name, description, habit_type, created in keyset_iterator(
+        habits, ('pk',) + HABIT_EXPORT_FIELDS[1:], chunk_size
+    ):
+        yield {
+            'type': 'habit', 'habit_id': pk, 'name': name, 'description': description,
+            'habit_type': habit_type, 'created_at': created_at.to_representation(created),
+        }
+    log_keys = ('habit_id', 'completion_date')
+    for habit_id, day in keyset_iterator(logs, log_keys, chunk_size, keys=log_keys):
+        yield {'type': 'log', 'habit_id': habit_id, 'completion_date': completion_date.to_representation(day)}
@@ -0,0 +1,249 @@
+"""
+Per-request performance instrumentation.
+
+When HABIT_PERF_INSTRUMENTATION is on, PerformanceMiddleware records for every request the number of
+SQL queries and the time spent in the database, in authentication, in rendering (serialization) and
+in the rest of the view. The phases go out as a Server-Timing header and into in-process histograms
+served in Prometheus text format by `metrics_view`, to scrapers that send HABIT_METRICS_TOKEN as a
+bearer token. When it is off, the middleware removes itself at
+startup and costs nothing.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+# Upper bounds in seconds, as Prometheus expects
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """Accumulates the time of each phase of one request, in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {'db': 0.0, 'auth': 0.0, 'render': 0.0}
+        self.queries = 0
+
+    def add(self, phase, seconds):
+        self.phases[phase] += seconds
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.phases['db'] += time.perf_counter() - started
+            self.queries += 1
+
+    def finish(self):
+        """Closes the request and returns every phase, including the untracked rest as 'view'."""
+        total = time.perf_counter() - self.started
+        phases = dict(self.phases)
+        phases['view'] = max(0.0, total - sum(phases.values()))
+        phases['total'] = total
+        return phases
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper that counts the query against the request being timed, if any. It stays on each
+    connection, installed from the thread that opens or uses it, rather than being wrapped around
+    the request: under ASGI the ORM runs in sync_to_async threads whose connections the event loop's
+    thread never sees, while the request's timings reach those threads through the context.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.db_wrapper(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def install_query_recorders(**kwargs):
+    # Sync request_started receivers run in the thread that then runs the view's queries
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+
+
+class timed:
+    """Context manager that adds its duration to a phase of the current request, if one is being timed."""
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.timings = current_timings.get()
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self.timings is not None:
+            self.timings.add(self.phase, time.perf_counter() - self.started)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Thread-safe, in-process request metrics. Each server process keeps and serves its own."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.durations = {}
+        self.queries = {}
+        self.requests = {}
+
+    def record(self, view, method, status_code, phases, queries):
+        with self.lock:
+            for phase, seconds in phases.items():
+                self.durations.setdefault((view, phase), Histogram(DURATION_BUCKETS)).observe(seconds)
+            self.queries.setdefault((view,), Histogram(QUERY_BUCKETS)).observe(queries)
+            key = (view, method, str(status_code))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            lines += [
+                '# HELP habit_requests_total Requests handled, by view, method and status.',
+                '# TYPE habit_requests_total counter',
+            ]
+            for (view, method, code), count in sorted(self.requests.items()):
+                lines.append(f'habit_requests_total{{view="{view}",method="{method}",status="{code}"}} {count}')
+            lines += self.render_histograms(
+                'habit_request_duration_seconds', 'Time spent per request phase.', ('view', 'phase'), self.durations
+            )
+            lines += self.render_histograms(
+                'habit_request_queries', 'SQL queries per request.', ('view',), self.queries
+            )
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def render_histograms(name, help_text, label_names, histograms):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for key, histogram in sorted(histograms.items()):
+            labels = ','.join(f'{label}="{value}"' for label, value in zip(label_names, key))
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+registry = MetricsRegistry()
+
+
+def view_label(request):
+    """'DashboardView', or 'HabitViewSet.list' for viewset actions; 'unmatched' for 404s."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    cls = getattr(match.func, 'cls', None)
+    if cls is None:
+        return match.url_name or match.func.__name__
+    actions = getattr(match.func, 'actions', None)
+    if actions and request.method.lower() in actions:
+        return f'{cls.__name__}.{actions[request.method.lower()]}'
+    return cls.__name__
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.HABIT_PERF_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_recorder, dispatch_uid='habits.instrumentation')
+        request_started.connect(install_query_recorders, dispatch_uid='habits.instrumentation')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        phases = timings.finish()
+        response['Server-Timing'] = ', '.join(
+            [f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in phases.items()]
+            + [f'queries;desc="{timings.queries} queries"']
+        )
+        if request.path != '/metrics':
+            registry.record(view_label(request), request.method, response.status_code, phases, timings.queries)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that as serialization
+        render = response.render
+
+        def timed_render():
+            with timed('render'):
+                return render()
+
+        response.render = timed_render
+        return response
+
+
+class TimedAuthenticationMixin:
+    """Counts DRF's authentication step as the 'auth' phase of the request."""
+
+    def perform_authentication(self, request):
+        with timed('auth'):
+            super().perform_authentication(request)
+
+
+def metrics_view(request):
+    """The metrics of this process in Prometheus text format, for requests bearing HABIT_METRICS_TOKEN."""
+    if not settings.HABIT_PERF_INSTRUMENTATION:
+        raise Http404
+    # Without a token configured nobody gets in
+    token = settings.HABIT_METRICS_TOKEN
+    if not token or not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,119 @@
+"""
+Streak leaderboards, one per habit type and metric.
+
+The rankings live in the LeaderboardEntry table, which the `build_leaderboards` command rebuilds
+off the request path, e.g. from cron every few minutes and right after midnight. Alongside it the
+command stores LeaderboardBucket rows, the number of habits at each streak value. Requests only
+read the two: top-K is one indexed query over the entries, and a rank or percentile adds up the
+buckets, one row per distinct streak value however many habits share it.
+
+The trade-off is freshness. Other habits' streaks are as of the last build, and only deleting a
+habit updates the tables in between. A habit's own rank is worked out from its live streaks, so it
+is current even between builds.
+"""
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Habit, LeaderboardBucket, LeaderboardEntry
+from .streaks import streaks_for_habits
+
+HABIT_TYPES = tuple(Habit.HabitType.values)
+METRICS = ('current', 'longest')
+
+
+class Ranking:
+    """The stored streak values of one habit type and metric, ranked highest first."""
+
+    def __init__(self, habit_type, metric):
+        self.entries = LeaderboardEntry.objects.filter(habit_type=habit_type)
+        self.buckets = LeaderboardBucket.objects.filter(habit_type=habit_type, metric=metric)
+        self.field = f'{metric}_streak'
+
+    def __len__(self):
+        return self.buckets.aggregate(total=Sum('habits'))['total'] or 0
+
+    def top(self, k):
+        """The best `k` (habit_id, value, rank) triples; tied values share a rank."""
+        rows = self.entries.order_by(f'-{self.field}', 'habit_id').values_list('habit_id', self.field)[:k]
+        top, ranks = [], {}
+        for position, (habit_id, value) in enumerate(rows, start=1):
+            # Every higher value comes earlier in the list, so a value's rank is where it first appears
+            top.append((habit_id, value, ranks.setdefault(value, position)))
+        return top
+
+    def position(self, habit_id, value):
+        """
+        The rank, total and percentile of `habit_id` with streak `value`, counting it once at that
+        value whatever its stored entry says. The percentile is the share of habits below it,
+        counting ties as half.
+        """
+        stored = self.entries.filter(habit_id=habit_id).values_list(self.field, flat=True).first()
+        counts = self.buckets.aggregate(
+            everyone=Sum('habits', default=0),
+            above=Sum('habits', filter=Q(streak__gt=value), default=0),
+            ties=Sum('habits', filter=Q(streak=value), default=0),
+        )
+        # Take the habit's stored entry out of the counts, then count it at `value`
+        others = counts['everyone'] - (stored is not None)
+        above = counts['above'] - (stored is not None and stored > value)
+        ties = counts['ties'] - (stored == value)
+        total = others + 1
+        below = others - above - ties
+        return {
+            'streak': value,
+            'rank': above + 1,
+            'total': total,
+            'percentile': round(100 * (below + (ties + 1) / 2) / total, 1),
+        }
+
+
+def build_chunk(habit_ids, today, built_at):
+    """Computes and upserts the entries of the given habits. Returns how many were written."""
+    habits = list(Habit.objects.filter(pk__in=habit_ids).select_related('streak_summary').only(
+        'id', 'habit_type', 'created_at', 'streak_summary',
+    ))
+    streaks = streaks_for_habits(habits, today)
+    LeaderboardEntry.objects.bulk_create(
+        [
+            LeaderboardEntry(
+                habit_id=habit.id, habit_type=habit.habit_type,
+                current_streak=streaks[habit.id][0], longest_streak=streaks[habit.id][1], built_at=built_at,
+            )
+            for habit in habits
+        ],
+        update_conflicts=True,
+        unique_fields=['habit'],
+        update_fields=['habit_type', 'current_streak', 'longest_streak', 'built_at'],
+    )
+    return len(habits)
+
+
+def build_leaderboards(today, chunk_size=1000):
+    """
+    Rebuilds every entry in chunks of `chunk_size` habits, then drops those of habits that are gone.
+    Returns the number of entries written and removed.
+    """
+    built_at = timezone.now()
+    habit_ids = list(Habit.objects.order_by('id').values_list('id', flat=True))
+    written = 0
+    for start in range(0, len(habit_ids), chunk_size):
+        written += build_chunk(habit_ids[start:start + chunk_size], today, built_at)
+    removed, _ = LeaderboardEntry.objects.filter(built_at__lt=built_at).delete()
+    build_buckets()
+    return written, removed
+
+
+def build_buckets():
+    """Replaces the rank counts with fresh ones from the entries, in one transaction."""
+    buckets = []
+    for metric in METRICS:
+        field = f'{metric}_streak'
+        rows = LeaderboardEntry.objects.values_list('habit_type', field).annotate(habits=Count('pk')).order_by()
+        buckets.extend(
+            LeaderboardBucket(habit_type=habit_type, metric=metric, streak=streak, habits=habits)
+            for habit_type, streak, habits in rows
+        )
+    with transaction.atomic():
+        LeaderboardBucket.objects.all().delete()
+        LeaderboardBucket.objects.bulk_create(buckets)
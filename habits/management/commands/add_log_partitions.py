@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from habits.partitions import add_year_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the yearly HabitLog partitions for the coming years on PostgreSQL, moving any of their "
+        "logs out of the default partition. Run it once a year, ahead of the new year."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years-ahead', type=int, default=1,
+                            help='How many years after the current one to create partitions for.')
+
+    def handle(self, *args, **options):
+        if not is_partitioned(connection):
+            self.stdout.write("HabitLog is not partitioned on this database; nothing to do.")
+            return
+        this_year = date.today().year
+        created = add_year_partitions(connection, range(this_year, this_year + options['years_ahead'] + 1))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(created)} partitions: {', '.join(created)}." if created else "All partitions exist already."
+        ))
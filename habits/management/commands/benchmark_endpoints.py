@@ -0,0 +1,185 @@
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import nullcontext
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from habits.models import Habit
+
+# Metrics compared against a baseline; a run fails when any grows by more than the threshold
+REGRESSION_METRICS = ('p50_ms', 'p90_ms', 'queries_max', 'peak_memory_kb')
+
+# --authentication choices: 'force' skips authentication; the others send real bearer tokens
+AUTHENTICATION_CLASSES = {
+    'jwt': 'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'cached': 'habits.authentication.CachedJWTAuthentication',
+}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures latency percentiles, SQL query counts and peak memory per endpoint against seeded data "
+        "(see seed_habits), writes machine-readable results and optionally fails on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench', help='Username prefix used by seed_habits.')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per endpoint.')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only run the named endpoint (may be repeated).')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative growth over the baseline before the run fails.')
+        parser.add_argument('--authentication', choices=['force', *AUTHENTICATION_CLASSES], default='force',
+                            help="How requests authenticate: 'force' skips it, 'jwt' uses the stock simplejwt "
+                                 "class, 'cached' uses CachedJWTAuthentication.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def endpoints(self):
+        """name -> callable(client, user, habit, iteration) making one request."""
+        today = date.today()
+        return {
+            'dashboard': lambda client, user, habit, n: client.get('/api/dashboard/'),
+            'habit_list': lambda client, user, habit, n: client.get('/api/habits/'),
+            'stats': lambda client, user, habit, n: client.get(f'/api/habits/{habit.id}/stats/'),
+            'stats_no_logs': lambda client, user, habit, n: client.get(f'/api/habits/{habit.id}/stats/?include_logs=false'),
+            'calendar': lambda client, user, habit, n: client.get(f'/api/habits/{habit.id}/calendar/?period=week'),
+            # Future dates never collide with seeded history; writes are rolled back after the run
+            'log': lambda client, user, habit, n: client.post(
+                f'/api/habits/{habit.id}/log/', {'completion_date': today + timedelta(days=1000 + n)}
+            ),
+        }
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(username__startswith=f"{options['prefix']}_"))
+        habits = {}
+        for habit in Habit.objects.filter(user__in=users).only('id', 'user_id'):
+            habits.setdefault(habit.user_id, []).append(habit)
+        users = [user for user in users if user.id in habits]
+        if not users:
+            raise CommandError(f"No seeded data for prefix '{options['prefix']}'; run seed_habits first.")
+
+        endpoints = self.endpoints()
+        selected = options['endpoints'] or list(endpoints)
+        unknown = set(selected) - set(endpoints)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+        rng = random.Random(options['seed'])
+        client = APIClient(SERVER_NAME='localhost')
+        results = {}
+        authentication = options['authentication']
+        if authentication == 'force':
+            self.authenticate = lambda user: client.force_authenticate(user=user)
+            auth_classes = nullcontext()
+        else:
+            tokens = {user.id: str(RefreshToken.for_user(user).access_token) for user in users}
+            self.authenticate = lambda user: client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens[user.id]}')
+            # Views copy the authentication classes from the settings when they are defined
+            auth_classes = patch.object(
+                APIView, 'authentication_classes', [import_string(AUTHENTICATION_CLASSES[authentication])]
+            )
+        with auth_classes, transaction.atomic():
+            for name in selected:
+                results[name] = self.measure(client, endpoints[name], users, habits, rng, options)
+                self.stdout.write(
+                    f"{name:<14} p50 {results[name]['p50_ms']:8.2f}ms  p90 {results[name]['p90_ms']:8.2f}ms  "
+                    f"p99 {results[name]['p99_ms']:8.2f}ms  queries {results[name]['queries_mean']:6.2f} "
+                    f"(max {results[name]['queries_max']:>3})  "
+                    f"peak {results[name]['peak_memory_kb']:>8.1f}KB"
+                )
+            transaction.set_rollback(True)
+
+        report = {
+            'meta': {
+                'date': date.today().isoformat(),
+                'vendor': connection.vendor,
+                'users': len(users),
+                'habits': sum(len(h) for h in habits.values()),
+                'requests': options['requests'],
+                'authentication': authentication,
+            },
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)['endpoints']
+            regressions = self.regressions(baseline, results, options['threshold'])
+            if regressions:
+                raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def measure(self, client, request, users, habits, rng, options):
+        def one(n):
+            user = rng.choice(users)
+            self.authenticate(user)
+            response = request(client, user, rng.choice(habits[user.id]), n)
+            if response.status_code >= 400:
+                raise CommandError(f"Request failed with {response.status_code}: {response.content[:200]!r}")
+            return response
+
+        for n in range(options['warmup']):
+            one(n)
+
+        latencies, queries = [], []
+        for n in range(options['warmup'], options['warmup'] + options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                one(n)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+
+        # Memory is traced in a separate pass, since tracing slows every allocation down
+        tracemalloc.start()
+        for n in range(options['warmup'] + options['requests'], options['warmup'] + options['requests'] + 5):
+            one(n)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'requests': len(latencies),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p90_ms': round(percentile(latencies, 90), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries_mean': round(statistics.fmean(queries), 2),
+            'queries_max': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    @staticmethod
+    def regressions(baseline, results, threshold):
+        found = []
+        for name, metrics in results.items():
+            for metric in REGRESSION_METRICS:
+                before = baseline.get(name, {}).get(metric)
+                if before is None:
+                    continue
+                after = metrics[metric]
+                if after > before * (1 + threshold):
+                    found.append(f"{name}.{metric}: {before} -> {after}")
+        return found
@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from habits.leaderboard import build_leaderboards
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every habit's streaks into the leaderboard table that the leaderboard and rank "
+        "endpoints read. Schedule it every few minutes and right after midnight, when current streaks change."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Habits per chunk.')
+
+    def handle(self, *args, **options):
+        written, removed = build_leaderboards(date.today(), chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Ranked {written} habits and removed {removed} stale entries."
+        ))
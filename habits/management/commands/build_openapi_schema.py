@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from habits.schema import build_artifacts, code_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the OpenAPI schema of the running code to HABIT_SCHEMA_DIR, as YAML and JSON with gzipped "
+        "copies, for /api/schema/ to serve without introspecting the API. Run it at build time."
+    )
+
+    def handle(self, *args, **options):
+        artifacts = build_artifacts()
+        for artifact in artifacts.values():
+            artifact.save()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote the {', '.join(artifacts)} schema for code version {code_version()} to "
+            f"{settings.HABIT_SCHEMA_DIR}."
+        ))
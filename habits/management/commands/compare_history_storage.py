@@ -0,0 +1,81 @@
+import json
+import random
+import timeit
+import tracemalloc
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from habits.bitmaps import YEAR_BYTES, HistoryBitmap
+from habits.streaks import build_streaks, quit_streaks
+
+# Rough per-row cost of a HabitLog in PostgreSQL: tuple header, id, habit_id, date, plus the unique index entry
+HABITLOG_ROW_BYTES = 24 + 8 + 8 + 4 + 32
+HABITYEARBITMAP_ROW_BYTES = 24 + 8 + 8 + 2 + YEAR_BYTES + 24
+
+
+def allocated_bytes(build):
+    """Peak bytes allocated while building (and holding) one in-memory history."""
+    tracemalloc.start()
+    value = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return peak
+
+
+class Command(BaseCommand):
+    help = "Compares memory use and streak latency of HabitLog date sets against the bitmap history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, nargs='+', default=[1, 3, 5, 10],
+                            help='History lengths to compare, in years.')
+        parser.add_argument('--density', type=float, default=0.8,
+                            help='Share of days that have a log.')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Timing repetitions per measurement.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='Emit the results as JSON.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        today = date.today()
+        results = []
+        for years in options['years']:
+            start = today - timedelta(days=365 * years)
+            dates = [start + timedelta(days=n) for n in range((today - start).days + 1)
+                     if rng.random() < options['density']]
+            bitmap = HistoryBitmap.from_dates(dates)
+            ordinals = [day.toordinal() for day in dates]
+            year_rows = {}
+            for day in dates:
+                year_rows[day.year] = year_rows.get(day.year, 0) | 1 << HistoryBitmap.year_bit(day)
+            year_rows = [(year, bits.to_bytes(YEAR_BYTES, 'little')) for year, bits in year_rows.items()]
+            repeat = options['repeat']
+
+            results.append({
+                'years': years,
+                'logs': len(dates),
+                'db_bytes_habitlog': len(dates) * HABITLOG_ROW_BYTES,
+                'db_bytes_bitmap': len(year_rows) * HABITYEARBITMAP_ROW_BYTES,
+                # What a read materializes: one date object per log, or one int per habit
+                'memory_bytes_dates': allocated_bytes(lambda: {date.fromordinal(n) for n in ordinals}),
+                'memory_bytes_bitmap': allocated_bytes(lambda: HistoryBitmap.from_years(year_rows)),
+                'build_ms_dates': timeit.timeit(lambda: build_streaks(dates, today), number=repeat) * 1000 / repeat,
+                'build_ms_bitmap': timeit.timeit(lambda: bitmap.build_streaks(today), number=repeat) * 1000 / repeat,
+                'quit_ms_dates': timeit.timeit(lambda: quit_streaks(dates, start, today), number=repeat) * 1000 / repeat,
+                'quit_ms_bitmap': timeit.timeit(lambda: bitmap.quit_streaks(start, today), number=repeat) * 1000 / repeat,
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for row in results:
+            self.stdout.write(
+                f"{row['years']:>3}y {row['logs']:>6} logs | "
+                f"storage {row['db_bytes_habitlog']:>9,}B rows vs {row['db_bytes_bitmap']:>6,}B bitmap | "
+                f"memory {row['memory_bytes_dates']:>9,}B vs {row['memory_bytes_bitmap']:>6,}B | "
+                f"build {row['build_ms_dates']:.3f}ms vs {row['build_ms_bitmap']:.3f}ms | "
+                f"quit {row['quit_ms_dates']:.3f}ms vs {row['quit_ms_bitmap']:.3f}ms"
+            )
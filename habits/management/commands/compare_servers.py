@@ -0,0 +1,178 @@
+import importlib.util
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from habits.models import Habit
+
+from .benchmark_endpoints import percentile
+
+# name -> (gunicorn arguments, {endpoint: path template}); each server serves its own kind of views
+SERVERS = {
+    'wsgi': (
+        ['config.wsgi:application', '--worker-class', 'sync'],
+        {'dashboard': '/api/dashboard/', 'stats': '/api/habits/{habit}/stats/'},
+    ),
+    'asgi': (
+        ['config.asgi:application', '--worker-class', 'uvicorn.workers.UvicornWorker'],
+        {'dashboard': '/api/async/dashboard/', 'stats': '/api/async/habits/{habit}/stats/'},
+    ),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts the app under gunicorn's sync WSGI workers and under gunicorn with uvicorn ASGI workers, "
+        "at the same worker count, and load-tests the dashboard and stats endpoints on both "
+        "against seeded data (see seed_habits)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench', help='Username prefix used by seed_habits.')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per server.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at once.')
+        parser.add_argument('--requests', type=int, default=500, help='Timed requests per endpoint and server.')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per endpoint and server.')
+        parser.add_argument('--server', action='append', dest='servers', choices=list(SERVERS),
+                            help='Only run the named server (may be repeated).')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        servers = options['servers'] or list(SERVERS)
+        for module in ['gunicorn'] + (['uvicorn'] if 'asgi' in servers else []):
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f"{module} is not installed; see requirements.txt.")
+
+        users = list(User.objects.filter(username__startswith=f"{options['prefix']}_", habit__isnull=False).distinct())
+        if not users:
+            raise CommandError(f"No seeded data for prefix '{options['prefix']}'; run seed_habits first.")
+        habits = {}
+        for habit in Habit.objects.filter(user__in=users).only('id', 'user_id'):
+            habits.setdefault(habit.user_id, []).append(habit.id)
+        tokens = {user.id: str(RefreshToken.for_user(user).access_token) for user in users}
+
+        rng = random.Random(options['seed'])
+        total = options['warmup'] + options['requests']
+        # The same (user, habit) sequence is replayed against every server
+        plan = []
+        for _ in range(total):
+            user_id = rng.choice(list(tokens))
+            plan.append((tokens[user_id], rng.choice(habits[user_id])))
+
+        results = {}
+        for name in servers:
+            gunicorn_args, paths = SERVERS[name]
+            with self.serve(gunicorn_args, options['workers']) as base_url:
+                results[name] = {
+                    endpoint: self.load(base_url, path, plan, options)
+                    for endpoint, path in paths.items()
+                }
+            for endpoint, metrics in results[name].items():
+                self.stdout.write(
+                    f"{name:<5} {endpoint:<10} {metrics['rps']:8.1f} req/s  p50 {metrics['p50_ms']:8.2f}ms  "
+                    f"p90 {metrics['p90_ms']:8.2f}ms  p99 {metrics['p99_ms']:8.2f}ms  errors {metrics['errors']}"
+                )
+
+        if options['output']:
+            report = {
+                'meta': {
+                    'date': date.today().isoformat(),
+                    'workers': options['workers'],
+                    'concurrency': options['concurrency'],
+                    'requests': options['requests'],
+                    'vendor': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+                },
+                'servers': results,
+            }
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+
+    @contextmanager
+    def serve(self, gunicorn_args, workers):
+        """Runs gunicorn on a free local port for the duration of the block and yields its base URL."""
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *gunicorn_args,
+             '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+            env={**os.environ, 'DEBUG': 'False'},
+        )
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            self.wait_until_ready(base_url, process)
+            yield base_url
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    @staticmethod
+    def wait_until_ready(base_url, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"Server exited with {process.returncode} before accepting requests.")
+            try:
+                urllib.request.urlopen(f'{base_url}/api/dashboard/', timeout=1)
+            except urllib.error.HTTPError:
+                return  # 401: the app is up
+            except OSError:
+                time.sleep(0.2)
+            else:
+                return
+        raise CommandError(f"Server did not start within {timeout}s.")
+
+    @staticmethod
+    def request(base_url, path, token, habit_id):
+        request = urllib.request.Request(
+            base_url + path.format(habit=habit_id), headers={'Authorization': f'Bearer {token}'}
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                ok = response.status < 400
+        except OSError:
+            ok = False
+        return (time.perf_counter() - started) * 1000, ok
+
+    def load(self, base_url, path, plan, options):
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            warmup, timed = plan[:options['warmup']], plan[options['warmup']:]
+            list(pool.map(lambda job: self.request(base_url, path, *job), warmup))
+            started = time.perf_counter()
+            outcomes = list(pool.map(lambda job: self.request(base_url, path, *job), timed))
+            elapsed = time.perf_counter() - started
+
+        latencies = [latency for latency, ok in outcomes if ok]
+        if not latencies:
+            raise CommandError(f"Every request to {path} failed.")
+        return {
+            'requests': len(outcomes),
+            'errors': len(outcomes) - len(latencies),
+            'rps': round(len(outcomes) / elapsed, 1),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p90_ms': round(percentile(latencies, 90), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+        }
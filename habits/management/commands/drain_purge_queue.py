@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from habits.models import PurgeJob
+from habits.purge import drain
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the rows of deleted habits and accounts queued as purge jobs, a chunk at a time, each "
+        "chunk in its own transaction. Progress is saved with every chunk, so the command can be stopped "
+        "and run again, and several copies can run at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows deleted per transaction.')
+        parser.add_argument('--max-chunks', type=int, default=None,
+                            help='Stop after this many chunks, leaving the rest for the next run.')
+
+    def handle(self, *args, **options):
+        finished, rows = drain(options['chunk_size'], options['max_chunks'])
+        pending = PurgeJob.objects.filter(finished_at__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Finished {finished} purge jobs and deleted {rows} rows; {pending} jobs still pending."
+        ))
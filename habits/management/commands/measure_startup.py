@@ -0,0 +1,140 @@
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .benchmark_endpoints import percentile
+from .compare_servers import free_port
+
+# name -> environment for gunicorn.conf.py; "cold" is gunicorn without preloading or warmup
+PROFILES = {
+    'cold': {'GUNICORN_PRELOAD': 'False', 'GUNICORN_WARMUP': 'False'},
+    'warm': {'GUNICORN_PRELOAD': 'True', 'GUNICORN_WARMUP': 'True'},
+}
+
+SETUP_SCRIPT = """
+import time
+started = time.perf_counter()
+import django
+django.setup()
+setup_ms = round((time.perf_counter() - started) * 1000, 2)
+from config.warmup import load_app
+print(setup_ms, load_app())
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures how long a fresh process takes to set up Django and load the app, and how long gunicorn "
+        "(with gunicorn.conf.py and the production settings) takes to start listening and to answer its "
+        "first authenticated request, with and without preloading and worker warmup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench', help='Username prefix used by seed_habits.')
+        parser.add_argument('--runs', type=int, default=3, help='Server starts per profile.')
+        parser.add_argument('--requests', type=int, default=20, help='Requests after the first, for the steady state.')
+        parser.add_argument('--settle', type=float, default=3.0,
+                            help='Seconds to wait after the server listens, so the worker has booted.')
+        parser.add_argument('--profile', action='append', dest='profiles', choices=list(PROFILES),
+                            help='Only run the named profile (may be repeated).')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username__startswith=f"{options['prefix']}_", habit__isnull=False).first()
+        if user is None:
+            raise CommandError(f"No seeded data for prefix '{options['prefix']}'; run seed_habits first.")
+        token = str(RefreshToken.for_user(user).access_token)
+
+        setup_ms, load_ms = self.measure_setup()
+        self.stdout.write(f"django.setup() {setup_ms:8.2f}ms  load_app() {load_ms:8.2f}ms")
+
+        results = {'process': {'setup_ms': setup_ms, 'load_app_ms': load_ms}}
+        for name in options['profiles'] or list(PROFILES):
+            runs = [self.measure_server(PROFILES[name], token, options) for _ in range(options['runs'])]
+            results[name] = {
+                key: round(statistics.median(run[key] for run in runs), 2)
+                for key in ('listen_ms', 'first_request_ms', 'steady_p50_ms')
+            }
+            metrics = results[name]
+            self.stdout.write(
+                f"{name:<5} listening after {metrics['listen_ms']:8.1f}ms  first request {metrics['first_request_ms']:8.2f}ms  "
+                f"then p50 {metrics['steady_p50_ms']:8.2f}ms"
+            )
+
+        if options['output']:
+            report = {
+                'meta': {
+                    'date': date.today().isoformat(),
+                    'runs': options['runs'],
+                    'vendor': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+
+    @staticmethod
+    def environment(extra=()):
+        return {**os.environ, 'DJANGO_SETTINGS_MODULE': 'config.settings_production', **dict(extra)}
+
+    def measure_setup(self):
+        output = subprocess.run(
+            [sys.executable, '-c', SETUP_SCRIPT], cwd=settings.BASE_DIR, env=self.environment(),
+            capture_output=True, text=True, check=True,
+        ).stdout.split()
+        return float(output[-2]), float(output[-1])
+
+    def measure_server(self, profile, token, options):
+        port = free_port()
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+             'config.wsgi:application', '--workers', '1', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=self.environment(profile),
+        )
+        try:
+            listen_ms = self.wait_until_listening(port, process, started)
+            time.sleep(options['settle'])
+            base_url = f'http://127.0.0.1:{port}'
+            first = self.request(base_url, token)
+            steady = [self.request(base_url, token) for _ in range(options['requests'])]
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        return {'listen_ms': listen_ms, 'first_request_ms': first, 'steady_p50_ms': percentile(steady, 50)}
+
+    @staticmethod
+    def wait_until_listening(port, process, started, timeout=30):
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise CommandError(f"Server exited with {process.returncode} before listening.")
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            except OSError:
+                time.sleep(0.01)
+            else:
+                return (time.perf_counter() - started) * 1000
+        raise CommandError(f"Server did not start within {timeout}s.")
+
+    @staticmethod
+    def request(base_url, token):
+        request = urllib.request.Request(f'{base_url}/api/dashboard/', headers={'Authorization': f'Bearer {token}'})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+        except urllib.error.HTTPError as exc:
+            raise CommandError(f"The dashboard answered {exc.code}.")
+        return (time.perf_counter() - started) * 1000
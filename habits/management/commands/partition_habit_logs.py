@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from habits.partitions import partition_table, unpartition_table
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the HabitLog table as one partition per year on PostgreSQL, or back into a plain table "
+        "with --undo. Every log is copied while the table is locked, so run it in a maintenance window."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years-back', type=int, default=5,
+                            help='How many years before the current one get their own partition.')
+        parser.add_argument('--years-ahead', type=int, default=1,
+                            help='How many years after the current one get their own partition.')
+        parser.add_argument('--undo', action='store_true', help='Fold the partitions back into one table.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("HabitLog can only be partitioned on PostgreSQL.")
+        if options['undo']:
+            done = unpartition_table(connection)
+            self.stdout.write(self.style.SUCCESS("HabitLog is a plain table again.") if done else "HabitLog is not partitioned.")
+            return
+        years = partition_table(connection, options['years_back'], options['years_ahead'])
+        if years is None:
+            self.stdout.write("HabitLog is partitioned already.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Partitioned HabitLog by year, {years[0]} to {years[-1]}."))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from habits.sync import prune_journal
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes change journal entries older than --keep-days, a chunk at a time. Devices that last synced "
+        "before then are told to sync again from scratch. Schedule it daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=90, help='Days of changes to keep.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows deleted per statement.')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['keep_days'])
+        deleted = prune_journal(before, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} change journal entries from before {before:%Y-%m-%d}."))
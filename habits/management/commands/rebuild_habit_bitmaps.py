@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from habits.models import Habit, HabitYearBitmap
+
+
+class Command(BaseCommand):
+    help = "Rewrites the per-year bitmap history of every habit from its HabitLog rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habit', type=int, action='append', dest='habit_ids',
+                            help='Only rebuild the given habit id (may be repeated).')
+
+    def handle(self, *args, **options):
+        habits = Habit.objects.order_by('pk')
+        if options['habit_ids']:
+            habits = habits.filter(pk__in=options['habit_ids'])
+
+        count = 0
+        for habit_id in habits.values_list('pk', flat=True).iterator():
+            with transaction.atomic():
+                HabitYearBitmap.objects.rebuild(habit_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt bitmap history for {count} habits."))
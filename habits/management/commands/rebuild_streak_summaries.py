@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from habits.models import Habit, HabitStreakSummary
+
+SUMMARY_FIELDS = HabitStreakSummary.SUMMARY_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Rebuilds every habit's streak summary from its HabitLog rows (backfill and consistency check)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habit', type=int, action='append', dest='habit_ids',
+                            help='Only rebuild the given habit id (may be repeated).')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of habits loaded and written per transaction.')
+        parser.add_argument('--check', action='store_true',
+                            help='Report habits whose stored summary is missing or stale without writing.')
+
+    def handle(self, *args, **options):
+        habits = Habit.objects.order_by('pk')
+        if options['habit_ids']:
+            habits = habits.filter(pk__in=options['habit_ids'])
+        habit_ids = list(habits.values_list('pk', flat=True))
+        batch_size = options['batch_size']
+
+        rebuilt = stale = 0
+        for offset in range(0, len(habit_ids), batch_size):
+            batch = habit_ids[offset:offset + batch_size]
+            with transaction.atomic():
+                fresh = HabitStreakSummary.objects.build_many(batch)
+                stored = HabitStreakSummary.objects.select_for_update().in_bulk(batch)
+                changed = [
+                    summary for habit_id, summary in fresh.items()
+                    if habit_id not in stored or self.differs(summary, stored[habit_id])
+                ]
+                stale += len(changed)
+                for summary in changed:
+                    if options['check']:
+                        self.stdout.write(f"Habit {summary.habit_id}: summary is {'stale' if summary.habit_id in stored else 'missing'}")
+
+                if not options['check']:
+                    HabitStreakSummary.objects.bulk_create([s for s in changed if s.habit_id not in stored])
+                    HabitStreakSummary.objects.bulk_update(
+                        [s for s in changed if s.habit_id in stored], SUMMARY_FIELDS
+                    )
+                    rebuilt += len(changed)
+
+        if options['check']:
+            self.stdout.write(f"Checked {len(habit_ids)} habits, {stale} out of date.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Checked {len(habit_ids)} habits, rebuilt {rebuilt} summaries."))
+
+    @staticmethod
+    def differs(fresh, stored):
+        return any(getattr(fresh, field) != getattr(stored, field) for field in SUMMARY_FIELDS)
@@ -0,0 +1,102 @@
+import random
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from habits.models import Habit, HabitLog
+from habits.signals import logs_bulk_changed
+
+
+def synthetic_dates(rng, start, today, habit_type, density):
+    """
+    Yields log dates with realistic gaps: BUILD habits alternate runs of completions with lapses,
+    QUIT habits relapse now and then. `density` is roughly the share of days logged (BUILD) or
+    scales the relapse rate (QUIT).
+    """
+    day = start
+    if habit_type == 'BUILD':
+        logging = rng.random() < density
+        while day <= today:
+            if logging:
+                yield day
+            # Stay in the current state for a while, so streaks and gaps both have length
+            if rng.random() < (0.15 * (1 - density) if logging else 0.15 * density) + 0.02:
+                logging = not logging
+            day += timedelta(days=1)
+    else:
+        while True:
+            day += timedelta(days=1 + int(rng.expovariate(density / 10)))
+            if day > today:
+                return
+            yield day
+
+
+class Command(BaseCommand):
+    help = "Seeds synthetic users, habits and multi-year log histories for load tests and benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--habits', type=int, default=5, help='Habits per user.')
+        parser.add_argument('--years', type=float, default=2, help='Years of log history per habit.')
+        parser.add_argument('--density', type=float, default=0.7, help='Roughly the share of days logged.')
+        parser.add_argument('--prefix', default='bench', help='Username prefix for the seeded users.')
+        parser.add_argument('--password', default='benchmark-password')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        today = date.today()
+        start = today - timedelta(days=int(365 * options['years']))
+        prefix = options['prefix']
+
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            self.stderr.write(f"Users named {prefix}_* already exist; pick another --prefix.")
+            return
+
+        with transaction.atomic():
+            password = make_password(options['password'])
+            User.objects.bulk_create(
+                User(username=f'{prefix}_{n}', password=password) for n in range(options['users'])
+            )
+            users = list(User.objects.filter(username__startswith=f'{prefix}_'))
+
+            Habit.objects.bulk_create(
+                Habit(
+                    user=user,
+                    name=f'{prefix} habit {n}',
+                    habit_type=Habit.HabitType.QUIT if rng.random() < 0.3 else Habit.HabitType.BUILD,
+                )
+                for user in users for n in range(options['habits'])
+            )
+            habits = Habit.objects.filter(user__in=users)
+            # auto_now_add ignores explicit values, so backdate the habits afterwards
+            habits.update(created_at=timezone.make_aware(datetime.combine(start, time.min)))
+            habits = list(habits.only('id', 'habit_type'))
+
+            logs = (
+                HabitLog(habit_id=habit.id, completion_date=day)
+                for habit in habits
+                for day in synthetic_dates(rng, start, today, habit.habit_type, options['density'])
+            )
+            created = 0
+            while True:
+                batch = list(islice(logs, options['batch_size']))
+                if not batch:
+                    break
+                HabitLog.objects.bulk_create(batch, ignore_conflicts=True)
+                created += len(batch)
+
+            # bulk_create skips signals: build summaries and versions a chunk of habits at a time
+            habit_ids = [habit.id for habit in habits]
+            for offset in range(0, len(habit_ids), 500):
+                logs_bulk_changed.send(sender=HabitLog, habit_ids=habit_ids[offset:offset + 500])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users, {len(habits)} habits and {created} logs from {start} to {today}."
+        ))
@@ -0,0 +1,54 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from habits.snapshots import pending_habit_ids, snapshot_chunk
+
+
+def init_worker():
+    # Needed when the pool spawns fresh interpreters instead of forking this one
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes every habit's current and longest streak as of the end of a day to the daily snapshot table, "
+        "in chunks spread over a process pool. Habits already snapshotted for the day are skipped, "
+        "so an interrupted run can be restarted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, default=None,
+                            help='Day to snapshot, YYYY-MM-DD (default: today).')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes; 1 runs the chunks in this process.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Habits per chunk.')
+        parser.add_argument('--recompute', action='store_true',
+                            help='Also overwrite habits that already have a snapshot for the day.')
+
+    def handle(self, *args, **options):
+        day = options['date'] or date.today()
+        if day > date.today():
+            raise CommandError("Cannot snapshot a day that has not started yet.")
+        habit_ids = list(pending_habit_ids(day, recompute=options['recompute']))
+        size = options['chunk_size']
+        chunks = [habit_ids[i:i + size] for i in range(0, len(habit_ids), size)]
+
+        written = 0
+        if options['workers'] <= 1:
+            for chunk in chunks:
+                written += snapshot_chunk(chunk, day)
+        else:
+            # Forked workers must open their own connections rather than share this process's
+            connections.close_all()
+            with ProcessPoolExecutor(options['workers'], initializer=init_worker) as pool:
+                futures = [pool.submit(snapshot_chunk, chunk, day) for chunk in chunks]
+                for future in as_completed(futures):
+                    written += future.result()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshotted {written} habits for {day} in {len(chunks)} chunks."
+        ))
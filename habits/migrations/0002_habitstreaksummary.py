@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitStreakSummary',
+            fields=[
+                ('habit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='streak_summary', serialize=False, to='habits.habit')),
+                ('log_count', models.PositiveIntegerField(default=0)),
+                ('first_log_date', models.DateField(blank=True, null=True)),
+                ('last_log_date', models.DateField(blank=True, null=True)),
+                ('current_run_start', models.DateField(blank=True, null=True)),
+                ('longest_run_start', models.DateField(blank=True, null=True)),
+                ('longest_run_end', models.DateField(blank=True, null=True)),
+                ('longest_run', models.PositiveIntegerField(default=0)),
+                ('longest_gap', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0004_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStreakSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('current_streak', models.PositiveIntegerField()),
+                ('longest_streak', models.PositiveIntegerField()),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='habits.habit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='habits_dail_date_3eab4e_idx')],
+                'unique_together': {('habit', 'date')},
+            },
+        ),
+    ]
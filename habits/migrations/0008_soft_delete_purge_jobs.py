@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0007_habitlog_partitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PurgeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('habit', 'Habit'), ('user', 'User account')], max_length=5)),
+                ('target_pk', models.BigIntegerField()),
+                ('rows_deleted', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['finished_at', 'id'], name='habits_purg_finishe_4b75bf_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0008_soft_delete_purge_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['created_at'], name='habits_habi_created_0961fd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habitlog',
+            index=models.Index(fields=['completion_date'], name='habits_habi_complet_417873_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0009_admin_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('habit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to='habits.habit')),
+                ('habit_type', models.CharField(choices=[('BUILD', 'Build'), ('QUIT', 'Quit')], max_length=5)),
+                ('current_streak', models.PositiveIntegerField()),
+                ('longest_streak', models.PositiveIntegerField()),
+                ('built_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['habit_type', '-current_streak'], name='habits_lead_habit_t_b82d98_idx'), models.Index(fields=['habit_type', '-longest_streak'], name='habits_lead_habit_t_617b54_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0010_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdataversion',
+            name='pruned_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
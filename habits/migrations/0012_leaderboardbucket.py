@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0011_userdataversion_pruned_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('habit_type', models.CharField(choices=[('BUILD', 'Build'), ('QUIT', 'Quit')], max_length=5)),
+                ('metric', models.CharField(max_length=7)),
+                ('streak', models.PositiveIntegerField()),
+                ('habits', models.PositiveIntegerField()),
+            ],
+            options={
+                'unique_together': {('habit_type', 'metric', 'streak')},
+            },
+        ),
+    ]
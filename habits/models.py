@@ -1,7 +1,27 @@
-from django.db import models
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .bitmaps import YEAR_BYTES, HistoryBitmap
 
 from django.contrib.auth.models import User
 
+class HabitManager(models.Manager):
+    def bump_versions(self, habit_ids):
+        """Marks the given habits as changed, e.g. after their logs were written."""
+        return self.filter(pk__in=habit_ids).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+class LiveHabitManager(HabitManager):
+    """Habits that have not been deleted. Deleted ones only remain until the purge queue removes them."""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Habit(models.Model):
     class HabitType(models.TextChoices):
         BUILD = 'BUILD', 'Build'
@@ -16,18 +36,394 @@ class Habit(models.Model):
         default=HabitType.BUILD
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on every write to the habit or its logs; drives ETags and response caching
+    version = models.PositiveIntegerField(default=1)
+    # Set when the habit is deleted; its rows are removed later by a PurgeJob (see habits.purge)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveHabitManager()
+    all_objects = HabitManager()
+
+    class Meta:
+        indexes = [
+            # A user's habits, newest first, as the habit list pages through them
+            models.Index(fields=['user', '-created_at']),
+            # Date drill-down in the admin
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return self.name
 
 
 class HabitLog(models.Model):
-    habit = models.ForeignKey(Habit, on_delete=models.CASCADE)
+    # The unique (habit, completion_date) index serves lookups by habit, in either date order
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, db_index=False)
     completion_date = models.DateField()
 
     class Meta:
         #a user can only log a habit once per day
         unique_together = ('habit', 'completion_date')
+        # Date drill-down in the admin
+        indexes = [models.Index(fields=['completion_date'])]
+
+    def __str__(self):
+        return f"{self.habit.name} - {self.completion_date}"
+
+class HabitStreakSummaryManager(models.Manager):
+    def record_log(self, habit_id, completion_date):
+        """Folds a newly created log into the habit's summary, rebuilding it if the date is out of order."""
+        summary, created = self.select_for_update().get_or_create(habit_id=habit_id)
+        if created or not summary.add_date(completion_date):
+            return self.rebuild(habit_id, summary=summary)
+        summary.save()
+        return summary
+
+    def rebuild(self, habit_id, summary=None):
+        """Recomputes a habit's summary from all of its HabitLog rows."""
+        if summary is None:
+            summary, _ = self.select_for_update().get_or_create(habit_id=habit_id)
+        dates = HabitLog.objects.filter(habit_id=habit_id).order_by('completion_date').values_list('completion_date', flat=True)
+        summary.fill_from_dates(dates)
+        summary.save()
+        return summary
+
+    def build_many(self, habit_ids):
+        """Unsaved summaries for many habits, built from a single ordered log query."""
+        summaries = {habit_id: self.model(habit_id=habit_id) for habit_id in habit_ids}
+        rows = (
+            HabitLog.objects.filter(habit_id__in=habit_ids)
+            .order_by('habit_id', 'completion_date')
+            .values_list('habit_id', 'completion_date')
+        )
+        for habit_id, group in groupby(rows.iterator(), key=lambda row: row[0]):
+            summaries[habit_id].fill_from_dates(day for _, day in group)
+        return summaries
+
+    def rebuild_many(self, habit_ids):
+        """Recomputes and upserts the summaries of many habits in a fixed number of queries."""
+        summaries = self.build_many(habit_ids)
+        self.bulk_create(
+            summaries.values(),
+            update_conflicts=True,
+            unique_fields=['habit'],
+            update_fields=self.model.SUMMARY_FIELDS + ('updated_at',),
+        )
+        return summaries
+
+
+class HabitStreakSummary(models.Model):
+    """The run boundaries of a habit's log history, kept in step with every HabitLog write."""
+    habit = models.OneToOneField(Habit, on_delete=models.CASCADE, primary_key=True, related_name='streak_summary')
+    log_count = models.PositiveIntegerField(default=0)
+    first_log_date = models.DateField(null=True, blank=True)
+    last_log_date = models.DateField(null=True, blank=True)
+    # Start of the run of consecutive days that ends on last_log_date
+    current_run_start = models.DateField(null=True, blank=True)
+    longest_run_start = models.DateField(null=True, blank=True)
+    longest_run_end = models.DateField(null=True, blank=True)
+    longest_run = models.PositiveIntegerField(default=0)
+    # Largest number of days between two consecutive logs
+    longest_gap = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = HabitStreakSummaryManager()
+
+    SUMMARY_FIELDS = (
+        'log_count', 'first_log_date', 'last_log_date', 'current_run_start',
+        'longest_run_start', 'longest_run_end', 'longest_run', 'longest_gap',
+    )
+
+    def __str__(self):
+        return f"Streak summary for habit {self.habit_id}"
+
+    def fill_from_dates(self, dates):
+        """Resets the summary and replays the given ascending, unique dates into it."""
+        self.log_count = 0
+        self.first_log_date = self.last_log_date = None
+        self.current_run_start = self.longest_run_start = self.longest_run_end = None
+        self.longest_run = 0
+        self.longest_gap = 0
+        for day in dates:
+            self.add_date(day)
+
+    def add_date(self, day):
+        """Appends one date to the summary. Returns False if the date is not after the last log."""
+        if self.last_log_date is None:
+            self.first_log_date = day
+            self.current_run_start = day
+        elif day > self.last_log_date:
+            gap = (day - self.last_log_date).days - 1
+            if gap > 0:
+                self.longest_gap = max(self.longest_gap, gap)
+                self.current_run_start = day
+        else:
+            return False
+
+        self.last_log_date = day
+        self.log_count += 1
+        run_length = (day - self.current_run_start).days + 1
+        if run_length > self.longest_run:
+            self.longest_run = run_length
+            self.longest_run_start = self.current_run_start
+            self.longest_run_end = day
+        return True
+
+    def build_streaks(self, today):
+        """Current and longest streaks for a 'BUILD' habit, as of today."""
+        if self.last_log_date is None:
+            return 0, 0
+        current_streak = 0
+        # A streak is only "current" if the last log was today or yesterday
+        if self.last_log_date in (today, today - timedelta(days=1)):
+            current_streak = (self.last_log_date - self.current_run_start).days + 1
+        return current_streak, self.longest_run
+
+    def quit_streaks(self, start_date, today):
+        """
+        Current and longest clean streaks for a 'QUIT' habit, as of today.
+        Returns None when relapses are logged in the future, which the summary cannot exclude.
+        """
+        if self.last_log_date is None:
+            current_streak = (today - start_date).days + 1
+            return current_streak, current_streak
+        if self.last_log_date > today:
+            return None
+
+        current_streak = (today - self.last_log_date).days
+        longest_streak = max(
+            0,
+            (self.first_log_date - start_date).days,
+            self.longest_gap,
+            current_streak - 1,
+        )
+        return current_streak, longest_streak
+
+
+
+class HabitYearBitmapManager(models.Manager):
+    def history(self, habit_id):
+        """Loads a habit's whole completion history as a HistoryBitmap."""
+        return HistoryBitmap.from_years(
+            self.filter(habit_id=habit_id).values_list('year', 'bits')
+        )
+
+    def histories(self, habit_ids, since=None, until=None):
+        """
+        The HistoryBitmap of each habit in one query, only loading the years from `since` through
+        `until` when given. Habits without any logged day are left out.
+        """
+        rows = self.filter(habit_id__in=habit_ids)
+        if since is not None:
+            rows = rows.filter(year__gte=since.year)
+        if until is not None:
+            rows = rows.filter(year__lte=until.year)
+        years = defaultdict(list)
+        for habit_id, year, bits in rows.values_list('habit_id', 'year', 'bits'):
+            years[habit_id].append((year, bits))
+        return {habit_id: HistoryBitmap.from_years(pairs) for habit_id, pairs in years.items()}
+
+    def set_day(self, habit_id, day, logged=True):
+        """Sets or clears the bit for one day of a habit's history."""
+        bitmap, _ = self.select_for_update().get_or_create(
+            habit_id=habit_id, year=day.year, defaults={'bits': bytes(YEAR_BYTES)}
+        )
+        bits = int.from_bytes(bytes(bitmap.bits), 'little')
+        mask = 1 << HistoryBitmap.year_bit(day)
+        bitmap.bits = (bits | mask if logged else bits & ~mask).to_bytes(YEAR_BYTES, 'little')
+        bitmap.save(update_fields=['bits'])
+        return bitmap
+
+    def rebuild(self, habit_id):
+        """Rewrites a habit's bitsets from its HabitLog rows."""
+        years = {}
+        for day in HabitLog.objects.filter(habit_id=habit_id).values_list('completion_date', flat=True):
+            years[day.year] = years.get(day.year, 0) | 1 << HistoryBitmap.year_bit(day)
+        self.filter(habit_id=habit_id).delete()
+        self.bulk_create(
+            HabitYearBitmap(habit_id=habit_id, year=year, bits=bits.to_bytes(YEAR_BYTES, 'little'))
+            for year, bits in years.items()
+        )
+
+
+class HabitYearBitmap(models.Model):
+    """One year of a habit's completion history, one bit per day (see habits.bitmaps)."""
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='year_bitmaps')
+    year = models.PositiveSmallIntegerField()
+    bits = models.BinaryField(max_length=YEAR_BYTES)
+
+    objects = HabitYearBitmapManager()
+
+    class Meta:
+        unique_together = ('habit', 'year')
+
+    def __str__(self):
+        return f"Habit {self.habit_id} - {self.year}"
+
+
+
+class UserDataVersionManager(models.Manager):
+    def bump(self, user_ids):
+        """Increments the data version of each user, creating the row on their first write."""
+        for user_id in user_ids:
+            if self.filter(user_id=user_id).update(version=F('version') + 1, updated_at=timezone.now()):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(user_id=user_id, version=1)
+            except IntegrityError:
+                # Created concurrently by another write
+                self.filter(user_id=user_id).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+class UserDataVersion(models.Model):
+    """A per-user counter bumped on any write to the user's habits or logs."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    version = models.PositiveBigIntegerField(default=0)
+    # The user's change journal has been pruned up to this version; older sync cursors need a full sync
+    pruned_seq = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UserDataVersionManager()
+
+    def __str__(self):
+        return f"Data version {self.version} for user {self.user_id}"
+
+
+class DailyStreakSnapshot(models.Model):
+    """A habit's streaks as of the end of one day, written by the `snapshot_streaks` command."""
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='snapshots')
+    date = models.DateField()
+    current_streak = models.PositiveIntegerField()
+    longest_streak = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('habit', 'date')
+        indexes = [models.Index(fields=['date'])]
+
+    def __str__(self):
+        return f"Habit {self.habit_id} on {self.date}: {self.current_streak}/{self.longest_streak}"
+
+
+class LeaderboardEntryManager(models.Manager):
+    def remove(self, habit_ids):
+        """Deletes the entries of the given habits and takes them out of the rank counts."""
+        removed = defaultdict(int)
+        entries = self.filter(habit_id__in=habit_ids).values_list('habit_type', 'current_streak', 'longest_streak')
+        for habit_type, current, longest in entries:
+            removed[habit_type, 'current', current] += 1
+            removed[habit_type, 'longest', longest] += 1
+        with transaction.atomic():
+            for (habit_type, metric, streak), count in removed.items():
+                LeaderboardBucket.objects.filter(habit_type=habit_type, metric=metric, streak=streak).update(
+                    habits=F('habits') - count
+                )
+            return self.filter(habit_id__in=habit_ids).delete()
+
+
+class LeaderboardEntry(models.Model):
+    """A habit's streaks as last ranked by the `build_leaderboards` command; requests only read these."""
+    habit = models.OneToOneField(Habit, on_delete=models.CASCADE, primary_key=True, related_name='leaderboard_entry')
+    habit_type = models.CharField(max_length=5, choices=Habit.HabitType.choices)
+    current_streak = models.PositiveIntegerField()
+    longest_streak = models.PositiveIntegerField()
+    built_at = models.DateTimeField()
+
+    objects = LeaderboardEntryManager()
+
+    class Meta:
+        indexes = [
+            # Top-K and rank counts of one habit type, per metric
+            models.Index(fields=['habit_type', '-current_streak']),
+            models.Index(fields=['habit_type', '-longest_streak']),
+        ]
+
+    def __str__(self):
+        return f"Habit {self.habit_id}: {self.current_streak}/{self.longest_streak}"
+
+
+class LeaderboardBucket(models.Model):
+    """
+    How many leaderboard entries of a habit type have a given streak, per metric. Ranks and
+    percentiles add these up, so they cost one row per distinct streak rather than one per habit.
+    """
+    habit_type = models.CharField(max_length=5, choices=Habit.HabitType.choices)
+    metric = models.CharField(max_length=7)
+    streak = models.PositiveIntegerField()
+    habits = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('habit_type', 'metric', 'streak')
+
+    def __str__(self):
+        return f"{self.habit_type} {self.metric} {self.streak}: {self.habits}"
+
+
+class ChangeJournalManager(models.Manager):
+    def record(self, user_id, changes):
+        """
+        Appends `changes`, (kind, action, habit_pk, completion_date) tuples, to the user's journal under
+        the user's next data version. Bumping the version locks the user's row until the transaction
+        ends, so sequence numbers are handed out in commit order.
+        """
+        UserDataVersion.objects.bump([user_id])
+        seq = UserDataVersion.objects.filter(user_id=user_id).values_list('version', flat=True).get()
+        self.bulk_create([
+            self.model(user_id=user_id, seq=seq, kind=kind, action=action, habit_pk=habit_pk, completion_date=day)
+            for kind, action, habit_pk, day in changes
+        ])
+        return seq
+
+
+class ChangeJournalEntry(models.Model):
+    """One habit or log write, in the order it happened for its user. Read by the sync endpoint."""
+    class Kind(models.TextChoices):
+        HABIT = 'habit', 'Habit'
+        LOG = 'log', 'Log'
+        LOGS = 'logs', 'All logs of a habit'
+
+    class Action(models.TextChoices):
+        CREATE = 'create', 'Create'
+        UPDATE = 'update', 'Update'
+        DELETE = 'delete', 'Delete'
+        RESET = 'reset', 'Reset'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='change_journal')
+    seq = models.PositiveBigIntegerField()
+    kind = models.CharField(max_length=5, choices=Kind.choices)
+    action = models.CharField(max_length=6, choices=Action.choices)
+    # Not a foreign key: entries outlive the habits they describe
+    habit_pk = models.BigIntegerField()
+    completion_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ChangeJournalManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'seq'])]
+
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.kind} {self.habit_pk} for user {self.user_id}"
+
+
+class PurgeJob(models.Model):
+    """A deleted habit or account whose rows are still to be removed by `drain_purge_queue`."""
+    class Kind(models.TextChoices):
+        HABIT = 'habit', 'Habit'
+        USER = 'user', 'User account'
+
+    kind = models.CharField(max_length=5, choices=Kind.choices)
+    # Not a foreign key: the job outlives the rows it removes
+    target_pk = models.BigIntegerField()
+    rows_deleted = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['finished_at', 'id'])]
 
     def __str__(self):
-        return f"{self.habit.name} - {self.completion_date}"
\ No newline at end of file
+        state = 'finished' if self.finished_at else 'pending'
+        return f"Purge of {self.kind} {self.target_pk} ({state}, {self.rows_deleted} rows deleted)"
@@ -0,0 +1,64 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class HabitCursorPagination(CursorPagination):
+    """Newest habits first; the cursor keeps deep pages as cheap as the first one."""
+    ordering = '-created_at'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class LogCursorPagination(CursorPagination):
+    """Pages through a habit's log dates in calendar order, for the stats endpoint."""
+    ordering = 'completion_date'
+    page_size = 366
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+def has_statistics(connection, table):
+    """
+    Whether ANALYZE has run on `table`, or on any of its partitions. Until it has, reltuples is -1
+    and the planner guesses the row count from the table's size on disk.
+    """
+    with connection.cursor() as cursor:
+        # pg_partition_tree lists the partitions of a partitioned table, and nothing for a plain one
+        cursor.execute(
+            "SELECT COALESCE(bool_or(reltuples >= 0), false) FROM pg_class WHERE relkind = 'r' "
+            "AND (oid = %s::regclass OR oid IN (SELECT relid FROM pg_partition_tree(%s::regclass)))", [table, table]
+        )
+        return cursor.fetchone()[0]
+
+
+def estimated_count(queryset):
+    """
+    The query planner's estimate of how many rows `queryset` matches, on PostgreSQL; None elsewhere,
+    and None when the table has never been analyzed, as that estimate can be off by any amount.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or not has_statistics(connection, queryset.model._meta.db_table):
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A Django paginator for very large querysets. It counts at most HABIT_ADMIN_COUNT_LIMIT rows exactly;
+    past that the count is the planner's estimate on PostgreSQL, or the limit plus one elsewhere, so
+    no page waits on a full COUNT(*).
+    """
+    @cached_property
+    def count(self):
+        limit = settings.HABIT_ADMIN_COUNT_LIMIT
+        exact = self.object_list.order_by()[:limit + 1].count()
+        if exact <= limit:
+            return exact
+        return max(exact, estimated_count(self.object_list) or 0)
@@ -0,0 +1,56 @@
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def iter_lines(stream, encoding):
+    """
+    Decodes the request body line by line, without reading it into memory first.
+    Lines that are not valid in `encoding` come through as None so callers can report them per item.
+    """
+    if stream is None:
+        return
+    for line in stream:
+        try:
+            line = line.decode(encoding).strip()
+        except UnicodeDecodeError:
+            yield None
+            continue
+        if line:
+            yield line
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON into a lazy iterator of objects.
+    Lines that are not valid JSON come through as None so callers can report them per item.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        for line in iter_lines(stream, encoding):
+            try:
+                yield json.loads(line)
+            except (TypeError, ValueError):
+                yield None
+
+
+class CSVParser(BaseParser):
+    """
+    Parses a CSV body with a header row into a lazy iterator of dicts, one per line.
+    Lines that cannot be decoded come through as None so callers can report them per item.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        lines = iter_lines(stream, encoding)
+        header = next(lines, '')
+        if header is None:
+            raise ParseError(f"The CSV header is not valid {encoding}.")
+        fieldnames = next(csv.reader([header]), [])
+        return (None if line is None else dict(zip(fieldnames, next(csv.reader([line])))) for line in lines)
@@ -0,0 +1,140 @@
+"""
+Range partitioning of the HabitLog table by completion_date, on PostgreSQL only.
+
+Each calendar year of logs gets its own partition, with a default partition catching any date
+outside them. Date-bounded reads then only scan the years they ask for, and an old year can be
+vacuumed, backed up or detached on its own. Partitioning rewrites the whole table, so it is never
+done by a migration: the `partition_habit_logs` command does it when an operator asks for it. On
+other databases HabitLog stays a plain table and everything here does nothing.
+"""
+from datetime import date
+
+from django.apps import apps
+from django.db import transaction
+
+TABLE = 'habits_habitlog'
+DEFAULT_PARTITION = f'{TABLE}_default'
+ID_SEQUENCE = f'{TABLE}_id_seq'
+
+
+def partition_name(year):
+    return f'{TABLE}_y{year}'
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass)", [TABLE]
+        )
+        return cursor.fetchone()[0]
+
+
+def year_bounds(first_year, this_year, years_back, years_ahead=1):
+    """
+    The years to create partitions for: from the oldest year with data, but no further back than
+    `years_back` years, through `years_ahead` years from now. Logs outside them, such as mistyped
+    dates centuries away, stay in the default partition.
+    """
+    start = max(min(first_year or this_year, this_year), this_year - years_back)
+    return range(start, this_year + years_ahead + 1)
+
+
+def restore_keys(cursor, primary_key):
+    """Recreates the id sequence, the (habit, completion_date) uniqueness and the foreign key of a rebuilt table."""
+    cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY ({primary_key})")
+    cursor.execute(f"CREATE SEQUENCE {ID_SEQUENCE} OWNED BY {TABLE}.id")
+    cursor.execute(f"SELECT setval('{ID_SEQUENCE}', COALESCE(MAX(id), 0) + 1, false) FROM {TABLE}")
+    cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{ID_SEQUENCE}')")
+    cursor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_habit_id_completion_date_uniq "
+        f"UNIQUE (habit_id, completion_date)"
+    )
+    cursor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_habit_id_fk_habits_habit_id "
+        f"FOREIGN KEY (habit_id) REFERENCES habits_habit (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+
+
+def restore_indexes(connection):
+    """
+    Recreates HabitLog's Meta.indexes under their Django names, which `LIKE` does not copy, so the
+    rebuilt table still matches migration state.
+    """
+    model = apps.get_model('habits', 'HabitLog')
+    with connection.schema_editor(atomic=False) as editor:
+        for index in model._meta.indexes:
+            editor.add_index(model, index)
+
+
+def partition_table(connection, years_back, years_ahead=1):
+    """
+    Rebuilds HabitLog as a table partitioned by year, copying every row across in one transaction.
+    Returns the years given a partition, or None if there was nothing to do.
+    """
+    if connection.vendor != 'postgresql' or is_partitioned(connection):
+        return None
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"SELECT EXTRACT(YEAR FROM MIN(completion_date))::int FROM {TABLE}")
+        years = year_bounds(cursor.fetchone()[0], date.today().year, years_back, years_ahead)
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_plain")
+        # Every partitioned unique key has to include completion_date, the primary key too
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {TABLE}_plain) PARTITION BY RANGE (completion_date)")
+        for year in years:
+            cursor.execute(
+                f"CREATE TABLE {partition_name(year)} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+            )
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_plain")
+        cursor.execute(f"DROP TABLE {TABLE}_plain")
+        restore_keys(cursor, 'id, completion_date')
+        restore_indexes(connection)
+    return years
+
+
+def unpartition_table(connection):
+    """Reverses partition_table, folding every partition back into one plain table. Returns whether it did."""
+    if not is_partitioned(connection):
+        return False
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_partitioned")
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {TABLE}_partitioned)")
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_partitioned")
+        cursor.execute(f"DROP TABLE {TABLE}_partitioned")
+        restore_keys(cursor, 'id')
+        restore_indexes(connection)
+    return True
+
+
+def add_year_partitions(connection, years):
+    """
+    Creates the partitions of the given years that are missing, moving any of their rows out of the
+    default partition. Returns the names of the partitions created.
+    """
+    if not is_partitioned(connection):
+        return []
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass", [TABLE]
+        )
+        existing = {name for name, in cursor.fetchall()}
+        for year in years:
+            name = partition_name(year)
+            if name in existing:
+                continue
+            start, end = f'{year}-01-01', f'{year + 1}-01-01'
+            # Attaching a range the default partition still holds rows for would fail
+            cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE})")
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE completion_date >= %s AND completion_date < %s RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved", [start, end]
+            )
+            cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+            created.append(name)
+    return created
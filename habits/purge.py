@@ -0,0 +1,152 @@
+"""
+Deleting habits and accounts without deleting everything they own in one go.
+
+Deleting through the API only marks the habit, or every habit of the account, as deleted. That
+hides it right away, and the removal itself is queued as a PurgeJob. `drain_purge_queue` works
+through the queue one bounded chunk at a time. Each chunk is its own short transaction that also
+records the job's progress, so an interrupted run carries on where it stopped.
+
+Logs, snapshots and journal entries are removed with plain DELETE statements, which send no
+per-row signals. That is safe because everything derived from them was dealt with when the habit
+was hidden: the leaderboard entry is dropped and the deletion journaled then, and the streak
+summary and bitmap history go with the habit row in the job's last step.
+"""
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ChangeJournalEntry, DailyStreakSnapshot, Habit, HabitLog, LeaderboardEntry, PurgeJob
+
+
+def delete_habit(habit):
+    """Hides the habit and queues its rows for purging."""
+    with transaction.atomic():
+        habit.deleted_at = timezone.now()
+        # The version is bumped by the pre_save signal
+        habit.save(update_fields=['deleted_at', 'version', 'updated_at'])
+        LeaderboardEntry.objects.remove([habit.pk])
+        return PurgeJob.objects.create(kind=PurgeJob.Kind.HABIT, target_pk=habit.pk)
+
+
+def delete_habits(habits):
+    """delete_habit for a whole queryset of habits, in a fixed number of queries per owner."""
+    with transaction.atomic():
+        owners = dict(habits.values_list('pk', 'user_id'))
+        now = timezone.now()
+        Habit.objects.filter(pk__in=owners).update(deleted_at=now, version=F('version') + 1, updated_at=now)
+        by_user = {}
+        for habit_id, user_id in owners.items():
+            by_user.setdefault(user_id, []).append(
+                (ChangeJournalEntry.Kind.HABIT, ChangeJournalEntry.Action.DELETE, habit_id, None)
+            )
+        for user_id, changes in by_user.items():
+            ChangeJournalEntry.objects.record(user_id, changes)
+        LeaderboardEntry.objects.remove(list(owners))
+        return PurgeJob.objects.bulk_create(
+            PurgeJob(kind=PurgeJob.Kind.HABIT, target_pk=habit_id) for habit_id in owners
+        )
+
+
+def delete_account(user):
+    """Deactivates the user, hides all of their habits and queues the account for purging."""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        habit_ids = list(Habit.objects.filter(user=user).values_list('pk', flat=True))
+        Habit.objects.filter(pk__in=habit_ids).update(deleted_at=timezone.now())
+        LeaderboardEntry.objects.remove(habit_ids)
+        return PurgeJob.objects.create(kind=PurgeJob.Kind.USER, target_pk=user.pk)
+
+
+def delete_rows(queryset):
+    """
+    Deletes the rows of `queryset` in one DELETE statement, without loading them, collecting
+    cascades or sending signals. Only for rows that nothing references, and whose derived data the
+    caller takes care of. Returns how many were deleted.
+    """
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    opts = queryset.model._meta
+    select, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {quote(opts.db_table)} WHERE {quote(opts.pk.column)} IN ({select})", params)
+        return cursor.rowcount
+
+
+def delete_chunk(queryset, size):
+    """Deletes up to `size` rows of `queryset` in one statement. Returns how many were deleted."""
+    pks = list(queryset.order_by().values_list('pk', flat=True)[:size])
+    if not pks:
+        return 0
+    return delete_rows(queryset.filter(pk__in=pks))
+
+
+def purge_habit_step(habit_id, size):
+    """
+    Deletes the next chunk of a habit's logs or snapshots, or the habit itself once only its few
+    other rows remain. Returns the number of rows deleted and whether the habit is gone.
+    """
+    for model in (HabitLog, DailyStreakSnapshot):
+        deleted = delete_chunk(model.objects.filter(habit_id=habit_id), size)
+        if deleted:
+            return deleted, False
+    deleted, _ = Habit.all_objects.filter(pk=habit_id).delete()
+    return deleted, True
+
+
+def purge_user_step(user_id, size):
+    """Like purge_habit_step, for an account: its habits one by one, then its journal, then the user."""
+    habit_id = Habit.all_objects.filter(user_id=user_id).order_by('pk').values_list('pk', flat=True).first()
+    if habit_id is not None:
+        deleted, _ = purge_habit_step(habit_id, size)
+        return deleted, False
+    deleted = delete_chunk(ChangeJournalEntry.objects.filter(user_id=user_id), size)
+    if deleted:
+        return deleted, False
+    deleted, _ = User.objects.filter(pk=user_id).delete()
+    return deleted, True
+
+
+PURGE_STEPS = {PurgeJob.Kind.HABIT: purge_habit_step, PurgeJob.Kind.USER: purge_user_step}
+
+
+def purge_chunk(job_id, size):
+    """
+    Runs one chunk of a job and records the progress in the same transaction. Returns the number of
+    rows deleted and whether the job is done, or None when it is finished already or another worker
+    holds it.
+    """
+    with transaction.atomic():
+        job = (
+            PurgeJob.objects.select_for_update(skip_locked=True)
+            .filter(pk=job_id, finished_at__isnull=True).first()
+        )
+        if job is None:
+            return None
+        deleted, done = PURGE_STEPS[job.kind](job.target_pk, size)
+        job.rows_deleted += deleted
+        if done:
+            job.finished_at = timezone.now()
+        job.save(update_fields=['rows_deleted', 'finished_at', 'updated_at'])
+        return deleted, done
+
+
+def drain(size, max_chunks=None):
+    """
+    Works through the pending jobs, oldest first, stopping after `max_chunks` chunks if given.
+    Returns the number of jobs finished and of rows deleted.
+    """
+    finished = rows = chunks = 0
+    pending = PurgeJob.objects.filter(finished_at__isnull=True).order_by('id').values_list('pk', flat=True)
+    for job_id in list(pending):
+        done = False
+        while not done and (max_chunks is None or chunks < max_chunks):
+            result = purge_chunk(job_id, size)
+            if result is None:
+                break
+            deleted, done = result
+            chunks += 1
+            rows += deleted
+        finished += done
+    return finished, rows
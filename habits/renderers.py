@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+import math
+import re
+from decimal import Decimal
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def writes_differently(number):
+    """
+    Whether orjson writes `number` differently from the json module: NaN and infinities, which it
+    writes as null, and the magnitudes repr() writes with an exponent, like 1e+16 and 1e-05.
+    """
+    number = float(number)
+    return not math.isfinite(number) or abs(number) >= 1e16 or 0 < abs(number) < 1e-4
+
+
+def has_differing_numbers(data):
+    """Whether any float or Decimal in `data`'s dicts, lists and tuples is written differently by orjson."""
+    pending = [data]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (float, Decimal)):
+            if writes_differently(value):
+                return True
+        elif isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+    return False
+
+
+# orjson output that may hold such a number: null for NaN and infinities, 1e16 or 0.00001
+MAY_DIFFER = re.compile(rb'null|[0-9]e|0\.0000')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed, producing the same bytes as the stock
+    renderer: compact separators, unescaped unicode, \u2028/\u2029 escaped, and dates, times and lazy
+    strings formatted by DRF's encoder. Indented output and unusual settings go through the stock renderer,
+    and so does data with a float orjson writes differently: NaN and infinities, which it would quietly
+    write as null, and numbers the stock renderer writes with an exponent.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            # e.g. integers wider than 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        # Only worth looking for when the output may hold one; with STRICT_JSON the stock renderer raises for NaN
+        if MAY_DIFFER.search(ret) and has_differing_numbers(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Base for renderers that can write a response incrementally.
+    `render_stream` turns an iterable of record dicts into an iterator of byte chunks for a
+    StreamingHttpResponse; `render` joins it for the rare non-streaming caller.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # Error responses carry a single object
+            data = [data]
+        return b''.join(self.render_stream(data or []))
+
+    def render_stream(self, records, columns=None):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render_stream(self, records, columns=None):
+        for record in records:
+            yield (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode(self.charset)
+
+
+class CSVRenderer(StreamingRenderer):
+    """Writes records as CSV rows under `columns`, or the first record's keys; missing values are left blank."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render_stream(self, records, columns=None):
+        buffer = io.StringIO()
+        writer = None
+        for record in records:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=columns or list(record), restval='')
+                writer.writeheader()
+            writer.writerow(record)
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
@@ -0,0 +1,122 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import HabitLog, HabitYearBitmap
+
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# How far back a calendar reaches when no `from` date is given
+DEFAULT_SPANS = {
+    'day': timedelta(days=29),
+    'week': timedelta(weeks=11),
+    'month': timedelta(days=365),
+}
+
+MAX_BUCKETS = 400
+
+# Calendars stay this far inside the date type's range, so stepping to a bucket's start or past its
+# end never overflows it
+MIN_DATE = date.min + timedelta(weeks=1)
+MAX_DATE = date.max - timedelta(days=32)
+
+
+def bucket_start(day, period):
+    """The first day of the bucket `day` falls into; weeks start on Monday, like TruncWeek."""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, period):
+    if period == 'week':
+        return start + timedelta(weeks=1)
+    if period == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def bucket_count(start, end, period):
+    if period == 'week':
+        return (bucket_start(end, period) - bucket_start(start, period)).days // 7 + 1
+    if period == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return (end - start).days + 1
+
+
+def bucket_starts(start, end, period):
+    current = bucket_start(start, period)
+    while current <= end:
+        yield current
+        current = next_bucket(current, period)
+
+
+def counted_window(habit, start, end, today):
+    """
+    The days between `start` and `end` that count: none after today, and for QUIT habits none
+    before the habit was created, matching the clean-streak calculation.
+    """
+    first_day = start
+    if habit.habit_type == 'QUIT':
+        first_day = max(start, habit.created_at.date())
+    return first_day, min(end, today)
+
+
+def log_counts(habit, start, end, period):
+    """
+    Number of logs per bucket, counted by the database: {bucket start date: count}.
+    With HABIT_BITMAP_HISTORY on, they are counted from the bitmap history instead.
+    """
+    if start > end:
+        return {}
+    if settings.HABIT_BITMAP_HISTORY:
+        history = HabitYearBitmap.objects.histories([habit.id], since=start, until=end).get(habit.id)
+        if history is None:
+            return {}
+        return {
+            bucket: history.count_between(max(bucket, start), min(next_bucket(bucket, period) - timedelta(days=1), end))
+            for bucket in bucket_starts(start, end, period)
+        }
+    rows = (
+        HabitLog.objects.filter(habit=habit, completion_date__range=(start, end))
+        .annotate(bucket=PERIODS[period]('completion_date'))
+        .values('bucket')
+        .annotate(count=Count('id'))
+        .values_list('bucket', 'count')
+    )
+    return dict(rows)
+
+
+def completion_rollup(habit, start, end, period, today):
+    """
+    Per-bucket completion counts and rates for a habit between `start` and `end`.
+
+    Only days in the counted window count towards a bucket, both as days and as logs. BUILD
+    buckets report completions out of those days, QUIT buckets report relapses and the share of
+    clean days.
+    """
+    first_day, last_day = counted_window(habit, start, end, today)
+    counts = log_counts(habit, first_day, last_day, period)
+
+    buckets = []
+    for bucket in bucket_starts(start, end, period):
+        bucket_end = next_bucket(bucket, period) - timedelta(days=1)
+        days = max(0, (min(bucket_end, last_day) - max(bucket, first_day)).days + 1)
+        count = counts.get(bucket, 0)
+        if habit.habit_type == 'BUILD':
+            done = count
+            item = {"start": bucket, "days": days, "completions": count}
+        else:
+            done = max(0, days - count)
+            item = {"start": bucket, "days": days, "relapses": count, "clean_days": done}
+        item["rate"] = round(done / days, 4) if days else None
+        buckets.append(item)
+    return buckets
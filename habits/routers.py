@@ -0,0 +1,127 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Writes always go to the primary ('default'). Reads go to one of HABIT_DATABASE_REPLICAS only inside
+views that opt in with ReplicaReadMixin, and only for users who have not written anything in the
+last HABIT_REPLICA_PIN_SECONDS, so nobody reads a replica that may not have caught up with their own
+last write yet. ReplicaRoutingMiddleware tracks each request and pins users after they write.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY = 'default'
+
+routing_state = ContextVar('routing_state', default=None)
+
+
+class RoutingState:
+    """Routing decisions for one request."""
+
+    def __init__(self):
+        self.replica_reads = False
+        self.wrote = False
+
+
+def pin_key(user_id):
+    return f'primary-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    cache.set(pin_key(user_id), True, settings.HABIT_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(pin_key(user_id)) is not None
+
+
+def choose_replica():
+    return random.choice(settings.HABIT_DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or not state.replica_reads:
+            return PRIMARY
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            # The rest of this request reads its own write from the primary too
+            state.wrote = True
+            state.replica_reads = False
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaRoutingMiddleware:
+    """Gives each request its RoutingState and pins the user to the primary after a write."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.HABIT_DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState()
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        self.finish(request, state)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        self.finish(request, state)
+        return response
+
+    @staticmethod
+    def finish(request, state):
+        # DRF copies the user it authenticated onto the Django request
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+
+
+class ReplicaReadMixin:
+    """
+    Lets a view's safe requests read from a replica once the user is authenticated and not pinned.
+    On viewsets, `replica_actions` limits this to the named actions.
+    """
+    replica_actions = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = routing_state.get()
+        if (
+            state is not None and not state.wrote and request.method in SAFE_METHODS
+            and (self.replica_actions is None or getattr(self, 'action', None) in self.replica_actions)
+            and not is_pinned(request.user.pk)
+        ):
+            state.replica_reads = True
@@ -0,0 +1,163 @@
+"""
+The OpenAPI schema as a prebuilt artifact instead of a per-request introspection of every view.
+
+`build_openapi_schema` renders the schema once, at build time, into HABIT_SCHEMA_DIR as YAML and
+JSON, each with a gzipped copy. The files are named after the code version, so a deploy of new code
+never serves an old schema. `schema_view` serves them from memory, with an ETag and a Cache-Control
+header. If no file exists for the running code, the first request builds and saves one.
+
+CachedJWTAuthenticationScheme describes the project's JWT authenticator to drf-spectacular, which
+otherwise only recognises simplejwt's own class. HabitsConfig.ready() imports this module so that
+the extension is registered before any schema is generated.
+"""
+import gzip
+import hashlib
+import os
+import re
+import threading
+from importlib.metadata import version as package_version
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.http import require_safe
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+RENDERERS = {'yaml': OpenApiYamlRenderer, 'json': OpenApiJsonRenderer}
+CACHE_CONTROL = 'public, max-age=300'
+# As in django.middleware.gzip
+accepts_gzip = re.compile(r'\bgzip\b')
+
+_lock = threading.Lock()
+_artifacts = {}
+_code_version = None
+
+
+class CachedJWTAuthenticationScheme(SimpleJWTScheme):
+    """The same `jwtAuth` bearer scheme the stock JWTAuthentication gets."""
+    target_class = 'habits.authentication.CachedJWTAuthentication'
+
+
+def code_version():
+    """
+    HABIT_CODE_VERSION when the deploy sets it (e.g. to the git commit), else a hash of the project's
+    Python sources and of the packages the schema is generated by.
+    """
+    global _code_version
+    if _code_version is None:
+        _code_version = settings.HABIT_CODE_VERSION or source_hash()
+    return _code_version
+
+
+def source_hash():
+    digest = hashlib.sha256()
+    for package in ('django', 'djangorestframework', 'drf-spectacular'):
+        digest.update(f'{package}=={package_version(package)}\n'.encode())
+    root = Path(settings.BASE_DIR)
+    # The project's own apps and its settings package; installed packages are covered by their versions
+    folders = {Path(app.path) for app in apps.get_app_configs() if Path(app.path).is_relative_to(root)}
+    folders.add(root / settings.ROOT_URLCONF.split('.')[0])
+    for path in sorted(path for folder in folders for path in folder.rglob('*.py')):
+        if 'migrations' not in path.parts:
+            digest.update(str(path.relative_to(root)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class SchemaArtifact:
+    """One rendering of the schema, with its gzipped copy."""
+
+    def __init__(self, fmt, body, compressed=None):
+        self.format = fmt
+        self.body = body
+        # mtime=0 keeps the compressed bytes identical between builds of the same schema
+        self.compressed = compressed if compressed is not None else gzip.compress(body, 9, mtime=0)
+        self.etag = f'"openapi-{code_version()}-{fmt}"'
+        self.content_type = f'{RENDERERS[fmt].media_type}; charset=utf-8'
+
+    @staticmethod
+    def path(fmt, version):
+        return Path(settings.HABIT_SCHEMA_DIR) / f'openapi-{version}.{fmt}'
+
+    def save(self):
+        path = self.path(self.format, code_version())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for target, data in ((path, self.body), (path.with_name(path.name + '.gz'), self.compressed)):
+            # Written under a temporary name first, so no server ever reads half a file
+            temporary = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+            temporary.write_bytes(data)
+            os.replace(temporary, target)
+
+    @classmethod
+    def load(cls, fmt):
+        path = cls.path(fmt, code_version())
+        try:
+            return cls(fmt, path.read_bytes(), path.with_name(path.name + '.gz').read_bytes())
+        except FileNotFoundError:
+            return None
+
+
+def generate_schema():
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+def build_artifacts():
+    """Generates the schema and renders it in every format."""
+    schema = generate_schema()
+    return {
+        fmt: SchemaArtifact(fmt, renderer().render(schema, renderer_context={}))
+        for fmt, renderer in RENDERERS.items()
+    }
+
+
+def get_artifact(fmt):
+    """The artifact for `fmt`, from memory, from HABIT_SCHEMA_DIR, or generated and saved on first use."""
+    artifact = _artifacts.get(fmt)
+    if artifact is not None:
+        return artifact
+    with _lock:
+        if fmt not in _artifacts:
+            artifacts = {name: SchemaArtifact.load(name) for name in RENDERERS}
+            if None in artifacts.values():
+                artifacts = build_artifacts()
+                try:
+                    for built in artifacts.values():
+                        built.save()
+                except OSError:
+                    # A read-only deploy can still serve the schema it built from memory
+                    pass
+            _artifacts.update(artifacts)
+        return _artifacts[fmt]
+
+
+def requested_format(request):
+    fmt = request.GET.get('format')
+    if fmt in RENDERERS:
+        return fmt
+    accept = request.META.get('HTTP_ACCEPT', '')
+    return 'json' if 'json' in accept and 'yaml' not in accept else 'yaml'
+
+
+@require_safe
+def schema_view(request):
+    """Serves the prebuilt schema, gzipped when the client accepts it."""
+    artifact = get_artifact(requested_format(request))
+    if accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        body, etag = artifact.compressed, artifact.etag[:-1] + '-gzip"'
+    else:
+        body, etag = artifact.body, artifact.etag
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type=artifact.content_type)
+        response['Content-Disposition'] = f'inline; filename="schema.{artifact.format}"'
+        if body is artifact.compressed:
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Cache-Control'] = CACHE_CONTROL
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    return response
@@ -1,7 +1,95 @@
+from functools import lru_cache
+
 from django.contrib.auth.models import User
 from rest_framework import serializers
 from .models import Habit, HabitLog
 
+# The largest primary key a BigAutoField holds; bigger ids overflow the database's integer type
+MAX_ID = 2 ** 63 - 1
+
+
+def requested_fields(request):
+    """The field names asked for with ?fields=a,b on a GET, or None for all of them."""
+    if request is None or request.method != 'GET' or 'fields' not in request.query_params:
+        return None
+    return tuple(name for name in request.query_params['fields'].split(',') if name)
+
+
+class SparseFieldsMixin:
+    """Lets GET requests narrow the output to ?fields=a,b; unknown names are a 400."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        names = requested_fields(self.context.get('request'))
+        if names is None:
+            return fields
+        unknown = set(names) - set(fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": [f"Unknown fields: {', '.join(sorted(unknown))}. Choose from: {', '.join(fields)}."]}
+            )
+        return {name: field for name, field in fields.items() if name in names}
+
+
+class ValuesRepresentation:
+    """
+    Serializes `.values()` rows exactly like `serializer_class` serializes model instances, without
+    building a serializer or a model instance per row. `columns` are the values() columns to select.
+    Only plain model fields and primary-key relations are supported; see `values_representation`.
+    """
+
+    def __init__(self, mappings):
+        self.mappings = mappings
+        self.columns = tuple(column for _, column, _ in mappings)
+
+    def __call__(self, row):
+        data = {}
+        for name, column, to_representation in self.mappings:
+            value = row[column]
+            data[name] = None if value is None else to_representation(value)
+        return data
+
+
+@lru_cache(maxsize=None)
+def declared_field_names(serializer_class):
+    return frozenset(serializer_class().fields)
+
+
+def values_representation(serializer_class, fields=None):
+    """
+    The ValuesRepresentation for `serializer_class` narrowed to `fields`, or None when one of its
+    fields needs a model instance (nested serializers, method fields, dotted or '*' sources)
+    or `fields` names a field the serializer does not have.
+    """
+    if fields is not None:
+        if not set(fields) <= declared_field_names(serializer_class):
+            return None  # Left to the serializer to report
+        # `fields` comes from the query string; only cache valid sets, in one spelling each
+        fields = tuple(sorted(set(fields)))
+    return build_values_representation(serializer_class, fields)
+
+
+@lru_cache(maxsize=128)
+def build_values_representation(serializer_class, fields):
+    serializer = serializer_class()
+    mappings = []
+    for name, field in serializer.fields.items():
+        if field.write_only or (fields is not None and name not in fields):
+            continue
+        if '.' in field.source or field.source == '*' or isinstance(
+            field, (serializers.BaseSerializer, serializers.SerializerMethodField, serializers.ManyRelatedField)
+        ):
+            return None
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            # values() already returns the related primary key under the field's name
+            to_representation = field.pk_field.to_representation if field.pk_field else (lambda pk: pk)
+        elif isinstance(field, serializers.RelatedField):
+            return None
+        else:
+            to_representation = field.to_representation
+        mappings.append((name, field.source, to_representation))
+    return ValuesRepresentation(tuple(mappings))
+
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -23,7 +111,7 @@ class UserSerializer(serializers.ModelSerializer):
        
 
 
-class HabitSerializer(serializers.ModelSerializer):
+class HabitSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
@@ -39,4 +127,21 @@ class HabitLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = HabitLog
         fields = ('id', 'habit', 'completion_date')
-        read_only_fields = ('habit',)
\ No newline at end of file
+        read_only_fields = ('habit',)
+
+
+class BatchStatsSerializer(serializers.Serializer):
+    """Body of the batch stats endpoint: which habits, and the stats endpoint's log options."""
+    max_habits = 200
+
+    habit_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=MAX_ID), allow_empty=False, max_length=max_habits
+    )
+    include_logs = serializers.BooleanField(default=True)
+
+    def get_fields(self):
+        # 'from' is a keyword, so the window fields cannot be declared as class attributes
+        fields = super().get_fields()
+        fields['from'] = serializers.DateField(required=False)
+        fields['to'] = serializers.DateField(required=False)
+        return fields
@@ -0,0 +1,167 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .authentication import forget_user
+from .models import ChangeJournalEntry, Habit, HabitLog, HabitStreakSummary, HabitYearBitmap
+
+
+def is_direct_delete(origin, model):
+    """True when a post_delete comes from deleting `model` rows themselves rather than from a cascade."""
+    return getattr(origin, 'model', type(origin)) is model
+
+
+@receiver(post_save, sender=Habit)
+def create_streak_summary(sender, instance, created, raw=False, **kwargs):
+    """Every new habit starts with an empty summary, so reads never have to build one."""
+    if created and not raw:
+        HabitStreakSummary.objects.get_or_create(habit=instance)
+
+
+@receiver(post_save, sender=HabitLog)
+def update_streak_summary(sender, instance, created, raw=False, **kwargs):
+    """Keeps the summary in step with the log, inside the same transaction as the write."""
+    if raw:
+        return
+    if created:
+        HabitStreakSummary.objects.record_log(instance.habit_id, instance.completion_date)
+    else:
+        # An edited log may have moved anywhere in the history
+        HabitStreakSummary.objects.rebuild(instance.habit_id)
+
+
+@receiver(post_delete, sender=HabitLog)
+def rebuild_streak_summary(sender, instance, origin=None, **kwargs):
+    # Logs removed by a habit or user cascade take the summary down with them
+    if not is_direct_delete(origin, HabitLog):
+        return
+    HabitStreakSummary.objects.rebuild(instance.habit_id)
+
+
+@receiver(post_save, sender=HabitLog)
+def sync_year_bitmap(sender, instance, created, raw=False, **kwargs):
+    """Mirrors HabitLog writes into the bitmap history when HABIT_BITMAP_HISTORY is on."""
+    if raw or not settings.HABIT_BITMAP_HISTORY:
+        return
+    if created:
+        HabitYearBitmap.objects.set_day(instance.habit_id, instance.completion_date)
+    else:
+        HabitYearBitmap.objects.rebuild(instance.habit_id)
+
+
+@receiver(post_delete, sender=HabitLog)
+def clear_year_bitmap(sender, instance, origin=None, **kwargs):
+    if not settings.HABIT_BITMAP_HISTORY or not is_direct_delete(origin, HabitLog):
+        return
+    HabitYearBitmap.objects.set_day(instance.habit_id, instance.completion_date, logged=False)
+
+
+@receiver(pre_save, sender=Habit)
+def bump_habit_version(sender, instance, raw=False, **kwargs):
+    """
+    Increments the version in the save's own UPDATE. Writing back the loaded value plus one would
+    undo a concurrent bump_versions from a log write, leaving two payloads with the same version.
+    """
+    if not raw and not instance._state.adding:
+        instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Habit)
+def reload_habit_version(sender, instance, created, raw=False, **kwargs):
+    """Replaces the F() expression bump_habit_version left on the instance with the saved value."""
+    if not created and not raw:
+        instance.refresh_from_db(fields=['version'])
+
+
+@receiver(post_save, sender=Habit)
+def journal_habit_save(sender, instance, created, raw=False, **kwargs):
+    """Records the write in the user's change journal, which also bumps the user's data version."""
+    if raw:
+        return
+    if created:
+        action = ChangeJournalEntry.Action.CREATE
+    elif instance.deleted_at is not None:
+        # Soft deleted; for clients the habit is gone from now on
+        action = ChangeJournalEntry.Action.DELETE
+    else:
+        action = ChangeJournalEntry.Action.UPDATE
+    ChangeJournalEntry.objects.record(instance.user_id, [(ChangeJournalEntry.Kind.HABIT, action, instance.pk, None)])
+
+
+@receiver(post_delete, sender=Habit)
+def journal_habit_delete(sender, instance, origin=None, **kwargs):
+    # A deleted user takes their journal with them, and purged habits were journaled when soft deleted
+    if is_direct_delete(origin, Habit) and instance.deleted_at is None:
+        ChangeJournalEntry.objects.record(
+            instance.user_id, [(ChangeJournalEntry.Kind.HABIT, ChangeJournalEntry.Action.DELETE, instance.pk, None)]
+        )
+
+
+@receiver(post_save, sender=HabitLog)
+def journal_log_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    Habit.objects.bump_versions([instance.habit_id])
+    if created:
+        change = (ChangeJournalEntry.Kind.LOG, ChangeJournalEntry.Action.CREATE, instance.habit_id, instance.completion_date)
+    else:
+        # The old date is gone by now, so clients reload the habit's logs
+        change = (ChangeJournalEntry.Kind.LOGS, ChangeJournalEntry.Action.RESET, instance.habit_id, None)
+    ChangeJournalEntry.objects.record(instance.habit.user_id, [change])
+
+
+@receiver(post_delete, sender=HabitLog)
+def journal_log_delete(sender, instance, origin=None, **kwargs):
+    if not is_direct_delete(origin, HabitLog):
+        return
+    Habit.objects.bump_versions([instance.habit_id])
+    ChangeJournalEntry.objects.record(
+        instance.habit.user_id,
+        [(ChangeJournalEntry.Kind.LOG, ChangeJournalEntry.Action.DELETE, instance.habit_id, instance.completion_date)],
+    )
+
+
+# Sent by code paths that write HabitLog rows in bulk (bulk_create, queryset deletes),
+# which skip the per-row signals above. Receivers get the ids of every habit touched, and
+# `created_logs`, the (habit_id, completion_date) pairs inserted, when the sender knows them.
+logs_bulk_changed = Signal()
+
+
+@receiver(logs_bulk_changed)
+def rebuild_streak_summaries(sender, habit_ids, **kwargs):
+    HabitStreakSummary.objects.rebuild_many(habit_ids)
+
+
+@receiver(logs_bulk_changed)
+def rebuild_year_bitmaps(sender, habit_ids, **kwargs):
+    if not settings.HABIT_BITMAP_HISTORY:
+        return
+    for habit_id in habit_ids:
+        HabitYearBitmap.objects.rebuild(habit_id)
+
+
+@receiver(logs_bulk_changed)
+def journal_bulk_change(sender, habit_ids, created_logs=None, **kwargs):
+    Habit.objects.bump_versions(habit_ids)
+    changes_by_user = defaultdict(list)
+    owners = dict(Habit.all_objects.filter(pk__in=habit_ids).values_list('pk', 'user_id'))
+    if created_logs is not None:
+        for habit_id, completion_date in created_logs:
+            changes_by_user[owners[habit_id]].append(
+                (ChangeJournalEntry.Kind.LOG, ChangeJournalEntry.Action.CREATE, habit_id, completion_date)
+            )
+    else:
+        for habit_id, user_id in owners.items():
+            changes_by_user[user_id].append((ChangeJournalEntry.Kind.LOGS, ChangeJournalEntry.Action.RESET, habit_id, None))
+    for user_id, changes in changes_by_user.items():
+        ChangeJournalEntry.objects.record(user_id, changes)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_cached_user(sender, instance, **kwargs):
+    """Deactivations, password changes and deletions must not be served from the auth cache."""
+    forget_user(instance.pk)
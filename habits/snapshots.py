@@ -0,0 +1,56 @@
+"""
+Daily streak snapshots: every habit's streaks as of the end of a day, for trend charts.
+
+`snapshot_chunk` computes and upserts the snapshots of a batch of habits and is safe to run in a
+worker process. Writing the same day twice overwrites it with the same values, so a run that was
+interrupted can simply be started again.
+"""
+from .models import DailyStreakSnapshot, Habit, HabitStreakSummary
+from .streaks import calculate_streaks_batch, fetch_log_dates, summary_streaks
+
+
+def streaks_as_of(habits, day):
+    """
+    Streaks of `habits` as they stood at the end of `day`, ignoring logs dated after it.
+    Summaries answer for habits logged no later than `day`; the rest are calculated from their logs.
+    """
+    streaks = {}
+    pending = []
+    for habit in habits:
+        try:
+            last_log_date = habit.streak_summary.last_log_date
+        except HabitStreakSummary.DoesNotExist:
+            pending.append(habit)
+            continue
+        if last_log_date is None or last_log_date <= day:
+            streaks[habit.id] = summary_streaks(habit, day)
+        else:
+            pending.append(habit)
+    if pending:
+        dates_by_habit = fetch_log_dates([habit.id for habit in pending], until=day)
+        streaks.update(calculate_streaks_batch(pending, dates_by_habit, day))
+    return streaks
+
+
+def pending_habit_ids(day, recompute=False):
+    """Ids of the habits that existed on `day` and have no snapshot for it yet (all of them with `recompute`)."""
+    habits = Habit.objects.filter(created_at__date__lte=day)
+    if not recompute:
+        habits = habits.exclude(snapshots__date=day)
+    return habits.order_by('id').values_list('id', flat=True)
+
+
+def snapshot_chunk(habit_ids, day):
+    """Computes and upserts the snapshots of the given habits for `day`. Returns how many were written."""
+    habits = list(Habit.objects.filter(pk__in=habit_ids).select_related('streak_summary'))
+    streaks = streaks_as_of(habits, day)
+    DailyStreakSnapshot.objects.bulk_create(
+        [
+            DailyStreakSnapshot(habit_id=habit_id, date=day, current_streak=current, longest_streak=longest)
+            for habit_id, (current, longest) in streaks.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['habit', 'date'],
+        update_fields=['current_streak', 'longest_streak'],
+    )
+    return len(streaks)
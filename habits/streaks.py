@@ -0,0 +1,310 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .bitmaps import HistoryBitmap
+from .models import HabitLog, HabitStreakSummary, HabitYearBitmap
+
+
+def build_streaks(dates, today):
+    """Calculates the current and longest streaks for a 'BUILD' habit from its log dates."""
+    log_dates = sorted(set(dates))
+    if not log_dates:
+        return 0, 0
+
+    # Calculate the longest streak by finding the longest chain of consecutive days
+    longest_streak = 0
+    current_longest = 1
+    for i in range(1, len(log_dates)):
+        if (log_dates[i] - log_dates[i-1]).days == 1:
+            current_longest += 1
+        else:
+            longest_streak = max(longest_streak, current_longest)
+            current_longest = 1
+    longest_streak = max(longest_streak, current_longest)
+
+    # A streak is only "current" if the last log was today or yesterday
+    current_streak = 0
+    most_recent_log_date = log_dates[-1]
+    if most_recent_log_date == today or most_recent_log_date == (today - timedelta(days=1)):
+        current_streak = 1
+        for i in range(len(log_dates) - 1, 0, -1):
+            if (log_dates[i] - log_dates[i-1]).days != 1:
+                break
+            current_streak += 1
+
+    return current_streak, longest_streak
+
+
+def quit_streaks(dates, start_date, today):
+    """Calculates the current and longest 'clean' streaks for a 'QUIT' habit from its relapse dates."""
+    relapse_dates = sorted(d for d in set(dates) if d <= today)  # Ignore future dates
+
+    if not relapse_dates:
+        # If there are no relapses, the streak is from creation day to today
+        current_streak = (today - start_date).days + 1
+        return current_streak, current_streak
+
+    # Current streak is the number of days since the most recent relapse
+    current_streak = (today - relapse_dates[-1]).days
+
+    # To find the longest streak, we find the biggest gap in a timeline of events
+    timeline_dates = [start_date - timedelta(days=1)] + relapse_dates + [today]
+    longest_streak = 0
+    for i in range(1, len(timeline_dates)):
+        gap = (timeline_dates[i] - timeline_dates[i-1]).days - 1
+        if gap > longest_streak:
+            longest_streak = gap
+
+    return current_streak, longest_streak
+
+
+def calculate_streaks_batch(habits, dates_by_habit, today):
+    """
+    Calculates streaks for many habits in a single pass.
+    `dates_by_habit` maps habit ids to their log dates; habits without an entry have no logs.
+    Returns a dict of habit id -> (current_streak, longest_streak).
+    """
+    streaks = {}
+    for habit in habits:
+        dates = dates_by_habit.get(habit.id, ())
+        if habit.habit_type == 'BUILD':
+            streaks[habit.id] = build_streaks(dates, today)
+        else:  # 'QUIT'
+            streaks[habit.id] = quit_streaks(dates, habit.created_at.date(), today)
+    return streaks
+
+
+def history_dates(habit_ids, until=None, since=None):
+    """fetch_log_dates read from the per-year bitmaps instead of HabitLog."""
+    histories = HabitYearBitmap.objects.histories(habit_ids, since=since, until=until)
+    dates_by_habit = defaultdict(list)
+    for habit_id, history in histories.items():
+        dates_by_habit[habit_id] = [
+            day for day in history.dates() if (since is None or day >= since) and (until is None or day <= until)
+        ]
+    return dates_by_habit
+
+
+def fetch_log_dates(habit_ids, until=None, since=None):
+    """
+    Loads the log dates of many habits with one query, grouped by habit id, optionally from `since` up to `until`.
+    With HABIT_BITMAP_HISTORY on, they come from the bitmap history, one row per habit and year.
+    """
+    if settings.HABIT_BITMAP_HISTORY:
+        return history_dates(habit_ids, until=until, since=since)
+    dates_by_habit = defaultdict(list)
+    logs = HabitLog.objects.filter(habit_id__in=habit_ids)
+    if since is not None:
+        logs = logs.filter(completion_date__gte=since)
+    if until is not None:
+        logs = logs.filter(completion_date__lte=until)
+    rows = (
+        logs.order_by('habit_id', 'completion_date')
+        .values_list('habit_id', 'completion_date')
+    )
+    for habit_id, completion_date in rows:
+        dates_by_habit[habit_id].append(completion_date)
+    return dates_by_habit
+
+
+def summary_streaks(habit, today):
+    """
+    Reads a habit's streaks off its summary row (load it with select_related('streak_summary')).
+    Returns None when the habit has no summary yet or the summary cannot answer for it.
+    """
+    try:
+        summary = habit.streak_summary
+    except HabitStreakSummary.DoesNotExist:
+        return None
+    if habit.habit_type == 'BUILD':
+        return summary.build_streaks(today)
+    return summary.quit_streaks(habit.created_at.date(), today)
+
+
+def split_by_summary(habits, today):
+    """Streaks of the habits whose summary can answer, and the list of habits that need their logs."""
+    streaks = {}
+    pending = []
+    for habit in habits:
+        result = summary_streaks(habit, today)
+        if result is None:
+            pending.append(habit)
+        else:
+            streaks[habit.id] = result
+    return streaks, pending
+
+
+def missing_summaries(habits, dates_by_habit):
+    """Unsaved summaries for the habits that have none yet, built from their already-fetched dates."""
+    missing = []
+    for habit in habits:
+        if not hasattr(habit, 'streak_summary'):
+            summary = HabitStreakSummary(habit=habit)
+            summary.fill_from_dates(dates_by_habit.get(habit.id, ()))
+            missing.append(summary)
+    return missing
+
+
+def streaks_for_habits(habits, today):
+    """
+    Streaks for many habits in a constant number of queries: summaries are read first, and every
+    habit they cannot answer for is calculated from one bulk log query, or with bit operations on the
+    bitmap history when HABIT_BITMAP_HISTORY is on. Missing summaries are backfilled.
+    """
+    streaks, pending = split_by_summary(habits, today)
+    if not pending:
+        return streaks
+
+    if settings.HABIT_BITMAP_HISTORY:
+        histories = HabitYearBitmap.objects.histories([habit.id for habit in pending])
+        for habit in pending:
+            streaks[habit.id] = histories.get(habit.id, HistoryBitmap()).streaks(habit, today)
+        dates_by_habit = {habit_id: list(history.dates()) for habit_id, history in histories.items()}
+    else:
+        dates_by_habit = fetch_log_dates([habit.id for habit in pending])
+        streaks.update(calculate_streaks_batch(pending, dates_by_habit, today))
+    HabitStreakSummary.objects.bulk_create(missing_summaries(pending, dates_by_habit), ignore_conflicts=True)
+    return streaks
+
+
+async def afetch_log_dates(habit_ids):
+    """Async version of fetch_log_dates."""
+    if settings.HABIT_BITMAP_HISTORY:
+        return await sync_to_async(history_dates)(habit_ids)
+    dates_by_habit = defaultdict(list)
+    rows = (
+        HabitLog.objects.filter(habit_id__in=habit_ids)
+        .order_by('habit_id', 'completion_date')
+        .values_list('habit_id', 'completion_date')
+    )
+    async for habit_id, completion_date in rows:
+        dates_by_habit[habit_id].append(completion_date)
+    return dates_by_habit
+
+
+async def astreaks_for_habits(habits, today):
+    """Async version of streaks_for_habits, on Django's async ORM."""
+    streaks, pending = split_by_summary(habits, today)
+    if not pending:
+        return streaks
+
+    dates_by_habit = await afetch_log_dates([habit.id for habit in pending])
+    streaks.update(calculate_streaks_batch(pending, dates_by_habit, today))
+    await HabitStreakSummary.objects.abulk_create(missing_summaries(pending, dates_by_habit), ignore_conflicts=True)
+    return streaks
+
+
+# Per-vendor SQL for the day number of a date (consecutive days differ by 1),
+# a timestamp's UTC calendar date, and the multi-argument maximum.
+SQL_DIALECTS = {
+    'sqlite': {
+        'day': 'CAST(julianday({}) AS INTEGER)',
+        'utc_date': 'date({})',
+        'greatest': 'MAX',
+    },
+    'postgresql': {
+        'day': "(CAST({} AS date) - DATE '1970-01-01')",
+        'utc_date': "CAST({} AT TIME ZONE 'UTC' AS date)",
+        'greatest': 'GREATEST',
+    },
+}
+
+STREAKS_SQL = """
+WITH params AS (
+    SELECT {today_day} AS today
+),
+logs AS (
+    SELECT l.habit_id, h.habit_type, {log_day} AS d
+    FROM {log_table} l JOIN {habit_table} h ON h.id = l.habit_id
+    WHERE {habit_filter}
+),
+-- BUILD: consecutive days share the same (day - row_number), so each group is one run
+islands AS (
+    SELECT habit_id, d, d - ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY d) AS grp
+    FROM logs WHERE habit_type = 'BUILD'
+),
+runs AS (
+    SELECT habit_id, MAX(d) AS run_end, COUNT(*) AS run_length,
+           MAX(MAX(d)) OVER (PARTITION BY habit_id) AS last_d
+    FROM islands GROUP BY habit_id, grp
+),
+build AS (
+    SELECT habit_id,
+           MAX(CASE WHEN run_end = last_d AND run_end BETWEEN params.today - 1 AND params.today
+                    THEN run_length ELSE 0 END) AS current_streak,
+           MAX(run_length) AS longest_streak
+    FROM runs CROSS JOIN params GROUP BY habit_id
+),
+-- QUIT: clean streaks are the gaps between consecutive relapses, ignoring future ones
+gaps AS (
+    SELECT habit_id, d, d - LAG(d) OVER (PARTITION BY habit_id ORDER BY d) - 1 AS gap
+    FROM logs CROSS JOIN params WHERE habit_type = 'QUIT' AND d <= params.today
+),
+quit AS (
+    SELECT habit_id, MIN(d) AS first_d, MAX(d) AS last_d, COALESCE(MAX(gap), 0) AS longest_gap
+    FROM gaps GROUP BY habit_id
+),
+habits AS (
+    SELECT h.id, h.habit_type, {start_day} AS start_d
+    FROM {habit_table} h WHERE {habit_filter}
+)
+SELECT habits.id,
+    CASE
+        WHEN habits.habit_type = 'BUILD' THEN COALESCE(build.current_streak, 0)
+        WHEN quit.last_d IS NULL THEN params.today - habits.start_d + 1
+        ELSE params.today - quit.last_d
+    END,
+    CASE
+        WHEN habits.habit_type = 'BUILD' THEN COALESCE(build.longest_streak, 0)
+        WHEN quit.last_d IS NULL THEN params.today - habits.start_d + 1
+        ELSE {greatest}(0, quit.first_d - habits.start_d, quit.longest_gap, params.today - quit.last_d - 1)
+    END
+FROM habits
+CROSS JOIN params
+LEFT JOIN build ON build.habit_id = habits.id
+LEFT JOIN quit ON quit.habit_id = habits.id
+"""
+
+
+def calculate_streaks_sql(habit_ids=None, user_id=None, today=None, using='default'):
+    """
+    Calculates streaks inside the database with window functions, in a single statement, for the
+    given habits or for every habit of a user. Gives the same results as build_streaks/quit_streaks
+    without moving any log dates over the wire. Returns a dict of habit id -> (current, longest).
+    """
+    connection = connections[using]
+    dialect = SQL_DIALECTS.get(connection.vendor)
+    if dialect is None:
+        raise NotImplementedError(f"SQL streaks are not available on {connection.vendor}.")
+    if (habit_ids is None) == (user_id is None):
+        raise ValueError("Pass exactly one of habit_ids or user_id.")
+
+    if habit_ids is not None:
+        habit_ids = list(habit_ids)
+        if not habit_ids:
+            return {}
+        habit_filter = f"h.id IN ({', '.join(['%s'] * len(habit_ids))})"
+        filter_params = habit_ids
+    else:
+        habit_filter = 'h.user_id = %s'
+        filter_params = [user_id]
+    # Soft-deleted habits are invisible here as they are through Habit.objects
+    habit_filter += ' AND h.deleted_at IS NULL'
+
+    sql = STREAKS_SQL.format(
+        today_day=dialect['day'].format('%s'),
+        log_day=dialect['day'].format('l.completion_date'),
+        start_day=dialect['day'].format(dialect['utc_date'].format('h.created_at')),
+        greatest=dialect['greatest'],
+        log_table=HabitLog._meta.db_table,
+        habit_table=HabitLog._meta.get_field('habit').related_model._meta.db_table,
+        habit_filter=habit_filter,
+    )
+    params = [today or date.today(), *filter_params, *filter_params]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {habit_id: (current, longest) for habit_id, current, longest in cursor.fetchall()}
@@ -0,0 +1,136 @@
+"""
+Delta sync for clients that keep a local copy of their habits and logs.
+
+A client stores the `cursor` of its last sync and sends it back as ?since=. The changes are read from
+the user's change journal and collapsed to their net effect: the current state of every habit
+created or updated since then, the ids of deleted habits, the log dates added and removed, and the
+full date list of any habit whose logs changed in a way the journal can't describe date by date.
+
+The journal only keeps a window of recent entries (see `prune_journal`). A cursor from before the
+window cannot be brought up to date, and the client has to start over with a first sync.
+"""
+from collections import defaultdict
+
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Greatest
+
+from .models import ChangeJournalEntry, Habit, HabitLog, UserDataVersion
+from .purge import delete_chunk
+from .serializers import HabitSerializer
+
+Kind = ChangeJournalEntry.Kind
+Action = ChangeJournalEntry.Action
+
+
+class CursorExpired(Exception):
+    """The changes since the cursor have been pruned from the journal."""
+
+
+def journal_page(user, since, limit):
+    """
+    Up to `limit` journal entries after `since`, ending on a whole sequence number, and whether more
+    follow. A single sequence number with more than `limit` entries is returned whole.
+    """
+    entries = list(user.change_journal.filter(seq__gt=since).order_by('seq', 'id')[:limit + 1])
+    if len(entries) <= limit:
+        return entries, False
+    last_seq = entries[limit].seq
+    complete = [entry for entry in entries if entry.seq < last_seq]
+    if not complete:
+        complete = list(user.change_journal.filter(seq=last_seq).order_by('id'))
+    return complete, True
+
+
+def full_state(user):
+    """Every habit and log date of the user, for a first sync."""
+    habits = list(Habit.objects.filter(user=user).order_by('id'))
+    logs = defaultdict(list)
+    rows = HabitLog.objects.filter(habit__user=user, habit__deleted_at__isnull=True).order_by('habit_id', 'completion_date')
+    for habit_id, completion_date in rows.values_list('habit_id', 'completion_date'):
+        logs[habit_id].append(completion_date)
+    return {
+        "habits": HabitSerializer(habits, many=True).data,
+        "deleted_habits": [],
+        "logs_created": [],
+        "logs_deleted": [],
+        "logs_reset": {habit.id: logs.get(habit.id, []) for habit in habits},
+    }
+
+
+def net_changes(user, entries):
+    """Collapses journal entries into the changes a client has to apply."""
+    habit_actions = {}
+    log_actions = {}
+    reset = set()
+    for entry in entries:
+        if entry.kind == Kind.HABIT:
+            habit_actions[entry.habit_pk] = entry.action
+        elif entry.kind == Kind.LOG:
+            log_actions[entry.habit_pk, entry.completion_date] = entry.action
+        else:
+            reset.add(entry.habit_pk)
+
+    deleted = {pk for pk, action in habit_actions.items() if action == Action.DELETE}
+    # Habits are sent as they are now; a habit deleted since its last journaled change is gone as well
+    current = {
+        habit.id: habit
+        for habit in Habit.objects.filter(user=user, pk__in=set(habit_actions) - deleted).order_by('id')
+    }
+    deleted |= set(habit_actions) - deleted - set(current)
+
+    reset -= deleted
+    logs_reset = defaultdict(list)
+    if reset:
+        rows = HabitLog.objects.filter(habit__user=user, habit_id__in=reset).order_by('habit_id', 'completion_date')
+        for habit_id, completion_date in rows.values_list('habit_id', 'completion_date'):
+            logs_reset[habit_id].append(completion_date)
+
+    logs_created, logs_deleted = [], []
+    for (habit_pk, completion_date), action in sorted(log_actions.items()):
+        if habit_pk in deleted or habit_pk in reset:
+            continue
+        log = {"habit": habit_pk, "completion_date": completion_date}
+        (logs_deleted if action == Action.DELETE else logs_created).append(log)
+
+    return {
+        "habits": HabitSerializer(list(current.values()), many=True).data,
+        "deleted_habits": sorted(deleted),
+        "logs_created": logs_created,
+        "logs_deleted": logs_deleted,
+        "logs_reset": {habit_pk: logs_reset.get(habit_pk, []) for habit_pk in sorted(reset)},
+    }
+
+
+def changes_since(user, since, limit=1000):
+    """The sync payload for a client whose last cursor was `since` (0 for a first sync)."""
+    version, pruned_seq = UserDataVersion.objects.filter(user=user).values_list('version', 'pruned_seq').first() or (0, 0)
+    if since == 0:
+        return {"cursor": version, "more": False, **full_state(user)}
+    if since > version:
+        raise ValueError("The cursor is ahead of the user's data.")
+    if since < pruned_seq:
+        raise CursorExpired("The changes since this cursor are no longer kept; sync again from 0.")
+    entries, more = journal_page(user, since, limit)
+    # Entries committed after `version` was read are sent now and again next time; applying twice is harmless
+    cursor = entries[-1].seq if more else max([since, version] + [entry.seq for entry in entries[-1:]])
+    return {"cursor": cursor, "more": more, **net_changes(user, entries)}
+
+
+def prune_journal(before, size):
+    """
+    Deletes the journal entries written before `before`, `size` rows per statement, and returns how
+    many were deleted. Each user's pruned_seq is raised first, so no sync can miss the entries being
+    removed. Whole sequence numbers are removed, never part of one.
+    """
+    old = ChangeJournalEntry.objects.filter(created_at__lt=before)
+    last_old_seq = old.filter(user_id=OuterRef('user_id')).order_by().values('user_id').annotate(last=Max('seq')).values('last')
+    UserDataVersion.objects.filter(user_id__in=old.values('user_id')).update(
+        pruned_seq=Greatest('pruned_seq', Subquery(last_old_seq))
+    )
+    pruned = ChangeJournalEntry.objects.filter(
+        seq__lte=Subquery(UserDataVersion.objects.filter(user_id=OuterRef('user_id')).values('pruned_seq'))
+    )
+    deleted = 0
+    while chunk := delete_chunk(pruned, size):
+        deleted += chunk
+    return deleted
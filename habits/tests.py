@@ -1,8 +1,47 @@
+import csv
+import importlib
+import json
+import os
+import random
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
-from .models import Habit, HabitLog
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from config.warmup import warm_worker
+from .bitmaps import HistoryBitmap
+from .exports import keyset_iterator
+from .instrumentation import registry
+from .leaderboard import Ranking
+from .models import ChangeJournalEntry, DailyStreakSnapshot, Habit, HabitLog, HabitStreakSummary, HabitYearBitmap, LeaderboardBucket, LeaderboardEntry, PurgeJob
+from .pagination import estimated_count
+from .partitions import TABLE, partition_table, unpartition_table, year_bounds
+from .purge import delete_habit, drain
+from .rollups import PERIODS
+from .streaks import build_streaks, calculate_streaks_batch, calculate_streaks_sql, fetch_log_dates, quit_streaks, streaks_for_habits
+from .renderers import FastJSONRenderer
+from .serializers import build_values_representation
+from .routers import PRIMARY, ReplicaRouter, RoutingState, choose_replica, pin_key, routing_state
+from .signals import logs_bulk_changed
+from .sync import changes_since
+from .views import HabitStatsView, HabitViewSet
 from datetime import date, timedelta
+from decimal import Decimal
 
 class HabitStatsTests(APITestCase):
     def setUp(self):
@@ -82,4 +121,1561 @@ def test_quit_habit_streak(self):
 
     response = self.client.get(f'/api/habits/{quit_habit.id}/stats/')
     self.assertEqual(response.status_code, status.HTTP_200_OK)
-    self.assertEqual(response.data['current_streak'], 5)
\ No newline at end of file
+    self.assertEqual(response.data['current_streak'], 5)
+
+class HabitStreakSummaryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='summaryuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, name='Summary Habit', habit_type='BUILD')
+        self.today = date.today()
+
+    def test_log_view_updates_summary(self):
+        """Logging through the API keeps the summary row in step."""
+        for days_ago in (2, 1, 0):
+            response = self.client.post(
+                f'/api/habits/{self.habit.id}/log/',
+                {'completion_date': self.today - timedelta(days=days_ago)},
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        summary = HabitStreakSummary.objects.get(habit=self.habit)
+        self.assertEqual(summary.log_count, 3)
+        self.assertEqual(summary.last_log_date, self.today)
+        self.assertEqual(summary.build_streaks(self.today), (3, 3))
+
+    def test_out_of_order_and_deleted_logs_rebuild_summary(self):
+        """Backfilled and deleted logs trigger a rebuild from HabitLog."""
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today)
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today - timedelta(days=2))
+        middle = HabitLog.objects.create(habit=self.habit, completion_date=self.today - timedelta(days=1))
+        self.assertEqual(HabitStreakSummary.objects.get(habit=self.habit).build_streaks(self.today), (3, 3))
+
+        middle.delete()
+        summary = HabitStreakSummary.objects.get(habit=self.habit)
+        self.assertEqual(summary.build_streaks(self.today), (1, 1))
+        self.assertEqual(summary.longest_gap, 1)
+
+    def test_stats_reads_match_full_calculation(self):
+        """Summary-backed streaks agree with the from-scratch calculation for both habit types."""
+        quit_habit = Habit.objects.create(user=self.user, name='Summary Quit', habit_type='QUIT')
+        for days_ago in (30, 29, 28, 20, 3, 2):
+            for habit in (self.habit, quit_habit):
+                HabitLog.objects.create(habit=habit, completion_date=self.today - timedelta(days=days_ago))
+
+        calculator = HabitStatsView()
+        for habit, expected in (
+            (self.habit, calculator.calculate_build_streaks(self.habit)),
+            (quit_habit, calculator.calculate_quit_streaks(quit_habit)),
+        ):
+            with self.assertNumQueries(2):
+                response = self.client.get(f'/api/habits/{habit.id}/stats/')
+            self.assertEqual((response.data['current_streak'], response.data['longest_streak']), expected)
+
+    def test_rebuild_command_backfills_missing_summaries(self):
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today)
+        HabitStreakSummary.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_streak_summaries', '--check', stdout=out)
+        self.assertIn(f'Habit {self.habit.id}: summary is missing', out.getvalue())
+        self.assertFalse(HabitStreakSummary.objects.exists())
+
+        call_command('rebuild_streak_summaries', stdout=StringIO())
+        self.assertEqual(HabitStreakSummary.objects.get(habit=self.habit).build_streaks(self.today), (1, 1))
+
+
+class DashboardQueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dashboarduser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.today = date.today()
+
+    def create_habits(self, count):
+        for i in range(count):
+            habit = Habit.objects.create(user=self.user, name=f'Habit {i}', habit_type='BUILD' if i % 2 else 'QUIT')
+            for days_ago in range(i % 4):
+                HabitLog.objects.create(habit=habit, completion_date=self.today - timedelta(days=days_ago))
+
+    def dashboard_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response.data
+
+    def test_query_count_is_constant_in_habit_count(self):
+        self.create_habits(1)
+        few, _ = self.dashboard_query_count()
+        self.create_habits(20)
+        many, data = self.dashboard_query_count()
+        self.assertEqual(few, many)
+        self.assertEqual(len(data), 21)
+
+    def test_query_count_is_constant_without_summaries(self):
+        """Habits without a summary are calculated from one bulk log fetch and backfilled."""
+        self.create_habits(20)
+        HabitStreakSummary.objects.all().delete()
+        # Data version, habits with summaries, one bulk log fetch, one summary backfill
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/dashboard/')
+        self.assertEqual(HabitStreakSummary.objects.count(), 20)
+
+        calculator = HabitStatsView()
+        for item in response.data:
+            habit = Habit.objects.get(pk=item['habit_id'])
+            expected = calculator.calculate_build_streaks(habit) if habit.habit_type == 'BUILD' else calculator.calculate_quit_streaks(habit)
+            self.assertEqual(item['current_streak'], expected[0])
+
+    def test_batch_calculation_matches_per_habit_functions(self):
+        self.create_habits(8)
+        habits = list(Habit.objects.filter(user=self.user))
+        streaks = calculate_streaks_batch(habits, fetch_log_dates([h.id for h in habits]), self.today)
+        calculator = HabitStatsView()
+        for habit in habits:
+            expected = calculator.calculate_build_streaks(habit) if habit.habit_type == 'BUILD' else calculator.calculate_quit_streaks(habit)
+            self.assertEqual(streaks[habit.id], expected)
+
+
+class HistoryBitmapTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bitmapuser', password='testpassword')
+        self.habit = Habit.objects.create(user=self.user, name='Bitmap Habit', habit_type='BUILD')
+        self.today = date.today()
+
+    def test_bitmap_streaks_match_date_streaks(self):
+        """Bit operations give the same streaks as the date-set calculation across year boundaries."""
+        rng = random.Random(1)
+        start = self.today - timedelta(days=3 * 365)
+        for density in (0.1, 0.5, 0.9):
+            dates = [start + timedelta(days=n) for n in range(3 * 365 + 5) if rng.random() < density]
+            bitmap = HistoryBitmap.from_dates(dates)
+            self.assertEqual(list(bitmap.dates()), dates)
+            self.assertEqual(bitmap.build_streaks(self.today), build_streaks(dates, self.today))
+            self.assertEqual(
+                bitmap.quit_streaks(start + timedelta(days=10), self.today),
+                quit_streaks(dates, start + timedelta(days=10), self.today),
+            )
+
+    @override_settings(HABIT_BITMAP_HISTORY=True)
+    def test_log_writes_are_mirrored_into_year_bitmaps(self):
+        new_year = date(self.today.year, 1, 1)
+        days = [new_year - timedelta(days=2), new_year - timedelta(days=1), new_year, new_year + timedelta(days=1)]
+        logs = [HabitLog.objects.create(habit=self.habit, completion_date=day) for day in days]
+        self.assertEqual(HabitYearBitmap.objects.filter(habit=self.habit).count(), 2)
+        self.assertEqual(list(HabitYearBitmap.objects.history(self.habit.id).dates()), days)
+
+        logs[1].delete()
+        history = HabitYearBitmap.objects.history(self.habit.id)
+        self.assertNotIn(days[1], history)
+        self.assertEqual(history.longest_run(), 2)
+        self.assertEqual(history.longest_gap(), 1)
+
+    def test_streak_and_calendar_reads_use_the_bitmaps(self):
+        quit = Habit.objects.create(user=self.user, name='Bitmap Quit', habit_type='QUIT')
+        days = [self.today - timedelta(days=n) for n in (0, 1, 2, 6, 40)]
+        for habit in (self.habit, quit):
+            HabitLog.objects.bulk_create(HabitLog(habit=habit, completion_date=day) for day in days)
+        self.client.force_authenticate(user=self.user)
+        urls = [f'/api/habits/{habit.id}/calendar/?period={period}' for habit in (self.habit, quit) for period in PERIODS]
+        expected = [self.client.get(url).data for url in urls]
+        HabitStreakSummary.objects.all().delete()
+        expected_streaks = streaks_for_habits(list(Habit.objects.filter(user=self.user)), self.today)
+        HabitStreakSummary.objects.all().delete()
+
+        call_command('rebuild_habit_bitmaps', stdout=StringIO())
+        with override_settings(HABIT_BITMAP_HISTORY=True), CaptureQueriesContext(connection) as queries:
+            self.assertEqual([self.client.get(url).data for url in urls], expected)
+            habits = list(Habit.objects.filter(user=self.user))
+            self.assertEqual(streaks_for_habits(habits, self.today), expected_streaks)
+        self.assertFalse(any('habits_habitlog' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(HabitStreakSummary.objects.get(habit=quit).log_count, len(days))
+
+    def test_rebuild_command_backfills_bitmaps(self):
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today)
+        self.assertFalse(HabitYearBitmap.objects.exists())
+        call_command('rebuild_habit_bitmaps', stdout=StringIO())
+        self.assertEqual(list(HabitYearBitmap.objects.history(self.habit.id).dates()), [self.today])
+
+
+class BulkLogHabitTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulkuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, name='Bulk Habit', habit_type='BUILD')
+        self.other_habit = Habit.objects.create(user=self.user, name='Other Bulk Habit', habit_type='QUIT')
+        stranger = User.objects.create_user(username='stranger', password='testpassword')
+        self.foreign_habit = Habit.objects.create(user=stranger, name='Not Mine', habit_type='BUILD')
+        self.today = date.today()
+
+    def test_bulk_json_reports_per_item_results(self):
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today)
+        yesterday = self.today - timedelta(days=1)
+        items = [
+            {'habit': self.habit.id, 'completion_date': str(yesterday)},
+            {'habit': self.habit.id, 'completion_date': str(self.today)},
+            {'habit': self.other_habit.id, 'completion_date': str(yesterday)},
+            {'habit': self.foreign_habit.id, 'completion_date': str(yesterday)},
+            {'habit': self.habit.id, 'completion_date': 'not-a-date'},
+            {'habit': self.habit.id, 'completion_date': str(yesterday)},
+        ]
+        response = self.client.post('/api/logs/bulk/', items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['created', 'duplicate', 'created', 'error', 'error', 'duplicate'],
+        )
+        self.assertEqual((response.data['created'], response.data['duplicate'], response.data['error']), (2, 2, 2))
+        self.assertFalse(HabitLog.objects.filter(habit=self.foreign_habit).exists())
+        # Bulk inserts skip post_save, so the summary must have been rebuilt explicitly
+        self.assertEqual(HabitStreakSummary.objects.get(habit=self.habit).build_streaks(self.today), (2, 2))
+
+    def test_non_integer_habit_ids_are_per_item_errors(self):
+        day = str(self.today - timedelta(days=1))
+        items = [
+            {'habit': True, 'completion_date': day},
+            {'habit': self.habit.id + 0.5, 'completion_date': day},
+            {'habit': [self.habit.id], 'completion_date': day},
+            # Too big for the primary key column
+            {'habit': 10 ** 30, 'completion_date': day},
+            {'habit': str(self.habit.id), 'completion_date': day},
+        ]
+        response = self.client.post('/api/logs/bulk/', items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']], ['error', 'error', 'error', 'error', 'created'],
+        )
+        self.assertEqual(list(HabitLog.objects.values_list('habit_id', flat=True)), [self.habit.id])
+
+    def test_bulk_ndjson_and_csv_uploads(self):
+        ndjson = '\n'.join(
+            json.dumps({'habit': self.habit.id, 'completion_date': str(self.today - timedelta(days=n))})
+            for n in range(5)
+        ) + '\n{broken\n'
+        response = self.client.post('/api/logs/bulk/', ndjson, content_type='application/x-ndjson')
+        self.assertEqual((response.data['created'], response.data['error']), (5, 1))
+
+        csv_body = 'habit,completion_date\n' + ''.join(
+            f'{self.other_habit.id},{self.today - timedelta(days=n)}\n' for n in range(3)
+        )
+        response = self.client.post('/api/logs/bulk/', csv_body, content_type='text/csv')
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(HabitLog.objects.filter(habit=self.other_habit).count(), 3)
+
+    def test_undecodable_lines_are_per_item_errors(self):
+        day = str(self.today - timedelta(days=10))
+        ndjson = b'\xff\xfe{"habit": 1}\n' + json.dumps({'habit': self.habit.id, 'completion_date': day}).encode()
+        response = self.client.post('/api/logs/bulk/', ndjson, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']], ['error', 'created'])
+
+        csv_body = f'habit,completion_date\n{self.habit.id},\xff\n{self.other_habit.id},{day}\n'.encode('latin-1')
+        response = self.client.post('/api/logs/bulk/', csv_body, content_type='text/csv')
+        self.assertEqual([result['status'] for result in response.data['results']], ['error', 'created'])
+        response = self.client.post('/api/logs/bulk/', b'\xffhabit\n', content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_query_count_does_not_grow_with_items(self):
+        items = [
+            {'habit': habit.id, 'completion_date': str(self.today - timedelta(days=n))}
+            for habit in (self.habit, self.other_habit) for n in range(200)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/logs/bulk/', items, format='json')
+        self.assertEqual(response.data['created'], 400)
+        self.assertLess(len(queries), 15)
+
+    def test_single_log_duplicate_is_a_validation_error(self):
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today)
+        response = self.client.post(f'/api/habits/{self.habit.id}/log/', {'completion_date': self.today})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='exportuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, name='Export, Habit', habit_type='BUILD')
+        self.today = date.today()
+        for days_ago in range(5):
+            HabitLog.objects.create(habit=self.habit, completion_date=self.today - timedelta(days=days_ago))
+        stranger = User.objects.create_user(username='exportstranger', password='testpassword')
+        HabitLog.objects.create(habit=Habit.objects.create(user=stranger, name='Hidden'), completion_date=self.today)
+
+    def export(self, query):
+        response = self.client.get(f'/api/export/{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export_streams_habits_then_logs(self):
+        response, body = self.export('')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(records[0]['type'], 'habit')
+        self.assertEqual(records[0]['name'], 'Export, Habit')
+        self.assertEqual([r['completion_date'] for r in records[1:]], [str(self.today - timedelta(days=n)) for n in reversed(range(5))])
+
+    def test_csv_export_with_since(self):
+        since = self.today - timedelta(days=1)
+        _, body = self.export(f'?format=csv&since={since}')
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual([row['type'] for row in rows], ['habit', 'log', 'log'])
+        self.assertEqual(rows[0]['name'], 'Export, Habit')
+        self.assertEqual({row['completion_date'] for row in rows[1:]}, {str(since), str(self.today)})
+
+    def test_keyset_iterator_reads_in_fixed_size_chunks(self):
+        logs = HabitLog.objects.filter(habit=self.habit)
+        with self.assertNumQueries(3):
+            rows = list(keyset_iterator(logs, ('pk', 'completion_date'), chunk_size=2))
+        self.assertEqual(len(rows), 5)
+
+    def test_logs_are_paged_along_the_habit_date_index(self):
+        other = Habit.objects.create(user=self.user, name='Second')
+        HabitLog.objects.bulk_create(HabitLog(habit=other, completion_date=self.today - timedelta(days=n)) for n in range(3))
+        logs = HabitLog.objects.filter(habit_id__in=[self.habit.id, other.id])
+        keys = ('habit_id', 'completion_date')
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(keyset_iterator(logs, keys, chunk_size=3, keys=keys))
+        self.assertEqual(rows, sorted(logs.values_list(*keys)))
+        self.assertEqual(len(queries), 3)
+        self.assertFalse(any('JOIN' in query['sql'] for query in queries.captured_queries))
+
+
+class StatsLogWindowTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='windowuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, name='Window Habit', habit_type='BUILD')
+        self.today = date.today()
+        self.days = [self.today - timedelta(days=n) for n in range(9, -1, -1)]
+        for day in self.days:
+            HabitLog.objects.create(habit=self.habit, completion_date=day)
+
+    def test_include_logs_false_skips_the_log_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/habits/{self.habit.id}/stats/?include_logs=false')
+        self.assertNotIn('logs', response.data)
+        self.assertEqual(response.data['current_streak'], 10)
+
+    def test_from_to_window(self):
+        response = self.client.get(
+            f'/api/habits/{self.habit.id}/stats/?from={self.days[2]}&to={self.days[4]}'
+        )
+        self.assertEqual(response.data['logs'], self.days[2:5])
+        self.assertEqual(response.data['longest_streak'], 10)
+
+        response = self.client.get(f'/api/habits/{self.habit.id}/stats/?from=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_pagination_over_logs(self):
+        collected = []
+        url = f'/api/habits/{self.habit.id}/stats/?page_size=4'
+        while url:
+            response = self.client.get(url)
+            collected.extend(response.data['logs'])
+            url = response.data['logs_next']
+        self.assertEqual(collected, self.days)
+
+    def test_habit_list_is_cursor_paginated(self):
+        for i in range(3):
+            Habit.objects.create(user=self.user, name=f'Extra {i}')
+        response = self.client.get('/api/habits/?page_size=3')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='etaguser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, name='ETag Habit', habit_type='BUILD')
+        self.today = date.today()
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today)
+
+    def test_unchanged_stats_poll_returns_304_without_touching_logs(self):
+        url = f'/api/habits/{self.habit.id}/stats/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(1):
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today - timedelta(days=1))
+        third = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, status.HTTP_200_OK)
+        self.assertEqual(third.data['current_streak'], 2)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+    def test_dashboard_etag_changes_on_habit_and_log_writes(self):
+        etag = self.client.get('/api/dashboard/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        for write in (
+            lambda: HabitLog.objects.filter(habit=self.habit).first().delete(),
+            lambda: self.client.patch(f'/api/habits/{self.habit.id}/', {'name': 'Renamed'}),
+            lambda: Habit.objects.create(user=self.user, name='Another'),
+            lambda: self.client.post('/api/logs/bulk/', [{'habit': self.habit.id, 'completion_date': str(self.today)}], format='json'),
+        ):
+            write()
+            response = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response['ETag']
+
+    def test_habit_save_does_not_undo_a_concurrent_log_bump(self):
+        url = f'/api/habits/{self.habit.id}/calendar/'
+        loaded = Habit.objects.get(pk=self.habit.pk)
+        version = loaded.version
+        etags = [self.client.get(url)['ETag']]
+        # A log written between loading the habit and saving it
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today - timedelta(days=1))
+        etags.append(self.client.get(url)['ETag'])
+        loaded.name = 'Renamed'
+        loaded.save()
+        etags.append(self.client.get(url)['ETag'])
+        self.assertEqual(loaded.version, version + 2)
+        self.assertEqual(Habit.objects.get(pk=self.habit.pk).version, loaded.version)
+        self.assertEqual(len(set(etags)), 3)
+
+    @override_settings(HABIT_RESPONSE_CACHE_TIMEOUT=60)
+    def test_server_side_cache_is_keyed_by_version(self):
+        cache.clear()
+        self.client.get('/api/dashboard/')
+        with self.assertNumQueries(1):
+            cached = self.client.get('/api/dashboard/')
+        self.assertEqual(cached.data[0]['current_streak'], 1)
+
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today - timedelta(days=1))
+        self.assertEqual(self.client.get('/api/dashboard/').data[0]['current_streak'], 2)
+
+
+class SQLStreakTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sqluser', password='testpassword')
+        self.today = date.today()
+
+    def test_sql_streaks_match_python_streaks(self):
+        """The window-function calculator agrees with build_streaks/quit_streaks, future logs included."""
+        rng = random.Random(7)
+        habits = []
+        for i in range(24):
+            habit = Habit.objects.create(user=self.user, name=f'SQL Habit {i}', habit_type='BUILD' if i % 2 else 'QUIT')
+            Habit.objects.filter(pk=habit.pk).update(created_at=habit.created_at - timedelta(days=rng.randint(0, 90)))
+            density = rng.choice([0, 0.2, 0.6, 0.95])
+            logs = [
+                HabitLog(habit=habit, completion_date=self.today - timedelta(days=n))
+                for n in range(-3, 120) if rng.random() < density
+            ]
+            HabitLog.objects.bulk_create(logs)
+            habits.append(habit)
+
+        habits = list(Habit.objects.filter(user=self.user))
+        expected = calculate_streaks_batch(habits, fetch_log_dates([h.id for h in habits]), self.today)
+        with self.assertNumQueries(1):
+            by_user = calculate_streaks_sql(user_id=self.user.id, today=self.today)
+        self.assertEqual(by_user, expected)
+
+        one = habits[3]
+        self.assertEqual(calculate_streaks_sql(habit_ids=[one.id], today=self.today), {one.id: expected[one.id]})
+
+    def test_sql_streaks_skip_deleted_habits(self):
+        kept = Habit.objects.create(user=self.user, name='Kept', habit_type='BUILD')
+        deleted = Habit.objects.create(user=self.user, name='Deleted', habit_type='BUILD')
+        HabitLog.objects.bulk_create(HabitLog(habit=habit, completion_date=self.today) for habit in (kept, deleted))
+        Habit.objects.filter(pk=deleted.pk).update(deleted_at=timezone.now())
+
+        self.assertEqual(calculate_streaks_sql(user_id=self.user.id, today=self.today), {kept.id: (1, 1)})
+        self.assertEqual(calculate_streaks_sql(habit_ids=[kept.id, deleted.id], today=self.today), {kept.id: (1, 1)})
+
+
+class HabitCalendarTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='calendaruser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, name='Calendar Habit', habit_type='BUILD')
+        self.quit_habit = Habit.objects.create(user=self.user, name='Calendar Quit', habit_type='QUIT')
+        self.today = date.today()
+
+    def test_weekly_build_rollup(self):
+        monday = self.today - timedelta(days=self.today.weekday() + 14)
+        for offset in (0, 1, 2, 7, 13):
+            HabitLog.objects.create(habit=self.habit, completion_date=monday + timedelta(days=offset))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f'/api/habits/{self.habit.id}/calendar/?period=week&from={monday}&to={monday + timedelta(days=13)}'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(b['start'], b['days'], b['completions'], b['rate']) for b in response.data['buckets']],
+            [(monday, 7, 3, round(3 / 7, 4)), (monday + timedelta(days=7), 7, 2, round(2 / 7, 4))],
+        )
+
+    def test_monthly_quit_rollup_counts_clean_days_since_creation(self):
+        HabitLog.objects.create(habit=self.quit_habit, completion_date=self.today)
+        first_of_month = self.today.replace(day=1)
+        response = self.client.get(f'/api/habits/{self.quit_habit.id}/calendar/?period=month&from={first_of_month}')
+        [bucket] = response.data['buckets']
+        # The habit was created today, so only today counts, and it was a relapse
+        self.assertEqual((bucket['days'], bucket['relapses'], bucket['clean_days'], bucket['rate']), (1, 1, 0, 0.0))
+
+    def test_future_and_pre_creation_logs_are_not_counted(self):
+        Habit.objects.filter(id=self.quit_habit.id).update(created_at=timezone.now() - timedelta(days=3))
+        for habit in (self.habit, self.quit_habit):
+            HabitLog.objects.bulk_create(
+                HabitLog(habit=habit, completion_date=self.today + timedelta(days=n)) for n in (-10, -1, 0, 1, 5)
+            )
+        call_command('rebuild_habit_bitmaps', stdout=StringIO())
+        query = f'?period=day&from={self.today - timedelta(days=14)}&to={self.today + timedelta(days=5)}'
+        for bitmaps in (False, True):
+            with override_settings(HABIT_BITMAP_HISTORY=bitmaps):
+                build = self.client.get(f'/api/habits/{self.habit.id}/calendar/{query}').data['buckets']
+                quit = self.client.get(f'/api/habits/{self.quit_habit.id}/calendar/{query}').data['buckets']
+            self.assertEqual((sum(b['days'] for b in build), sum(b['completions'] for b in build)), (15, 3))
+            # Only the relapses since the habit was created, three days ago, count
+            self.assertEqual((sum(b['days'] for b in quit), sum(b['relapses'] for b in quit)), (4, 2))
+            self.assertTrue(all(b['rate'] is None or 0 <= b['rate'] <= 1 for b in build + quit))
+
+    def test_invalid_ranges_are_rejected(self):
+        url = f'/api/habits/{self.habit.id}/calendar/'
+        self.assertEqual(self.client.get(url + '?period=year').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url + '?from=2020-01-01&to=2024-01-01').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url + '?from=2024-02-01&to=2024-01-01').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_dates_at_the_ends_of_the_calendar(self):
+        url = f'/api/habits/{self.habit.id}/calendar/'
+        for query in ('?period=day&to=9999-12-31', '?period=week&from=0001-01-01&to=0001-01-03', '?from=0001-01-01'):
+            self.assertEqual(self.client.get(url + query).status_code, status.HTTP_400_BAD_REQUEST, query)
+        for period in PERIODS:
+            for query in (f'?period={period}&to=0001-01-08', f'?period={period}&from=9999-11-01&to=9999-11-29'):
+                response = self.client.get(url + query)
+                self.assertEqual(response.status_code, status.HTTP_200_OK, query)
+                self.assertTrue(response.data['buckets'])
+
+
+class BenchmarkCommandTests(APITestCase):
+    def test_seed_then_benchmark_and_detect_regressions(self):
+        call_command('seed_habits', '--users', '2', '--habits', '3', '--years', '1', '--prefix', 'load', stdout=StringIO())
+        self.assertEqual(Habit.objects.filter(user__username__startswith='load_').count(), 6)
+        self.assertGreater(HabitLog.objects.filter(habit__user__username__startswith='load_').count(), 0)
+        # Seeding goes through bulk inserts but still leaves consistent summaries behind
+        out = StringIO()
+        call_command('rebuild_streak_summaries', '--check', stdout=out)
+        self.assertIn('0 out of date', out.getvalue())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results.json')
+            call_command(
+                'benchmark_endpoints', '--prefix', 'load', '--requests', '3', '--warmup', '1',
+                '--endpoint', 'dashboard', '--endpoint', 'log', '--output', output, stdout=StringIO(),
+            )
+            with open(output) as fh:
+                report = json.load(fh)
+            self.assertEqual(set(report['endpoints']), {'dashboard', 'log'})
+            self.assertEqual(report['endpoints']['dashboard']['requests'], 3)
+
+            # Benchmark writes are rolled back
+            self.assertFalse(HabitLog.objects.filter(completion_date__gt=date.today()).exists())
+
+            report['endpoints']['dashboard']['queries_max'] = 0
+            baseline = os.path.join(tmp, 'baseline.json')
+            with open(baseline, 'w') as fh:
+                json.dump(report, fh)
+            with self.assertRaisesMessage(CommandError, 'dashboard.queries_max'):
+                call_command(
+                    'benchmark_endpoints', '--prefix', 'load', '--requests', '3', '--warmup', '1',
+                    '--endpoint', 'dashboard', '--baseline', baseline, stdout=StringIO(),
+                )
+
+
+@override_settings(HABIT_PERF_INSTRUMENTATION=True)
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(username='metricsuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, name='Metrics Habit', habit_type='BUILD')
+
+    def test_server_timing_header_reports_phases_and_queries(self):
+        response = self.client.get(f'/api/habits/{self.habit.id}/stats/')
+        phases = dict(
+            part.split(';', 1) for part in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(phases), {'db', 'auth', 'render', 'view', 'total', 'queries'})
+        self.assertEqual(phases['queries'], 'desc="2 queries"')
+
+    def test_metrics_endpoint_serves_prometheus_histograms_per_view(self):
+        self.client.get('/api/dashboard/')
+        self.client.get('/api/habits/')
+        self.client.post(f'/api/habits/{self.habit.id}/log/', {'completion_date': date.today()})
+
+        with override_settings(HABIT_METRICS_TOKEN='scrape-me'):
+            response = self.client.get('/metrics', headers={'authorization': 'Bearer scrape-me'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('habit_requests_total{view="DashboardView",method="GET",status="200"} 1', body)
+        self.assertIn('habit_requests_total{view="HabitViewSet.list",method="GET",status="200"} 1', body)
+        self.assertIn('habit_request_duration_seconds_count{view="LogHabitView",phase="db"} 1', body)
+        self.assertIn('habit_request_queries_bucket{view="DashboardView",le="+Inf"} 1', body)
+
+    def test_metrics_need_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(HABIT_METRICS_TOKEN='scrape-me'):
+            self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.get('/metrics', headers={'authorization': 'Bearer wrong'})
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_queries_are_counted_under_asgi(self):
+        headers = {'authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        for url in ('/api/async/dashboard/', '/api/dashboard/'):
+            response = await self.async_client.get(url, headers=headers)
+            phases = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+            queries = int(phases['queries'].split('"')[1].split()[0])
+            self.assertGreater(queries, 0, url)
+            self.assertNotEqual(phases['db'], 'dur=0.00', url)
+
+    @override_settings(HABIT_PERF_INSTRUMENTATION=False)
+    def test_disabled_instrumentation_adds_nothing(self):
+        response = self.client.get('/api/dashboard/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AsyncEndpointTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='asyncuser', password='testpassword')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.today = date.today()
+        self.build = Habit.objects.create(user=self.user, name='Async Build', habit_type='BUILD')
+        self.quit = Habit.objects.create(user=self.user, name='Async Quit', habit_type='QUIT')
+        for days_ago in (0, 1, 2, 5):
+            HabitLog.objects.create(habit=self.build, completion_date=self.today - timedelta(days=days_ago))
+        HabitLog.objects.create(habit=self.quit, completion_date=self.today - timedelta(days=3))
+
+    def test_payloads_and_etags_match_the_sync_views(self):
+        for sync_url, async_url in (
+            ('/api/dashboard/', '/api/async/dashboard/'),
+            (f'/api/habits/{self.build.id}/stats/', f'/api/async/habits/{self.build.id}/stats/'),
+            (f'/api/habits/{self.quit.id}/stats/?include_logs=false', f'/api/async/habits/{self.quit.id}/stats/?include_logs=false'),
+        ):
+            expected = self.client.get(sync_url, **self.auth)
+            response = self.client.get(async_url, **self.auth)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, expected.content)
+            self.assertEqual(response['ETag'], expected['ETag'])
+
+    def test_conditional_get_returns_304(self):
+        url = f'/api/async/habits/{self.build.id}/stats/'
+        etag = self.client.get(url, **self.auth)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_errors(self):
+        other = User.objects.create_user(username='asyncother', password='testpassword')
+        foreign = Habit.objects.create(user=other, name='Not Mine', habit_type='BUILD')
+        url = f'/api/async/habits/{self.build.id}/stats/'
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.post(url, **self.auth).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(
+            self.client.get(f'/api/async/habits/{foreign.id}/stats/', **self.auth).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+        self.assertEqual(self.client.get('/api/async/habits/999999/stats/', **self.auth).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'{url}?from=nope', **self.auth).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(f'{url}?cursor=x', **self.auth).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        caches[settings.HABIT_AUTH_CACHE].clear()
+        self.user = User.objects.create_user(username='authcacheuser', password='testpassword')
+        self.habit = Habit.objects.create(user=self.user, name='Auth Habit', habit_type='BUILD')
+        self.url = f'/api/habits/{self.habit.id}/stats/?include_logs=false'
+
+    def get(self, user=None):
+        token = RefreshToken.for_user(user or self.user).access_token
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_user_lookup_is_served_from_the_cache(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+
+    def test_deactivation_and_deletion_take_effect_immediately(self):
+        token = RefreshToken.for_user(self.user).access_token
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        other = User.objects.create_user(username='authcachegone', password='testpassword')
+        self.get(other)
+        other_token = RefreshToken.for_user(other).access_token
+        other.delete()
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {other_token}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_cached_tokens(self):
+        # simplejwt modules keep the settings object they imported, so patch it rather than override_settings
+        with mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True):
+            old_token = RefreshToken.for_user(self.user).access_token
+            self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+            self.user.set_password('newpassword')
+            self.user.save()
+            response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {old_token}')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+
+
+class DailySnapshotTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='snapshotuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.today = date.today()
+        self.build = Habit.objects.create(user=self.user, name='Snapshot Build', habit_type='BUILD')
+        self.quit = Habit.objects.create(user=self.user, name='Snapshot Quit', habit_type='QUIT')
+        Habit.objects.filter(pk__in=[self.build.id, self.quit.id]).update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+        self.build.refresh_from_db()
+        self.quit.refresh_from_db()
+        for days_ago in (0, 1, 3, 4, 5, 10):
+            HabitLog.objects.create(habit=self.build, completion_date=self.today - timedelta(days=days_ago))
+        for days_ago in (2, 20):
+            HabitLog.objects.create(habit=self.quit, completion_date=self.today - timedelta(days=days_ago))
+
+    def snapshot(self, *args):
+        out = StringIO()
+        call_command('snapshot_streaks', *args, stdout=out)
+        return out.getvalue()
+
+    def test_snapshots_match_streaks_as_of_each_day(self):
+        for days_ago in (0, 2, 4):
+            day = self.today - timedelta(days=days_ago)
+            self.snapshot('--date', day.isoformat(), '--chunk-size', '1')
+            for habit in (self.build, self.quit):
+                dates = [d for d in habit.habitlog_set.values_list('completion_date', flat=True) if d <= day]
+                if habit.habit_type == 'BUILD':
+                    expected = build_streaks(dates, day)
+                else:
+                    expected = quit_streaks(dates, habit.created_at.date(), day)
+                snapshot = DailyStreakSnapshot.objects.get(habit=habit, date=day)
+                self.assertEqual((snapshot.current_streak, snapshot.longest_streak), expected)
+
+    def test_runs_are_resumable_and_idempotent(self):
+        late = Habit.objects.create(user=self.user, name='Created Today', habit_type='BUILD')
+        yesterday = (self.today - timedelta(days=1)).isoformat()
+        self.assertIn('Snapshotted 2 habits', self.snapshot('--date', yesterday))
+        self.assertFalse(DailyStreakSnapshot.objects.filter(habit=late).exists())
+        # A restarted run only picks up what is missing; a recompute rewrites the same rows
+        DailyStreakSnapshot.objects.filter(habit=self.quit).delete()
+        self.assertIn('Snapshotted 1 habits', self.snapshot('--date', yesterday))
+        before = list(DailyStreakSnapshot.objects.order_by('habit_id').values())
+        self.assertIn('Snapshotted 2 habits', self.snapshot('--date', yesterday, '--recompute'))
+        self.assertEqual(list(DailyStreakSnapshot.objects.order_by('habit_id').values()), before)
+        with self.assertRaises(CommandError):
+            self.snapshot('--date', (self.today + timedelta(days=1)).isoformat())
+
+    def test_history_endpoint(self):
+        for days_ago in (0, 1, 2):
+            self.snapshot('--date', (self.today - timedelta(days=days_ago)).isoformat())
+        url = f'/api/habits/{self.build.id}/history/'
+        response = self.client.get(url, {'from': self.today - timedelta(days=1)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['date'], row['current_streak']) for row in response.data['history']],
+            [(self.today - timedelta(days=1), 1), (self.today, 2)],
+        )
+        other = User.objects.create_user(username='snapshotother', password='testpassword')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ParallelSnapshotTests(APITransactionTestCase):
+    """The process pool path, whose workers open their own connections to the database."""
+
+    def setUp(self):
+        self.today = date.today()
+        user = User.objects.create_user(username='parallelsnapshots', password='testpassword')
+        for n in range(6):
+            habit = Habit.objects.create(user=user, name=f'Parallel {n}', habit_type='QUIT' if n % 3 == 0 else 'BUILD')
+            Habit.objects.filter(pk=habit.pk).update(created_at=timezone.now() - timedelta(days=20))
+            HabitLog.objects.bulk_create(
+                HabitLog(habit=habit, completion_date=self.today - timedelta(days=days_ago))
+                for days_ago in range(n, 15, n + 2)
+            )
+        HabitStreakSummary.objects.rebuild_many(list(Habit.objects.values_list('id', flat=True)))
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.use_database_file()
+
+    def use_database_file(self):
+        """Points the default database at a file copy of the in-memory test database, which workers cannot see."""
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'snapshots.sqlite3')
+        copy = sqlite3.connect(path)
+        connection.ensure_connection()
+        connection.connection.backup(copy)
+        copy.close()
+        # Closing the in-memory connection would drop the test database, so it is set aside instead
+        memory, name = connection.connection, connection.settings_dict['NAME']
+        connection.connection = None
+        connection.settings_dict['NAME'] = path
+
+        def restore():
+            connection.close()
+            connection.settings_dict['NAME'] = name
+            connection.connection = memory
+        self.addCleanup(restore)
+
+    def snapshots(self, *args):
+        out = StringIO()
+        call_command('snapshot_streaks', '--chunk-size', '2', *args, stdout=out)
+        rows = list(DailyStreakSnapshot.objects.order_by('habit_id').values_list(
+            'habit_id', 'date', 'current_streak', 'longest_streak',
+        ))
+        DailyStreakSnapshot.objects.all().delete()
+        return out.getvalue(), rows
+
+    def test_worker_pool_matches_a_single_worker(self):
+        out, expected = self.snapshots('--workers', '1')
+        self.assertIn('Snapshotted 6 habits', out)
+        out, rows = self.snapshots('--workers', '2')
+        self.assertIn('Snapshotted 6 habits', out)
+        self.assertIn('in 3 chunks', out)
+        self.assertEqual(rows, expected)
+
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        self.today = date.today()
+        self.user = User.objects.create_user(username='rankuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habits = {}
+        for name, streak in (('alpha', 5), ('beta', 3), ('gamma', 3), ('delta', 0)):
+            owner = self.user if name == 'beta' else User.objects.create_user(username=name, password='testpassword')
+            habit = Habit.objects.create(user=owner, name=name, habit_type='BUILD')
+            HabitLog.objects.bulk_create(
+                HabitLog(habit=habit, completion_date=self.today - timedelta(days=offset)) for offset in range(streak)
+            )
+            self.habits[name] = habit
+        HabitStreakSummary.objects.rebuild_many([habit.id for habit in self.habits.values()])
+        self.quit = Habit.objects.create(user=self.user, name='quit', habit_type='QUIT')
+        call_command('build_leaderboards', '--chunk-size', '2', stdout=StringIO())
+
+    def test_top_k_with_tied_ranks(self):
+        response = self.client.get('/api/leaderboard/', {'habit_type': 'BUILD', 'limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(
+            response.data['results'],
+            [
+                {'rank': 1, 'streak': 5},
+                {'rank': 2, 'streak': 3, 'habit_id': self.habits['beta'].id, 'username': 'rankuser'},
+                {'rank': 2, 'streak': 3},
+            ],
+        )
+        # Requests only read the built table: the top entries, which of them are the requester's, and the total
+        with self.assertNumQueries(3):
+            self.client.get('/api/leaderboard/', {'habit_type': 'BUILD', 'metric': 'longest'})
+
+    def test_rank_and_percentile_of_own_habit(self):
+        response = self.client.get(f"/api/habits/{self.habits['beta'].id}/rank/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['current'], {'streak': 3, 'rank': 2, 'total': 4, 'percentile': 50.0})
+        self.assertEqual(response.data['longest']['rank'], 2)
+        quit_rank = self.client.get(f'/api/habits/{self.quit.id}/rank/').data
+        self.assertEqual(quit_rank['current'], {'streak': 1, 'rank': 1, 'total': 1, 'percentile': 50.0})
+        self.assertEqual(
+            self.client.get(f"/api/habits/{self.habits['alpha'].id}/rank/").status_code, status.HTTP_403_FORBIDDEN
+        )
+
+    def test_own_rank_is_live_and_the_rest_follow_the_next_build(self):
+        beta = self.habits['beta']
+        for offset in (3, 4, 5):
+            self.client.post(f'/api/habits/{beta.id}/log/', {'completion_date': self.today - timedelta(days=offset)})
+        self.assertEqual(self.client.get(f'/api/habits/{beta.id}/rank/').data['current']['rank'], 1)
+        top = self.client.get('/api/leaderboard/', {'habit_type': 'BUILD', 'limit': 1}).data['results']
+        self.assertEqual(top[0], {'rank': 1, 'streak': 5})
+
+        delete_habit(self.habits['alpha'])
+        self.assertEqual(self.client.get('/api/leaderboard/', {'habit_type': 'BUILD'}).data['total'], 3)
+        call_command('build_leaderboards', stdout=StringIO())
+        response = self.client.get('/api/leaderboard/', {'habit_type': 'BUILD', 'limit': 1})
+        self.assertEqual(response.data['results'][0], {'rank': 1, 'habit_id': beta.id, 'username': 'rankuser', 'streak': 6})
+
+    def test_rank_reads_one_row_per_distinct_streak(self):
+        delta = User.objects.get(username='delta')
+        for n in range(30):
+            Habit.objects.create(user=delta, name=f'Unstarted {n}', habit_type='BUILD')
+        call_command('build_leaderboards', stdout=StringIO())
+        # 34 habits, but only the streaks 5, 3 and 0
+        self.assertEqual(LeaderboardBucket.objects.filter(habit_type='BUILD', metric='current').count(), 3)
+        with CaptureQueriesContext(connection) as queries:
+            position = Ranking('BUILD', 'current').position(self.habits['beta'].id, 3)
+        self.assertEqual(position, {'streak': 3, 'rank': 2, 'total': 34, 'percentile': 94.1})
+        # The habit's own entry by primary key, then the buckets; no scan over the entries
+        entry_lookup, bucket_sum = [query['sql'] for query in queries.captured_queries]
+        self.assertIn('"habits_leaderboardentry"."habit_id" = ', entry_lookup)
+        self.assertIn('habits_leaderboardbucket', bucket_sum)
+        self.assertNotIn('habits_leaderboardentry', bucket_sum)
+
+        delete_habit(self.habits['alpha'])
+        self.assertEqual(Ranking('BUILD', 'current').position(self.habits['beta'].id, 3)['rank'], 1)
+
+    def test_other_users_are_not_identified(self):
+        self.client.force_authenticate(user=User.objects.get(username='gamma'))
+        response = self.client.get('/api/leaderboard/', {'habit_type': 'BUILD'})
+        self.assertNotIn('rankuser', response.content.decode())
+        self.assertNotIn('alpha', response.content.decode())
+        self.assertEqual(
+            [row.get('username') for row in response.data['results']], [None, None, 'gamma', None],
+        )
+        self.assertNotIn(self.habits['beta'].id, [row.get('habit_id') for row in response.data['results']])
+
+    def test_invalid_parameters(self):
+        for params in ({'habit_type': 'OTHER'}, {'metric': 'best'}, {'limit': 0}, {'limit': 1000}):
+            self.assertEqual(self.client.get('/api/leaderboard/', params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ListFastPathTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fastuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        for name, description, habit_type in (
+            ('Read', '', 'BUILD'),
+            ('Café ☕', 'Line\u2028separator and "quotes"', 'QUIT'),
+            ('日本語 🧘', 'emoji ✓', 'BUILD'),
+            ('Run', 'x' * 300, 'QUIT'),
+            ('Stretch', '\\back\\slash\n', 'BUILD'),
+        ):
+            Habit.objects.create(user=self.user, name=name, description=description, habit_type=habit_type)
+
+    def pages(self, url):
+        contents = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            contents.append(response.content)
+            url = json.loads(response.content)['next']
+        return contents
+
+    def test_fast_path_is_byte_identical_to_the_serializer(self):
+        for url in ('/api/habits/?page_size=2', '/api/habits/?page_size=2&fields=name,habit_type', '/api/habits/?fields=id'):
+            fast = self.pages(url)
+            with mock.patch.object(HabitViewSet, 'values_fast_path', False), \
+                    mock.patch.object(HabitViewSet, 'renderer_classes', [JSONRenderer]):
+                slow = self.pages(url)
+            self.assertEqual(fast, slow)
+        self.assertEqual(len(fast), 1)
+        self.assertEqual(list(json.loads(fast[0])['results'][0]), ['id'])
+
+    def test_sparse_fields_on_retrieve_and_unknown_fields(self):
+        habit = Habit.objects.filter(user=self.user).first()
+        response = self.client.get(f'/api/habits/{habit.id}/', {'fields': 'name,created_at'})
+        self.assertEqual(set(response.data), {'name', 'created_at'})
+        for url in ('/api/habits/', f'/api/habits/{habit.id}/'):
+            self.assertEqual(self.client.get(url, {'fields': 'name,secret'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_field_sets_are_cached_once_each(self):
+        build_values_representation.cache_clear()
+        for fields in ('name,id', 'id,name', 'id,,name,id', 'id,name,nope', 'bogus1', 'bogus2'):
+            self.client.get('/api/habits/', {'fields': fields})
+        self.assertEqual(build_values_representation.cache_info().currsize, 1)
+
+    def test_fast_renderer_matches_the_stock_renderer(self):
+        data = {
+            'text': 'naïve \u2028 \u2029 "quoted" \\ </script>',
+            'when': timezone.now(),
+            'day': date(2024, 2, 29),
+            'amount': Decimal('1.50'),
+            'lazy': gettext_lazy('Not found.'),
+            'numbers': (1, 2.5, -3, None, True),
+            1: [{'nested': []}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_fast_renderer_writes_exponents_like_the_stock_renderer(self):
+        for value in (1e16, -1e16, 1.2345678901234568e17, 1e300, 1e-05, -3.5e-07, 5e-324, Decimal('1E+20')):
+            data = {'rate': value, 'plain': [1e15, 0.0001, 12.5, None]}
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data), value)
+
+    def test_fast_renderer_rejects_non_finite_numbers_like_the_stock_renderer(self):
+        for value in (float('nan'), float('inf'), -float('inf'), Decimal('NaN')):
+            data = [{'rate': None}, {'buckets': [{'rate': value}]}]
+            with self.assertRaises(ValueError):
+                JSONRenderer().render(data)
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render(data)
+            # Without STRICT_JSON both write the JavaScript literal instead of null
+            with mock.patch.object(JSONRenderer, 'strict', False):
+                self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class BatchStatsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='batchstats', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.today = date.today()
+        self.habits = [
+            Habit.objects.create(user=self.user, name=f'Batch {i}', habit_type='BUILD' if i % 2 else 'QUIT')
+            for i in range(6)
+        ]
+        for i, habit in enumerate(self.habits):
+            for days_ago in range(0, 3 * i, 2):
+                HabitLog.objects.create(habit=habit, completion_date=self.today - timedelta(days=days_ago))
+        self.foreign = Habit.objects.create(
+            user=User.objects.create_user(username='batchother', password='testpassword'), name='Other'
+        )
+
+    def test_matches_single_stats_in_two_queries(self):
+        ids = [habit.id for habit in reversed(self.habits)] + [self.foreign.id, 999999, self.habits[0].id]
+        window = {'from': str(self.today - timedelta(days=6)), 'to': str(self.today - timedelta(days=1))}
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/habits/stats/batch/', {'habit_ids': ids, **window}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['missing'], [self.foreign.id, 999999])
+        self.assertEqual(
+            response.data['results'],
+            [self.client.get(f'/api/habits/{habit.id}/stats/', window).data for habit in reversed(self.habits)],
+        )
+
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                '/api/habits/stats/batch/', {'habit_ids': ids, 'include_logs': False}, format='json'
+            )
+        self.assertNotIn('logs', response.data['results'][0])
+
+    def test_invalid_bodies(self):
+        for body in ({}, {'habit_ids': []}, {'habit_ids': ['x']}, {'habit_ids': list(range(1, 202))},
+                     {'habit_ids': [1], 'from': 'soon'}, {'habit_ids': [10 ** 30]}):
+            response = self.client.post('/api/habits/stats/batch/', body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DeltaSyncTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='syncuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.today = date.today()
+        self.habit = Habit.objects.create(user=self.user, name='Synced', habit_type='BUILD')
+        HabitLog.objects.create(habit=self.habit, completion_date=self.today)
+
+    def sync(self, since):
+        response = self.client.get('/api/sync/', {'since': since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_first_sync_then_deltas(self):
+        first = self.sync(0)
+        self.assertEqual([habit['name'] for habit in first['habits']], ['Synced'])
+        self.assertEqual(first['logs_reset'], {self.habit.id: [self.today]})
+
+        warm = self.sync(first['cursor'])
+        self.assertEqual(warm['cursor'], first['cursor'])
+        self.assertEqual(
+            [warm[key] for key in ('habits', 'deleted_habits', 'logs_created', 'logs_deleted', 'logs_reset')],
+            [[], [], [], [], {}],
+        )
+
+        yesterday = self.today - timedelta(days=1)
+        added = self.client.post('/api/habits/', {'name': 'Added', 'habit_type': 'QUIT'}).data['id']
+        gone = Habit.objects.create(user=self.user, name='Gone').id
+        self.client.post(f'/api/habits/{self.habit.id}/log/', {'completion_date': yesterday})
+        self.client.post('/api/logs/bulk/', [{'habit': added, 'completion_date': str(self.today)}], format='json')
+        HabitLog.objects.get(habit=self.habit, completion_date=self.today).delete()
+        self.client.patch(f'/api/habits/{self.habit.id}/', {'name': 'Renamed'})
+        Habit.objects.get(pk=gone).delete()
+
+        delta = self.sync(first['cursor'])
+        self.assertGreater(delta['cursor'], first['cursor'])
+        self.assertEqual([habit['name'] for habit in delta['habits']], ['Renamed', 'Added'])
+        self.assertEqual(delta['deleted_habits'], [gone])
+        self.assertEqual(
+            delta['logs_created'],
+            [{'habit': self.habit.id, 'completion_date': yesterday}, {'habit': added, 'completion_date': self.today}],
+        )
+        self.assertEqual(delta['logs_deleted'], [{'habit': self.habit.id, 'completion_date': self.today}])
+        self.assertEqual(self.sync(delta['cursor'])['habits'], [])
+
+    def test_paging_stops_on_whole_sequence_numbers(self):
+        cursor = self.sync(0)['cursor']
+        HabitLog.objects.bulk_create(
+            HabitLog(habit=self.habit, completion_date=self.today - timedelta(days=n)) for n in range(1, 4)
+        )
+        logs_bulk_changed.send(
+            sender=HabitLog, habit_ids={self.habit.id},
+            created_logs=[(self.habit.id, self.today - timedelta(days=n)) for n in range(1, 4)],
+        )
+        Habit.objects.create(user=self.user, name='Later')
+
+        page = changes_since(self.user, cursor, limit=2)
+        self.assertTrue(page['more'])
+        self.assertEqual(len(page['logs_created']), 3)
+        rest = changes_since(self.user, page['cursor'], limit=2)
+        self.assertFalse(rest['more'])
+        self.assertEqual([habit['name'] for habit in rest['habits']], ['Later'])
+
+    def test_unknown_log_changes_resend_the_habit_logs(self):
+        cursor = self.sync(0)['cursor']
+        HabitLog.objects.filter(habit=self.habit).delete()
+        logs_bulk_changed.send(sender=HabitLog, habit_ids={self.habit.id})
+        self.assertEqual(self.sync(cursor)['logs_reset'], {self.habit.id: []})
+
+    def test_pruned_cursors_need_a_full_sync(self):
+        old = self.sync(0)['cursor']
+        self.client.post('/api/habits/', {'name': 'Middle'})
+        middle = self.sync(old)['cursor']
+        self.client.post(f'/api/habits/{self.habit.id}/log/', {'completion_date': self.today - timedelta(days=1)})
+        aged = ChangeJournalEntry.objects.filter(user=self.user, seq__lte=middle).update(
+            created_at=timezone.now() - timedelta(days=100)
+        )
+        out = StringIO()
+        call_command('prune_change_journal', '--keep-days', '90', '--chunk-size', '1', stdout=out)
+        self.assertIn(f'Deleted {aged} change journal entries', out.getvalue())
+        self.assertEqual(ChangeJournalEntry.objects.filter(user=self.user).count(), 1)
+
+        response = self.client.get('/api/sync/', {'since': old})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertTrue(response.data['resync'])
+        self.assertEqual(len(self.sync(middle)['logs_created']), 1)
+        self.assertEqual(len(self.sync(0)['habits']), 2)
+
+    def test_invalid_cursors(self):
+        for since in ('abc', -1, 10 ** 6):
+            self.assertEqual(self.client.get('/api/sync/', {'since': since}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(HABIT_DATABASE_REPLICAS=['default'], DATABASE_ROUTERS=['habits.routers.ReplicaRouter'])
+class ReplicaRoutingTests(APITestCase):
+    # The only "replica" is the primary itself, so the test database serves both
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='replicauser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, name='Replicated', habit_type='BUILD')
+
+    def test_router_uses_replicas_only_for_opted_in_reads(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Habit), PRIMARY)
+        state = RoutingState()
+        token = routing_state.set(state)
+        try:
+            with mock.patch('habits.routers.choose_replica', return_value='replica0'):
+                self.assertEqual(router.db_for_read(Habit), PRIMARY)
+                state.replica_reads = True
+                self.assertEqual(router.db_for_read(Habit), 'replica0')
+                self.assertEqual(router.db_for_write(Habit), PRIMARY)
+                self.assertTrue(state.wrote)
+                self.assertEqual(router.db_for_read(Habit), PRIMARY)
+        finally:
+            routing_state.reset(token)
+        self.assertFalse(router.allow_migrate('replica0', 'habits'))
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        with mock.patch('habits.routers.choose_replica', wraps=choose_replica) as chosen:
+            self.assertEqual(self.client.get('/api/dashboard/').status_code, status.HTTP_200_OK)
+            self.assertTrue(chosen.called)
+
+            chosen.reset_mock()
+            response = self.client.post(f'/api/habits/{self.habit.id}/log/', {'completion_date': date.today()})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertIsNotNone(cache.get(pin_key(self.user.id)))
+            self.client.get('/api/dashboard/')
+            self.client.get(f'/api/habits/{self.habit.id}/stats/')
+            self.assertFalse(chosen.called)
+
+            cache.delete(pin_key(self.user.id))
+            self.client.get(f'/api/habits/{self.habit.id}/')
+            self.assertTrue(chosen.called)
+
+    def test_only_listed_viewset_actions_read_replicas(self):
+        with mock.patch('habits.routers.choose_replica', wraps=choose_replica) as chosen:
+            self.client.get('/api/habits/')
+            self.assertTrue(chosen.called)
+            chosen.reset_mock()
+            self.client.get(f'/api/habits/{self.habit.id}/calendar/')
+            self.assertFalse(chosen.called)
+
+
+@skipUnless(connection.vendor == 'sqlite', "The replica is a copy made with SQLite's backup API")
+class TwoDatabaseRoutingTests(APITransactionTestCase):
+    """A real second SQLite database as the replica: a copy of the primary that gets no new writes."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='twodbuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, name='Two Databases', habit_type='BUILD')
+
+        # Copy the primary, as the README does for local testing
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'replica.sqlite3')
+        replica = sqlite3.connect(path)
+        connection.ensure_connection()
+        connection.connection.backup(replica)
+        replica.close()
+        connections.settings['replica0'] = {**connections.settings['default'], 'NAME': path}
+        self.addCleanup(connections.settings.pop, 'replica0')
+        self.addCleanup(lambda: connections['replica0'].close())
+        self.enterContext(mock.patch.object(type(self), 'databases', {'default', 'replica0'}))
+        self.enterContext(override_settings(
+            HABIT_DATABASE_REPLICAS=['replica0'], DATABASE_ROUTERS=['habits.routers.ReplicaRouter'],
+        ))
+
+    def logged_days(self):
+        response = self.client.get(f'/api/habits/{self.habit.id}/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(response.data['logs'])
+
+    def test_reads_come_from_the_replica_except_right_after_a_write(self):
+        self.assertEqual(self.logged_days(), 0)
+        response = self.client.post(f'/api/habits/{self.habit.id}/log/', {'completion_date': date.today()})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(HabitLog.objects.using('replica0').count(), 0)
+        # Pinned: the user sees their own log on the primary
+        self.assertEqual(self.logged_days(), 1)
+        # Unpinned: back to the replica, which has not caught up
+        cache.delete(pin_key(self.user.id))
+        self.assertEqual(self.logged_days(), 0)
+
+
+class IndexUsageTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='indexuser', password='testpassword')
+        self.habit = Habit.objects.create(user=self.user, name='Indexed')
+
+    def assertPlanUses(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plan text is SQLite-specific')
+    def test_habit_list_pages_through_the_user_index(self):
+        index = Habit._meta.indexes[0].name
+        habits = Habit.objects.filter(user=self.user).order_by('-created_at')
+        self.assertPlanUses(habits, f'USING INDEX {index} (user_id=?)')
+        self.assertPlanUses(habits.filter(created_at__lt=timezone.now())[:10], f'USING INDEX {index} (user_id=? AND created_at<?)')
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plan text is SQLite-specific')
+    def test_log_reads_are_index_only(self):
+        logs = HabitLog.objects.filter(habit=self.habit)
+        self.assertPlanUses(logs.order_by('-completion_date').values_list('completion_date'), 'USING COVERING INDEX')
+        self.assertPlanUses(logs.order_by('completion_date').values_list('completion_date'), 'USING COVERING INDEX')
+        in_range = HabitLog.objects.filter(
+            habit_id__in=[self.habit.id], completion_date__range=(date(2026, 1, 1), date(2026, 1, 31)),
+        ).values_list('habit_id', 'completion_date')
+        self.assertPlanUses(in_range, 'USING COVERING INDEX')
+
+    def postgres_plan(self, queryset):
+        with connection.cursor() as cursor:
+            # A few test rows are cheapest to read whole and sort; what matters is whether an index
+            # can return them in order, in which case the plan has no Sort
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_bitmapscan = off')
+        return queryset.explain()
+
+    @skipUnless(connection.vendor == 'postgresql', 'Plan text is PostgreSQL-specific')
+    def test_habit_list_uses_the_user_index_on_postgresql(self):
+        index = Habit._meta.indexes[0].name
+        plan = self.postgres_plan(Habit.objects.filter(user=self.user).order_by('-created_at')[:50])
+        self.assertIn(f'Index Scan using {index} on', plan)
+        self.assertNotIn('Sort', plan)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Plan text is PostgreSQL-specific')
+    def test_descending_log_reads_use_the_unique_index_on_postgresql(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, HabitLog._meta.db_table)
+        [unique] = [
+            name for name, info in constraints.items()
+            if info['unique'] and info['columns'] == ['habit_id', 'completion_date']
+        ]
+        logs = HabitLog.objects.filter(habit=self.habit).order_by('-completion_date').values_list('completion_date')
+        plan = self.postgres_plan(logs)
+        self.assertRegex(plan, rf'Index (Only )?Scan Backward using {unique} on')
+        self.assertNotIn('Sort', plan)
+
+    def test_partition_years(self):
+        self.assertEqual(list(year_bounds(None, 2026, 5)), [2026, 2027])
+        self.assertEqual(list(year_bounds(2023, 2026, 5)), list(range(2023, 2028)))
+        # A log dated in year 1 stays in the default partition rather than getting 2000 partitions
+        self.assertEqual(list(year_bounds(1, 2026, 5)), list(range(2021, 2028)))
+        self.assertEqual(list(year_bounds(2030, 2026, 5, years_ahead=2)), [2026, 2027, 2028])
+
+    @skipUnless(connection.vendor != 'postgresql', 'Only PostgreSQL partitions logs')
+    def test_partition_command_is_a_no_op_elsewhere(self):
+        out = StringIO()
+        call_command('add_log_partitions', stdout=out)
+        self.assertIn('not partitioned', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('partition_habit_logs', stdout=out)
+
+    def log_indexes(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, TABLE)
+        return {
+            name: info['columns'] for name, info in constraints.items()
+            if info['index'] and not info['primary_key'] and not info['unique']
+        }
+
+    @skipUnless(connection.vendor == 'postgresql', 'Only PostgreSQL partitions logs')
+    def test_partitioning_keeps_the_model_indexes(self):
+        expected = {index.name: index.fields for index in HabitLog._meta.indexes}
+        HabitLog.objects.create(habit=self.habit, completion_date=date(2026, 3, 1))
+        # The test's own transaction holds deferred FK checks, which would block dropping the old table
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        self.assertTrue(partition_table(connection, years_back=1))
+        self.assertEqual(self.log_indexes(), expected)
+        self.assertTrue(unpartition_table(connection))
+        self.assertEqual(self.log_indexes(), expected)
+        self.assertTrue(HabitLog.objects.filter(habit=self.habit, completion_date=date(2026, 3, 1)).exists())
+
+
+class PurgeQueueTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='purgeuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, name='Doomed')
+        self.kept = Habit.objects.create(user=self.user, name='Kept')
+        start = date.today() - timedelta(days=5)
+        HabitLog.objects.bulk_create(HabitLog(habit=self.habit, completion_date=start + timedelta(days=n)) for n in range(5))
+        DailyStreakSnapshot.objects.create(habit=self.habit, date=start, current_streak=1, longest_streak=1)
+        HabitLog.objects.create(habit=self.kept, completion_date=start)
+
+    @override_settings(HABIT_BITMAP_HISTORY=True)
+    def test_rows_derived_from_purged_logs_go_too(self):
+        call_command('rebuild_habit_bitmaps', stdout=StringIO())
+        call_command('build_leaderboards', stdout=StringIO())
+        self.assertTrue(HabitYearBitmap.objects.filter(habit=self.habit).exists())
+        delete_habit(self.habit)
+        self.assertFalse(LeaderboardEntry.objects.filter(habit_id=self.habit.id).exists())
+        drain(size=2)
+        for model in (HabitStreakSummary, HabitYearBitmap, DailyStreakSnapshot, LeaderboardEntry, HabitLog):
+            self.assertFalse(model.objects.filter(habit_id=self.habit.id).exists(), model.__name__)
+        self.assertEqual(HabitStreakSummary.objects.get(habit=self.kept).log_count, 1)
+        self.assertTrue(HabitYearBitmap.objects.filter(habit=self.kept).exists())
+
+    def test_deleted_habit_is_hidden_then_purged_in_chunks(self):
+        cursor = self.client.get('/api/sync/', {'since': 0}).data['cursor']
+        self.assertEqual(self.client.delete(f'/api/habits/{self.habit.id}/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(f'/api/habits/{self.habit.id}/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual([habit['name'] for habit in self.client.get('/api/habits/').data['results']], ['Kept'])
+        self.assertEqual(self.client.get('/api/sync/', {'since': cursor}).data['deleted_habits'], [self.habit.id])
+        self.assertEqual(HabitLog.objects.filter(habit_id=self.habit.id).count(), 5)
+
+        self.assertEqual(drain(size=2, max_chunks=2), (0, 4))
+        job = PurgeJob.objects.get()
+        self.assertIsNone(job.finished_at)
+        self.assertEqual(job.rows_deleted, 4)
+
+        out = StringIO()
+        call_command('drain_purge_queue', '--chunk-size', '2', stdout=out)
+        self.assertIn('Finished 1 purge jobs', out.getvalue())
+        job.refresh_from_db()
+        self.assertIsNotNone(job.finished_at)
+        self.assertFalse(Habit.all_objects.filter(pk=self.habit.id).exists())
+        self.assertFalse(HabitLog.objects.filter(habit_id=self.habit.id).exists())
+        self.assertFalse(DailyStreakSnapshot.objects.filter(habit_id=self.habit.id).exists())
+        self.assertEqual(HabitLog.objects.filter(habit=self.kept).count(), 1)
+        # The purge itself is not journaled again
+        deletes = ChangeJournalEntry.objects.filter(habit_pk=self.habit.id, action=ChangeJournalEntry.Action.DELETE)
+        self.assertEqual(deletes.count(), 1)
+        self.assertEqual(drain(size=2), (0, 0))
+
+    def test_account_deletion(self):
+        self.assertEqual(self.client.delete('/api/auth/account/').status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Habit.objects.filter(user=self.user).exists())
+        self.assertEqual(Habit.all_objects.filter(user=self.user).count(), 2)
+
+        finished, rows = drain(size=100)
+        self.assertEqual(finished, 1)
+        self.assertGreater(rows, 6)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Habit.all_objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(ChangeJournalEntry.objects.filter(user_id=self.user.pk).exists())
+
+
+class AdminScalingTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='testpassword')
+        self.client.force_login(self.admin)
+        self.user = User.objects.create_user(username='adminviewed', password='testpassword')
+        self.habit = Habit.objects.create(user=self.user, name='Counted')
+
+    def add_logs(self, count, habit=None):
+        start = date.today() - timedelta(days=count)
+        HabitLog.objects.bulk_create(
+            HabitLog(habit=habit or self.habit, completion_date=start + timedelta(days=n)) for n in range(count)
+        )
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_logs(3)
+        few = self.changelist_queries('/admin/habits/habitlog/')
+        self.add_logs(40, Habit.objects.create(user=self.user, name='Busier'))
+        many = self.changelist_queries('/admin/habits/habitlog/')
+        self.assertEqual(len(few), len(many))
+        counts = [sql for sql in many if 'COUNT(' in sql]
+        self.assertTrue(counts)
+        self.assertTrue(all('LIMIT' in sql for sql in counts))
+
+        year = date.today().year
+        self.assertLessEqual(len(self.changelist_queries(f'/admin/habits/habitlog/?completion_date__year={year}')), len(many))
+        self.changelist_queries('/admin/habits/habit/?q=adminviewed')
+
+    @override_settings(HABIT_ADMIN_COUNT_LIMIT=5)
+    def test_count_is_capped(self):
+        self.add_logs(20)
+        response = self.client.get('/admin/habits/habitlog/')
+        # Without table statistics, PostgreSQL's estimate is a guess and is not used either
+        self.assertEqual(response.context['cl'].result_count, 6)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {HabitLog._meta.db_table}')
+            response = self.client.get('/admin/habits/habitlog/')
+            self.assertEqual(response.context['cl'].result_count, estimated_count(HabitLog.objects.all()))
+            self.assertGreater(response.context['cl'].result_count, 5)
+
+    def test_deleting_logs_is_set_based(self):
+        self.add_logs(10)
+        logs = list(HabitLog.objects.filter(habit=self.habit).order_by('completion_date').values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/admin/habits/habitlog/', {
+                'action': 'delete_selected', 'post': 'yes', '_selected_action': logs[:6],
+            })
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(HabitLog.objects.filter(habit=self.habit).count(), 4)
+        self.assertEqual(len([query for query in queries.captured_queries if query['sql'].startswith('DELETE')]), 1)
+        self.assertEqual(HabitStreakSummary.objects.get(habit=self.habit).log_count, 4)
+        reset = ChangeJournalEntry.objects.filter(habit_pk=self.habit.id, action=ChangeJournalEntry.Action.RESET)
+        self.assertTrue(reset.exists())
+
+    @override_settings(HABIT_BITMAP_HISTORY=True)
+    def test_deleting_searched_logs_updates_the_bitmaps(self):
+        self.add_logs(4)
+        other = Habit.objects.create(user=self.user, name='Untouched')
+        self.add_logs(2, other)
+        call_command('rebuild_habit_bitmaps', stdout=StringIO())
+        # A search joins the habit table, which the DELETE has to cope with
+        response = self.client.post(f'/admin/habits/habitlog/?q={self.habit.id}', {
+            'action': 'delete_selected', 'post': 'yes', 'select_across': '1',
+            '_selected_action': HabitLog.objects.filter(habit=self.habit).values_list('pk', flat=True)[:1],
+        })
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertFalse(HabitLog.objects.filter(habit=self.habit).exists())
+        self.assertEqual(len(HabitYearBitmap.objects.history(self.habit.id)), 0)
+        self.assertEqual(len(HabitYearBitmap.objects.history(other.id)), 2)
+
+    @mock.patch('habits.admin.HabitLogAdmin.deleted_objects_sample', 5)
+    def test_delete_confirmation_lists_a_sample(self):
+        self.add_logs(30)
+        logs = list(HabitLog.objects.values_list('pk', flat=True))
+        response = self.client.post('/admin/habits/habitlog/', {'action': 'delete_selected', '_selected_action': logs})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [listed] = response.context['deletable_objects']
+        self.assertEqual(len(listed), 6)
+        self.assertEqual(listed[-1], '...and 25 more')
+        self.assertEqual(dict(response.context['model_count']), {'habit logs': 30})
+
+    def test_deleting_habits_queues_purges(self):
+        other = Habit.objects.create(user=self.user, name='Also counted')
+        response = self.client.post('/admin/habits/habit/', {
+            'action': 'delete_selected', 'post': 'yes', '_selected_action': [self.habit.id, other.id],
+        })
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertFalse(Habit.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            sorted(PurgeJob.objects.values_list('target_pk', flat=True)), sorted([self.habit.id, other.id])
+        )
+
+
+class PrebuiltSchemaTests(APITestCase):
+    def setUp(self):
+        self.schema_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(HABIT_SCHEMA_DIR=self.schema_dir))
+        self.enterContext(mock.patch('habits.schema._code_version', 'test'))
+        self.enterContext(mock.patch.dict('habits.schema._artifacts', clear=True))
+
+    def test_served_from_the_build_without_introspection(self):
+        call_command('build_openapi_schema', stdout=StringIO())
+        self.assertEqual(
+            sorted(os.listdir(self.schema_dir)),
+            ['openapi-test.json', 'openapi-test.json.gz', 'openapi-test.yaml', 'openapi-test.yaml.gz'],
+        )
+        with mock.patch('habits.schema.generate_schema') as generate:
+            response = self.client.get('/api/schema/', {'format': 'json'})
+            self.assertFalse(generate.called)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('/api/habits/', json.loads(response.content)['paths'])
+        self.assertEqual(response['ETag'], '"openapi-test-json"')
+        self.assertIn('max-age', response['Cache-Control'])
+
+        compressed = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertTrue(compressed['Content-Type'].startswith('application/vnd.oai.openapi'))
+        with open(os.path.join(self.schema_dir, 'openapi-test.yaml.gz'), 'rb') as built:
+            self.assertEqual(compressed.content, built.read())
+
+        again = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_first_request_builds_and_saves(self):
+        response = self.client.get('/api/schema/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'openapi:', response.content)
+        self.assertIn('openapi-test.yaml', os.listdir(self.schema_dir))
+
+    def test_operations_require_the_jwt_scheme(self):
+        schema = json.loads(self.client.get('/api/schema/', {'format': 'json'}).content)
+        self.assertEqual(
+            schema['components']['securitySchemes']['jwtAuth'],
+            {'type': 'http', 'scheme': 'bearer', 'bearerFormat': 'JWT'},
+        )
+        self.assertIn({'jwtAuth': []}, schema['paths']['/api/habits/']['get']['security'])
+
+
+class ProductionProfileTests(APITestCase):
+    def test_production_settings_reuse_connections(self):
+        production = importlib.import_module('config.settings_production')
+        self.assertFalse(production.DEBUG)
+        self.assertEqual(production.DATABASES['default']['CONN_MAX_AGE'], production.DATABASE_CONN_MAX_AGE)
+        self.assertTrue(production.DATABASES['default']['CONN_HEALTH_CHECKS'])
+        # The base settings are left alone
+        self.assertIsNot(production.DATABASES['default'], settings.DATABASES['default'])
+
+    def test_replicas_need_a_shared_cache(self):
+        production = importlib.import_module('config.settings_production')
+        self.addCleanup(importlib.reload, production)
+        with mock.patch('config.settings.HABIT_DATABASE_REPLICAS', ['replica0']):
+            with self.assertRaises(ImproperlyConfigured):
+                importlib.reload(production)
+            with mock.patch.dict(os.environ, {'CACHE_URL': 'redis://cache:6379/0'}):
+                importlib.reload(production)
+        self.assertEqual(production.CACHES['default']['LOCATION'], 'redis://cache:6379/0')
+        self.assertEqual(settings.CACHES['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+
+    def test_worker_warmup(self):
+        with tempfile.TemporaryDirectory() as schema_dir, override_settings(HABIT_SCHEMA_DIR=schema_dir), \
+                mock.patch.dict('habits.schema._artifacts', clear=True) as artifacts:
+            timings = warm_worker()
+            self.assertIn('yaml', artifacts)
+        self.assertEqual(set(timings), {'load', 'connect', 'requests'})
+        self.assertIsNotNone(connection.connection)
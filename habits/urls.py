@@ -1,17 +1,29 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import RegisterView, HabitViewSet, LogHabitView, HabitStatsView, DashboardView
+from . import async_views
+from .views import RegisterView, AccountView, HabitViewSet, LogHabitView, BulkLogHabitView, HabitStatsView, BatchHabitStatsView, HabitCalendarView, HabitHistoryView, HabitRankView, LeaderboardView, DashboardView, ExportView, SyncView
 
 router = DefaultRouter()
 router.register(r'habits', HabitViewSet, basename='habit')
 
 urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='register'),
+    path('auth/account/', AccountView.as_view(), name='account'),
     
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('export/', ExportView.as_view(), name='export'),
+    path('sync/', SyncView.as_view(), name='sync'),
     path('habits/<int:habit_pk>/log/', LogHabitView.as_view(), name='log_habit'),
+    path('logs/bulk/', BulkLogHabitView.as_view(), name='bulk_log_habit'),
     path('habits/<int:pk>/stats/', HabitStatsView.as_view(), name='habit_stats'),
+    path('habits/stats/batch/', BatchHabitStatsView.as_view(), name='habit_stats_batch'),
+    path('habits/<int:pk>/calendar/', HabitCalendarView.as_view(), name='habit_calendar'),
+    path('habits/<int:pk>/history/', HabitHistoryView.as_view(), name='habit_history'),
+    path('habits/<int:pk>/rank/', HabitRankView.as_view(), name='habit_rank'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('async/dashboard/', async_views.dashboard, name='async_dashboard'),
+    path('async/habits/<int:pk>/stats/', async_views.habit_stats, name='async_habit_stats'),
     path('', include(router.urls)),
 
 
@@ -1,31 +1,97 @@
 from django.contrib.auth.models import User
-from rest_framework import generics, viewsets, permissions, response, status
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from rest_framework import generics, viewsets, permissions, response, serializers, status
+from rest_framework.parsers import JSONParser
 from rest_framework.views import APIView
-from .serializers import UserSerializer, HabitSerializer, HabitLogSerializer
-from .models import Habit, HabitLog
-from datetime import date, timedelta
+from .serializers import (
+    MAX_ID, BatchStatsSerializer, UserSerializer, HabitSerializer, HabitLogSerializer, requested_fields, values_representation,
+)
+from .models import Habit, HabitLog, UserDataVersion
+from .caching import versioned_response
+from .exports import EXPORT_COLUMNS, export_records
+from .instrumentation import TimedAuthenticationMixin
+from .leaderboard import HABIT_TYPES, METRICS, Ranking
+from .pagination import HabitCursorPagination, LogCursorPagination
+from .parsers import CSVParser, NDJSONParser
+from .purge import delete_account, delete_habit
+from .renderers import CSVRenderer, NDJSONRenderer
+from .routers import ReplicaReadMixin
+from .rollups import DEFAULT_SPANS, MAX_BUCKETS, MAX_DATE, MIN_DATE, PERIODS, bucket_count, completion_rollup
+from .signals import logs_bulk_changed
+from .sync import CursorExpired, changes_since
+from .streaks import build_streaks, fetch_log_dates, quit_streaks, streaks_for_habits
+from datetime import date
+from itertools import islice
 
 # --- User Registration View ---
-class RegisterView(generics.CreateAPIView):
+class RegisterView(TimedAuthenticationMixin, generics.CreateAPIView):
     """Allows new users to create an account."""
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny] # Allow anyone to register
 
 
+class AccountView(TimedAuthenticationMixin, APIView):
+    """Deletes the user's account. Their data is removed in the background by the purge queue."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def delete(self, request):
+        delete_account(request.user)
+        return response.Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def include_logs(params):
+    return params.get('include_logs', 'true').lower() not in ('false', '0', 'no')
+
+
+def log_window(logs, params, field='completion_date'):
+    """Narrows a HabitLog (or other dated) queryset to the ?from= / ?to= dates in `params`."""
+    date_field = serializers.DateField()
+    for param, lookup in (('from', f'{field}__gte'), ('to', f'{field}__lte')):
+        if param in params:
+            try:
+                logs = logs.filter(**{lookup: date_field.to_internal_value(params[param])})
+            except serializers.ValidationError as exc:
+                raise serializers.ValidationError({param: exc.detail})
+    return logs
+
+
 # --- Habit CRUD ViewSet ---
-class HabitViewSet(viewsets.ModelViewSet):
+class HabitViewSet(TimedAuthenticationMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """Handles all Create, Retrieve, Update, and Delete (CRUD) operations for habits."""
     serializer_class = HabitSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HabitCursorPagination
+    replica_actions = ('list', 'retrieve')
+
+    values_fast_path = True
 
     def get_queryset(self):
         """This method ensures that a user can only see their own habits."""
         return Habit.objects.filter(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        # Hidden right away; the habit's logs are deleted later, in chunks
+        delete_habit(instance)
+
+    def list(self, request, *args, **kwargs):
+        """Builds the page from .values() rows, with the same output as the serializer would give."""
+        representation = None
+        if self.values_fast_path:
+            representation = values_representation(self.get_serializer_class(), requested_fields(request))
+        if representation is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # The cursor is read off the ordering columns, so they are selected even when not requested
+        ordering = tuple(name.lstrip('-') for name in self.paginator.get_ordering(request, queryset, self))
+        rows = self.paginate_queryset(queryset.values(*dict.fromkeys(representation.columns + ordering)))
+        return self.get_paginated_response([representation(row) for row in rows])
+
 
 # --- Habit Logging View ---
-class LogHabitView(generics.CreateAPIView):
+class LogHabitView(TimedAuthenticationMixin, generics.CreateAPIView):
     """Handles the creation of a new log entry for a specific habit."""
     serializer_class = HabitLogSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -34,123 +100,395 @@ class LogHabitView(generics.CreateAPIView):
         """Associates the log with the correct habit, ensuring the user owns it."""
         habit_pk = self.kwargs.get('habit_pk')
         habit = generics.get_object_or_404(Habit, pk=habit_pk, user=self.request.user)
-        serializer.save(habit=habit)
+        # The streak summary is updated by a post_save signal; keep both writes in one transaction
+        try:
+            with transaction.atomic():
+                serializer.save(habit=habit)
+        except IntegrityError:
+            raise serializers.ValidationError({"completion_date": ["This habit is already logged for this date."]})
 
 
-# --- DETAILED STATS VIEW ---
-class HabitStatsView(generics.RetrieveAPIView):
-    """Provides detailed statistics for a single habit, including streak calculations."""
+# --- Bulk Logging View ---
+class BulkLogHabitView(TimedAuthenticationMixin, APIView):
+    """
+    Creates many log entries across the user's habits in one request.
+    Accepts a JSON list (or {"logs": [...]}), NDJSON or CSV of {habit, completion_date} items,
+    skips dates that are already logged and reports a result for every item.
+    """
     permission_classes = [permissions.IsAuthenticated]
-    queryset = Habit.objects.all()
-    lookup_field = 'pk'
+    parser_classes = [JSONParser, NDJSONParser, CSVParser]
+    batch_size = 1000
 
-    def calculate_build_streaks(self, habit):
-        """Calculates the current and longest streaks for a 'BUILD' type habit."""
-        logs = habit.habitlog_set.order_by('-completion_date')
-        if not logs:
-            return 0, 0
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('logs')
+        if isinstance(items, (str, dict)) or not hasattr(items, '__iter__'):
+            return response.Response(
+                {"detail": "Expected a list of {habit, completion_date} items."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        log_dates = {log.completion_date for log in logs}
-        
-        # Calculate the longest streak by finding the longest chain of consecutive days
-        longest_streak = 0
-        if log_dates:
-            sorted_dates = sorted(list(log_dates))
-            current_longest = 1
-            for i in range(1, len(sorted_dates)):
-                if (sorted_dates[i] - sorted_dates[i-1]).days == 1:
-                    current_longest += 1
-                else:
-                    longest_streak = max(longest_streak, current_longest)
-                    current_longest = 1
-            longest_streak = max(longest_streak, current_longest)
-
-        # Calculate the current streak by counting backwards from the most recent log
-        current_streak = 0
-        today = date.today()
-        most_recent_log_date = logs.first().completion_date
-
-        # A streak is only "current" if the last log was today or yesterday
-        if most_recent_log_date == today or most_recent_log_date == (today - timedelta(days=1)):
-            day_to_check = most_recent_log_date
-            while day_to_check in log_dates:
-                current_streak += 1
-                day_to_check -= timedelta(days=1)
-        
-        return current_streak, longest_streak
+        results = []
+        numbered = enumerate(items)
+        while True:
+            batch = list(islice(numbered, self.batch_size))
+            if not batch:
+                break
+            results.extend(self.ingest(batch))
 
-    def calculate_quit_streaks(self, habit):
-        """Calculates the current and longest 'clean' streaks for a 'QUIT' type habit."""
-        today = date.today()
-        start_date = habit.created_at.date()
+        counts = {"created": 0, "duplicate": 0, "error": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        return response.Response({**counts, "results": results}, status=status.HTTP_200_OK)
 
-        # Get all unique, sorted relapse dates
-        relapse_dates = sorted(list(
-            habit.habitlog_set.values_list('completion_date', flat=True).distinct()
-        ))
-        relapse_dates = [d for d in relapse_dates if d <= today] # Ignore future dates
+    def ingest(self, batch):
+        """Validates, ownership-checks and inserts one batch of (index, item) pairs."""
+        habit_field = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+        date_field = serializers.DateField()
+        results = {}
+        parsed = []
+        for index, item in batch:
+            try:
+                habit_id = habit_field.run_validation(item['habit'])
+                completion_date = date_field.to_internal_value(item['completion_date'])
+            except (KeyError, TypeError, ValueError):
+                results[index] = {"index": index, "status": "error", "detail": "Expected an object with 'habit' and 'completion_date'."}
+            except serializers.ValidationError as exc:
+                results[index] = {"index": index, "status": "error", "detail": exc.detail[0]}
+            else:
+                parsed.append((index, habit_id, completion_date))
 
-        if not relapse_dates:
-            # If there are no relapses, the streak is from creation day to today
-            current_streak = (today - start_date).days + 1
-            return current_streak, current_streak
+        habit_ids = {habit_id for _, habit_id, _ in parsed}
+        owned = set(Habit.objects.filter(user=self.request.user, pk__in=habit_ids).values_list('pk', flat=True))
+        existing = set()
+        if owned:
+            dates = [completion_date for _, _, completion_date in parsed]
+            existing = set(
+                HabitLog.objects.filter(habit_id__in=owned, completion_date__range=(min(dates), max(dates)))
+                .values_list('habit_id', 'completion_date')
+            )
 
-        # Current streak is the number of days since the most recent relapse
-        last_relapse_date = relapse_dates[-1]
-        current_streak = (today - last_relapse_date).days
+        new_logs = []
+        for index, habit_id, completion_date in parsed:
+            result = {"index": index, "habit": habit_id, "completion_date": completion_date}
+            if habit_id not in owned:
+                result.update(status="error", detail="Not found.")
+            elif (habit_id, completion_date) in existing:
+                result["status"] = "duplicate"
+            else:
+                result["status"] = "created"
+                existing.add((habit_id, completion_date))
+                new_logs.append(HabitLog(habit_id=habit_id, completion_date=completion_date))
+            results[index] = result
 
-        # To find the longest streak, we find the biggest gap in a timeline of events
-        timeline_dates = [start_date - timedelta(days=1)] + relapse_dates + [today]
-        
-        longest_streak = 0
-        for i in range(1, len(timeline_dates)):
-            gap = (timeline_dates[i] - timeline_dates[i-1]).days - 1
-            if gap > longest_streak:
-                longest_streak = gap
+        if new_logs:
+            with transaction.atomic():
+                HabitLog.objects.bulk_create(new_logs, ignore_conflicts=True)
+                logs_bulk_changed.send(
+                    sender=HabitLog,
+                    habit_ids={log.habit_id for log in new_logs},
+                    created_logs=[(log.habit_id, log.completion_date) for log in new_logs],
+                )
+        return [results[index] for index in sorted(results)]
 
-        return current_streak, longest_streak
+
+# --- DETAILED STATS VIEW ---
+class HabitStatsView(TimedAuthenticationMixin, ReplicaReadMixin, generics.RetrieveAPIView):
+    """
+    Provides detailed statistics for a single habit, including streak calculations.
+    The `logs` list can be limited with ?from= and ?to= dates, paged with ?page_size= and ?cursor=,
+    or left out entirely with ?include_logs=false. Streaks always cover the whole history.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = Habit.objects.select_related('streak_summary')
+    lookup_field = 'pk'
+
+    def calculate_build_streaks(self, habit):
+        """Calculates the current and longest streaks for a 'BUILD' type habit."""
+        return build_streaks(habit.habitlog_set.values_list('completion_date', flat=True), date.today())
+
+    def calculate_quit_streaks(self, habit):
+        """Calculates the current and longest 'clean' streaks for a 'QUIT' type habit."""
+        return quit_streaks(
+            habit.habitlog_set.values_list('completion_date', flat=True), habit.created_at.date(), date.today()
+        )
 
     def get(self, request, *args, **kwargs):
         habit = self.get_object()
-        if habit.user != request.user:
+        if habit.user_id != request.user.id:
             return response.Response(
                 {"detail": "You do not have permission to view these stats."},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Call the correct calculation method based on the habit's type
-        if habit.habit_type == 'BUILD':
-            current_streak, longest_streak = self.calculate_build_streaks(habit)
-        else: # 'QUIT'
-            current_streak, longest_streak = self.calculate_quit_streaks(habit)
+        today = date.today()
+        return versioned_response(
+            request,
+            key=f'habit{habit.id}',
+            version=habit.version,
+            last_modified=habit.updated_at,
+            today=today,
+            build=lambda: self.build_stats(habit, today),
+        )
 
-        data = {
+    def build_stats(self, habit, today):
+        data = self.stats_data(habit, streaks_for_habits([habit], today)[habit.id])
+        if include_logs(self.request.query_params):
+            data.update(self.get_logs(habit))
+        return data
+
+    @staticmethod
+    def stats_data(habit, streaks):
+        current_streak, longest_streak = streaks
+        return {
             "habit_id": habit.id,
             "habit_name": habit.name,
             "habit_type": habit.habit_type,
             "current_streak": current_streak,
             "longest_streak": longest_streak,
-            "logs": [log.completion_date for log in habit.habitlog_set.order_by('completion_date')]
         }
-        return response.Response(data, status=status.HTTP_200_OK)
+
+    def get_logs(self, habit):
+        """The habit's log dates within the requested window, paginated when a cursor or page size is given."""
+        params = self.request.query_params
+        logs = log_window(habit.habitlog_set.all(), params)
+
+        if 'cursor' not in params and 'page_size' not in params:
+            return {"logs": list(logs.order_by('completion_date').values_list('completion_date', flat=True))}
+
+        paginator = LogCursorPagination()
+        page = paginator.paginate_queryset(logs.values('completion_date'), self.request, view=self)
+        return {
+            "logs": [log['completion_date'] for log in page],
+            "logs_next": paginator.get_next_link(),
+            "logs_previous": paginator.get_previous_link(),
+        }
+
+
+class BatchHabitStatsView(TimedAuthenticationMixin, APIView):
+    """
+    Stats for many of the user's habits in one request: POST {"habit_ids": [...], "include_logs": true,
+    "from": ..., "to": ...}. Every result has the shape of the single-habit stats endpoint; ids that
+    don't exist or belong to someone else are reported under "missing".
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchStatsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+        habit_ids = list(dict.fromkeys(options['habit_ids']))
+
+        habits = Habit.objects.filter(user=request.user, pk__in=habit_ids).select_related('streak_summary').in_bulk()
+        found = [habits[habit_id] for habit_id in habit_ids if habit_id in habits]
+        streaks = streaks_for_habits(found, date.today())
+        if options['include_logs']:
+            dates_by_habit = fetch_log_dates(list(habits), until=options.get('to'), since=options.get('from'))
+
+        results = []
+        for habit in found:
+            data = HabitStatsView.stats_data(habit, streaks[habit.id])
+            if options['include_logs']:
+                data["logs"] = dates_by_habit.get(habit.id, [])
+            results.append(data)
+        return response.Response({
+            "results": results,
+            "missing": [habit_id for habit_id in habit_ids if habit_id not in habits],
+        })
+
+
+# --- CALENDAR VIEW ---
+class HabitCalendarView(TimedAuthenticationMixin, generics.RetrieveAPIView):
+    """
+    Completion counts and rates for one habit, bucketed by ?period=day|week|month between ?from= and ?to=.
+    BUILD habits report completions per bucket; QUIT habits report relapses and clean days.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = Habit.objects.all()
+    lookup_field = 'pk'
+
+    def get(self, request, *args, **kwargs):
+        habit = self.get_object()
+        if habit.user_id != request.user.id:
+            return response.Response(
+                {"detail": "You do not have permission to view this calendar."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        period = request.query_params.get('period', 'day')
+        if period not in PERIODS:
+            raise serializers.ValidationError({"period": [f"Must be one of: {', '.join(PERIODS)}."]})
+        today = date.today()
+        date_field = serializers.DateField()
+        out_of_range = [f"Must be between {MIN_DATE} and {MAX_DATE}."]
+        try:
+            end = date_field.to_internal_value(request.query_params.get('to', today.isoformat()))
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({"to": exc.detail})
+        if not MIN_DATE <= end <= MAX_DATE:
+            raise serializers.ValidationError({"to": out_of_range})
+        # Subtracting the span from a date near MIN_DATE would overflow
+        default_start = MIN_DATE if end - MIN_DATE < DEFAULT_SPANS[period] else end - DEFAULT_SPANS[period]
+        try:
+            start = date_field.to_internal_value(request.query_params.get('from', default_start.isoformat()))
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({"from": exc.detail})
+        if start < MIN_DATE:
+            raise serializers.ValidationError({"from": out_of_range})
+        if start > end:
+            raise serializers.ValidationError({"from": ["Must not be after 'to'."]})
+        if bucket_count(start, end, period) > MAX_BUCKETS:
+            raise serializers.ValidationError({"from": [f"The range may span at most {MAX_BUCKETS} {period}s."]})
+
+        return versioned_response(
+            request,
+            key=f'calendar{habit.id}',
+            version=habit.version,
+            last_modified=habit.updated_at,
+            today=today,
+            build=lambda: {
+                "habit_id": habit.id,
+                "habit_type": habit.habit_type,
+                "period": period,
+                "from": start,
+                "to": end,
+                "buckets": completion_rollup(habit, start, end, period, today),
+            },
+        )
+
+
+class HabitHistoryView(TimedAuthenticationMixin, generics.RetrieveAPIView):
+    """A habit's daily streak snapshots (see the snapshot_streaks command), optionally between ?from= and ?to=."""
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = Habit.objects.all()
+    lookup_field = 'pk'
+
+    def get(self, request, *args, **kwargs):
+        habit = self.get_object()
+        if habit.user_id != request.user.id:
+            return response.Response(
+                {"detail": "You do not have permission to view this history."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        snapshots = log_window(habit.snapshots.all(), request.query_params, field='date')
+        return response.Response({
+            "habit_id": habit.id,
+            "history": list(snapshots.order_by('date').values('date', 'current_streak', 'longest_streak')),
+        })
+
+
+class LeaderboardView(TimedAuthenticationMixin, APIView):
+    """
+    The top ?limit= habits of one ?habit_type=, ranked by their ?metric=current|longest streak.
+    Entries carry a habit id and username only when the habit is the requester's own.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        habit_type = params.get('habit_type', 'BUILD')
+        if habit_type not in HABIT_TYPES:
+            raise serializers.ValidationError({"habit_type": [f"Must be one of: {', '.join(HABIT_TYPES)}."]})
+        metric = params.get('metric', 'current')
+        if metric not in METRICS:
+            raise serializers.ValidationError({"metric": [f"Must be one of: {', '.join(METRICS)}."]})
+        limit = serializers.IntegerField(min_value=1, max_value=self.max_limit)
+        try:
+            limit = limit.run_validation(params.get('limit', 10))
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({"limit": exc.detail})
+
+        ranking = Ranking(habit_type, metric)
+        top = ranking.top(limit)
+        # Other users' entries stay anonymous; only the requester's own habits are identified
+        own = set(
+            Habit.objects.filter(pk__in=[habit_id for habit_id, _, _ in top], user=request.user)
+            .values_list('id', flat=True)
+        )
+        results = []
+        for habit_id, value, rank in top:
+            row = {"rank": rank, "streak": value}
+            if habit_id in own:
+                row.update(habit_id=habit_id, username=request.user.get_username())
+            results.append(row)
+        return response.Response({
+            "habit_type": habit_type,
+            "metric": metric,
+            "total": len(ranking),
+            "results": results,
+        })
+
+
+class HabitRankView(TimedAuthenticationMixin, generics.RetrieveAPIView):
+    """Where a habit's current and longest streaks rank among all habits of its type."""
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = Habit.objects.select_related('streak_summary')
+    lookup_field = 'pk'
+
+    def get(self, request, *args, **kwargs):
+        habit = self.get_object()
+        if habit.user_id != request.user.id:
+            return response.Response(
+                {"detail": "You do not have permission to view this rank."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        data = {"habit_id": habit.id, "habit_type": habit.habit_type}
+        # The habit's own streaks are live; the others are as of the last build_leaderboards run
+        streaks = streaks_for_habits([habit], date.today())[habit.id]
+        for metric, value in zip(METRICS, streaks):
+            data[metric] = Ranking(habit.habit_type, metric).position(habit.id, value)
+        return response.Response(data)
+
+
+class SyncView(TimedAuthenticationMixin, APIView):
+    """
+    Changes to the user's habits and logs since ?since=<cursor> (0, the default, for everything).
+    Clients apply the changes and keep the returned `cursor`; when `more` is true they call again with it.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = serializers.IntegerField(min_value=0).run_validation(request.query_params.get('since', 0))
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({"since": exc.detail})
+        try:
+            return response.Response(changes_since(request.user, since))
+        except CursorExpired as exc:
+            return response.Response({"detail": str(exc), "resync": True}, status=status.HTTP_410_GONE)
+        except ValueError as exc:
+            raise serializers.ValidationError({"since": [str(exc)]})
 
 
 # --- DASHBOARD VIEW ---
-class DashboardView(APIView):
+class DashboardView(TimedAuthenticationMixin, ReplicaReadMixin, APIView):
     """Provides a high-level summary of all of a user's habits."""
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        user_habits = Habit.objects.filter(user=request.user)
-        stats_calculator = HabitStatsView()
+        data_version = UserDataVersion.objects.filter(user=request.user).first() or UserDataVersion(user=request.user)
+        today = date.today()
+        return versioned_response(
+            request,
+            key=f'dashboard{request.user.id}',
+            version=data_version.version,
+            last_modified=data_version.updated_at or request.user.date_joined,
+            today=today,
+            build=lambda: self.build_dashboard(request.user, today),
+        )
+
+    def build_dashboard(self, user, today):
+        user_habits = list(Habit.objects.filter(user=user).select_related('streak_summary'))
+        return self.dashboard_data(user_habits, streaks_for_habits(user_habits, today))
 
+    @staticmethod
+    def dashboard_data(user_habits, streaks):
         dashboard_data = []
         for habit in user_habits:
             # For the dashboard, we only need the current streak
-            if habit.habit_type == 'BUILD':
-                current_streak, _ = stats_calculator.calculate_build_streaks(habit)
-            else: 
-                current_streak, _ = stats_calculator.calculate_quit_streaks(habit)
+            current_streak, _ = streaks[habit.id]
 
             dashboard_data.append({
                 "habit_id": habit.id,
@@ -158,5 +496,30 @@ class DashboardView(APIView):
                 "habit_type": habit.habit_type,
                 "current_streak": current_streak,
             })
-        
-        return response.Response(dashboard_data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return dashboard_data
+
+
+# --- EXPORT VIEW ---
+class ExportView(TimedAuthenticationMixin, APIView):
+    """
+    Streams every habit and log of the user as NDJSON (default) or CSV, picked with ?format= or the Accept header.
+    An optional ?since=YYYY-MM-DD limits the export to habits created and logs completed on or after that date.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    def get(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                since = serializers.DateField().to_internal_value(since)
+            except serializers.ValidationError as exc:
+                raise serializers.ValidationError({"since": exc.detail})
+
+        renderer = request.accepted_renderer
+        stream = StreamingHttpResponse(
+            renderer.render_stream(export_records(request.user, since), columns=EXPORT_COLUMNS),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        stream['Content-Disposition'] = f'attachment; filename="myhabit-export.{renderer.format}"'
+        return stream